@@ -2,7 +2,7 @@
 
 from __future__ import absolute_import
 
-from .utils import execute, messages
+from .utils import git, messages
 
 
 def abandon(start, end, dry_run=False, quiet=False):
@@ -14,30 +14,25 @@ def abandon(start, end, dry_run=False, quiet=False):
     :param bool quiet: suppress all output
     """
 
-    start, end = _validate_bounds(start, end)
+    stashes = git.stash_reflog()
+    start, end = _validate_bounds(start, end, len(stashes))
     if dry_run:
-        _dry_run(start, end)
+        _dry_run(stashes, start, end)
     else:
-        _run(start, end, quiet)
+        _run(stashes, start, end, quiet)
 
 
-def _dry_run(start, end):
+def _dry_run(stashes, start, end):
     for i in range(start, end):
-        stash = 'stash@{{{}}}'.format(i)
-        stash_sha = execute.check_output(['git', 'rev-parse', stash]).splitlines()[0]
-        messages.info('Would drop refs/{} ({})'.format(stash, stash_sha))
+        messages.info('Would drop refs/stash@{{{}}} ({})'.format(i, stashes[i].new_sha1))
 
 
-def _run(start, end, quiet):
-    start_stash = 'stash@{{{}}}'.format(start)
-    for i in range(start, end):
-        stash_sha = execute.check_output(['git', 'rev-parse', start_stash]).splitlines()[0]
-        execute.call(['git', 'stash', 'drop', '--quiet', start_stash])
-        messages.info('Dropped refs/stash@{{{}}} ({})'.format(i, stash_sha), quiet)
+def _run(stashes, start, end, quiet):
+    for i, stash in enumerate(git.drop_stashes(range(start, end), reflog=stashes), start):
+        messages.info('Dropped refs/stash@{{{}}} ({})'.format(i, stash.new_sha1), quiet)
 
 
-def _validate_bounds(start, end):
-    stash_count = len(execute.check_output(['git', 'stash', 'list']).splitlines())
+def _validate_bounds(start, end, stash_count):
     if end < 0:
         messages.error('end cannot be negative')
     elif end < start:
@@ -6,8 +6,16 @@ import os
 
 from enum import Enum
 
+try:
+    from shlex import quote
+except ImportError:  # pragma: no cover since only python 2 lacks shlex.quote
+    from pipes import quote
+
 from . import upstream
-from .utils import directories, execute, git, messages
+from .utils import cache, directories, execute, git, messages, parse_file
+
+_CACHE_NAME = 'changes'
+_MAX_CACHE_ENTRIES = 256
 
 
 class DetailsOption(Enum):
@@ -29,11 +37,45 @@ class CleanupOption(Enum):
     PRUNE = 2
 
 
-def _ambiguous_ref(ref):
-    ref_names = [r.split(' ')[1] for r in execute.check_output(['git', 'show-ref', '--tags', '--heads', ref]).splitlines()]
+def _ambiguous_ref(ref, ref_names=None):
+    if ref_names is None:
+        ref_names = git.matching_refs(ref, limit=(git.RefType.HEADS, git.RefType.TAGS))
     messages.error("'{0}' is an ambiguous ref. Use one of:\n{1}".format(ref, '\n'.join(ref_names)))
 
 
+def _resolve_committishes(repository, committishes):
+    """Resolve commit-ishes to the values stored for associations.
+
+    Refs are expanded to their full names using the repository's ref table and everything else is resolved to a SHA1
+    with one batched object lookup.
+
+    :param git.RepositoryContext repository: the repository
+    :param list committishes: the commit-ishes to resolve
+
+    :return list: the full ref name or SHA1 for each commit-ish
+    """
+
+    limit = (git.RefType.HEADS, git.RefType.TAGS)
+    resolved = []
+    for committish in committishes:
+        full_name = None
+        if repository.is_ref(committish):
+            if repository.is_ref_ambiguous(committish, limit=limit):
+                _ambiguous_ref(committish, repository.matching_refs(committish, limit=limit))
+            full_name = repository.symbolic_full_name(committish)
+        resolved.append(full_name)
+
+    # refs git won't expand, like those only matched by a trailing component, are resolved like any other revision
+    unresolved = [committish for committish, full_name in zip(committishes, resolved) if not full_name]
+    object_infos = dict(zip(unresolved, git.object_infos(unresolved))) if unresolved else {}
+    for i, committish in enumerate(committishes):
+        if not resolved[i]:
+            if not object_infos[committish]:
+                messages.error('{} is not a valid revision'.format(committish))
+            resolved[i] = object_infos[committish][0]
+    return resolved
+
+
 def associate(committish, quiet=False):
     """Associate the current branch with a commit-ish.
 
@@ -43,28 +85,87 @@ def associate(committish, quiet=False):
 
     if not directories.is_git_repository():
         messages.error("'{}' not a git repository".format(os.getcwd()))
-    elif git.is_empty_repository():
+
+    repository = git.RepositoryContext()
+    if repository.is_empty:
         messages.error('cannot associate while empty')
-    elif git.is_detached():
+    elif repository.is_detached:
         messages.error('cannot associate while HEAD is detached')
 
-    # is it a ref?
-    if git.is_ref(committish):
-        if not git.is_ref_ambiguous(committish, limit=(git.RefType.HEADS, git.RefType.TAGS)):
-            committish = git.symbolic_full_name(committish)
-        else:
-            _ambiguous_ref(committish)
-    else:
-        resolved_committish = git.resolve_sha1(committish)
-        if not resolved_committish:
-            messages.error('{} is not a valid revision'.format(committish))
-        committish = resolved_committish
+    committish = _resolve_committishes(repository, [committish])[0]
 
-    current_branch = git.current_branch()
+    current_branch = repository.current_branch
     execute.call(['git', 'config', '--local', 'git-changes.associations.' + current_branch + '.with', committish])
     messages.info('{} has been associated with {}'.format(current_branch, committish), quiet)
 
 
+def _read_associations(associations_file):
+    """Read the associations listed in a file.
+
+    Each line is split like a shell command into a branch and the commit-ish to associate it with. Blank lines and
+    comments starting with '#' are ignored.
+
+    :param str or unicode associations_file: path to the file or '-' to read from stdin
+
+    :return list: (branch, commit-ish) tuples in file order
+    """
+
+    associations = []
+    for line_number, words in parse_file.read_shell_words(associations_file, 'associations file', 'associations'):
+        if len(words) != 2:
+            messages.error('invalid associations line {}: expected a branch and a commit-ish'.format(line_number))
+        associations.append(tuple(words))
+    return associations
+
+
+def associate_from_file(associations_file, quiet=False):
+    """Associate many branches with commit-ishes listed in a file.
+
+    Every commit-ish is validated before any association is written.
+
+    :param str or unicode associations_file: path to the file or '-' to read from stdin
+    :param bool quiet: suppress non-error output
+    """
+
+    if not directories.is_git_repository():
+        messages.error("'{}' not a git repository".format(os.getcwd()))
+
+    repository = git.RepositoryContext()
+    if repository.is_empty:
+        messages.error('cannot associate while empty')
+
+    associations = _read_associations(associations_file)
+    if not associations:
+        return
+
+    committishes = _resolve_committishes(repository, [committish for _, committish in associations])
+    git.set_local_config_values(dict(
+        ('git-changes.associations.' + branch + '.with', committish)
+        for (branch, _), committish in zip(associations, committishes)
+    ))
+    for (branch, _), committish in zip(associations, committishes):
+        messages.info('{} has been associated with {}'.format(branch, committish), quiet)
+
+
+def export():
+    """Print every association as a line associate --from-file can read back.
+
+    :return str or unicode: the associations, one per line
+    """
+
+    if not directories.is_git_repository():
+        messages.error("'{}' not a git repository".format(os.getcwd()))
+
+    lines = []
+    for entry in execute.stdout(
+        ['git', 'config', '--local', '--null', '--get-regexp', r'^git-changes\.associations\..*\.with$']
+    ).split('\x00'):
+        if entry:
+            key, _, committish = entry.partition('\n')
+            lines.append('{} {}'.format(quote(key[25:-5]), quote(committish)))  # slice off git-changes.associations. and .with
+    return os.linesep.join(lines)
+
+
 def associate_upstream(quiet=False):
     """Associate the current branch with its upstream branch.
 
@@ -91,20 +192,26 @@ def _get_associated_branches():
 def _prune_associations(cleanup, quiet, dry_run=False):
     """Remove associations for branches that no longer exist."""
 
-    # get branches and associations
-    current_branches = [ref.split()[1][11:] for ref in execute.check_output('git show-ref --heads').splitlines()]
-    current_associations = _get_associated_branches()
-
-    branches_to_prune = current_associations
+    # a branch with several associations is listed once per value
+    branches_to_prune = []
+    for branch in _get_associated_branches():
+        if branch not in branches_to_prune:
+            branches_to_prune.append(branch)
     if cleanup == CleanupOption.PRUNE:
         # remove only stale associations
-        branches_to_prune = list(set(current_associations) - set(current_branches))
-    for to_prune in branches_to_prune:
-        if dry_run:
+        current_branches = set(ref.split()[1][11:] for ref in execute.check_output('git show-ref --heads').splitlines())
+        branches_to_prune = [branch for branch in branches_to_prune if branch not in current_branches]
+
+    if not branches_to_prune:
+        return
+    elif dry_run:
+        for to_prune in branches_to_prune:
             messages.info("Would remove association '{}'".format(to_prune), quiet)
-        else:
-            unassociate(to_prune)
-            messages.info("Removed association '{}'".format(to_prune), quiet)
+        return
+
+    git.set_local_config_values(dict(('git-changes.associations.' + branch + '.with', None) for branch in branches_to_prune))
+    for to_prune in branches_to_prune:
+        messages.info("Removed association '{}'".format(to_prune), quiet)
 
 
 def unassociate(branch=None, cleanup=None, quiet=False, dry_run=False):
@@ -196,12 +303,13 @@ def _print_changes(committish, details, color_when, files):
         command = ['git', 'diff', '--color={}'.format(color_when), '--stat', committish + '...HEAD']
         execute.call(_append_any_file_args(command, files))
     elif details == DetailsOption.COUNT:
-        command = ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish)]
-        log = execute.check_output(_append_any_file_args(command, files))
-        log = log.splitlines()
-        messages.info(str(len(log)))
+        command = ['git', 'rev-list', '--count', '{}..HEAD'.format(committish)]
+        count = _cached('count', committish, files, lambda: int(execute.check_output(_append_any_file_args(command, files))))
+        messages.info(str(count))
     elif details == DetailsOption.INVERSE_LOG:
-        merge_base = execute.check_output(['git', 'merge-base', committish, 'HEAD']).strip()
+        merge_base = _cached(
+            'merge-base', committish, None, lambda: execute.check_output(['git', 'merge-base', committish, 'HEAD']).strip()
+        )
         command = ['git', 'log', '--no-decorate', '--oneline', '-10', merge_base, '--color={}'.format(color_when)]
         execute.call(_append_any_file_args(command, files))
     else:
@@ -211,6 +319,34 @@ def _print_changes(committish, details, color_when, files):
         execute.call(_append_any_file_args(command, files))
 
 
+def _cached(kind, committish, files, compute):
+    """Return a value computed from the commits between a commit-ish and HEAD, reusing it while neither moves.
+
+    :param str kind: the kind of value
+    :param str or unicode committish: the commit-ish the value is computed against
+    :param list files: pathspecs the value is limited to
+    :param function compute: computes the value when it isn't cached
+
+    :return: the cached or computed value
+    """
+
+    commits = git.object_infos(['HEAD^{commit}', committish + '^{commit}'])
+    if not all(commits):
+        return compute()
+
+    key = ' '.join([kind, commits[0][0], commits[1][0]] + (files or []))
+    entries = cache.load(_CACHE_NAME)
+    if key in entries:
+        return entries[key]
+
+    value = compute()
+    if len(entries) >= _MAX_CACHE_ENTRIES:
+        entries = {}
+    entries[key] = value
+    cache.save(_CACHE_NAME, entries)
+    return value
+
+
 def _append_any_file_args(command, files):
     if files:
         command += ['--', ' '.join(files)]
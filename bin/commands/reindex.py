@@ -12,7 +12,6 @@ def reindex():
     if not directories.is_git_repository():
         messages.error("'{}' not a git repository".format(os.getcwd()))
 
-    indexed_files = execute.check_output(['git', 'diff', '--name-only', '--cached']).splitlines()
-    indexed_files = [f for f in indexed_files if f not in git.deleted_files()]
+    indexed_files = [e.path for e in git.status(untracked_files='no') if e.is_staged and not e.is_deleted]
     if indexed_files:
         execute.call(['git', 'add', '--'] + indexed_files)
@@ -2,69 +2,264 @@
 
 from __future__ import absolute_import
 
+import os
 import re
+import shutil
+import subprocess  # nosec
+import tempfile
+from collections import namedtuple
 
-from .utils import execute, messages
+from .utils import execute, git, messages
 
 
-def _is_valid_stash(stash):
-    """Determines if a stash reference is valid.
+_STASH = re.compile(r'^stash@{.*}$')
+_STASH_RANGE = re.compile(r'^stash@{(\d+)}\.\.stash@{(\d+)}$')
 
-    :param str or unicode stash: a stash reference
+# keeps each git clean command line well under the smallest common ARG_MAX
+_MAX_CLEAN_ARGUMENTS_LENGTH = 32 * 1024
 
-    :return bool: whether or not the stash is valid
+_Stash = namedtuple('_Stash', ['name', 'sha1', 'base', 'untracked', 'modified'])
+
+
+def _expand_stashes(stashes):
+    """Expand stash ranges and drop duplicate stash references.
+
+    :param list stashes: stash references or inclusive ranges of them, like stash@{1}..stash@{3}
+
+    :return list: the stash references in the order given
     """
 
-    if re.match('^stash@{.*}$', stash) is None:
-        return False
-    return execute.swallow(['git', 'cat-file', '-t', stash]) == 0
+    expanded = []
+    for stash in stashes:
+        stash_range = _STASH_RANGE.match(stash)
+        if stash_range:
+            first, last = sorted(int(index) for index in stash_range.groups())
+            names = ['stash@{{{}}}'.format(index) for index in range(first, last + 1)]
+        else:
+            names = [stash]
+        expanded += [name for name in names if name not in expanded]
+    return expanded
+
 
+def _resolve_stashes(stashes):
+    """Validate stash references and resolve the commits each one is made of.
 
-def _parents(commit):
-    """Returns the parents of a commit.
+    Numeric references are looked up in the stash reflog and every remaining revision is resolved in one batch by the
+    shared cat-file process.
 
-    :param str or unicode commit: a commit to find parents of
+    :param list stashes: stash references
 
-    :return list: a list of parent SHAs
+    :return list: a _Stash for each reference
     """
 
-    return execute.check_output(['git', 'rev-list', '--parents', '-1', commit]).strip().split(' ')[1:]
+    reflog = git.stash_reflog()
+    if not reflog:
+        messages.error('no stashes exist')
 
+    revisions = []
+    for stash in stashes:
+        if _STASH.match(stash) is None:
+            messages.error('{} is not a valid stash reference'.format(stash))
+        index = re.match(r'^stash@{(\d+)}$', stash)
+        if index and int(index.group(1)) >= len(reflog):
+            messages.error('{} is not a valid stash reference'.format(stash))
+        revisions.append(reflog[int(index.group(1))].new_sha1 if index else stash)
 
-def restash(stash='stash@{0}', quiet=False):
-    """Restash a stash reference.
+    # resolving numeric references from the reflog first keeps cat-file from dying on indexes out of range
+    objects = git.object_infos([
+        object_.format(revision)
+        for revision in revisions
+        for object_ in ('{}', '{}^{{tree}}', '{}^1', '{}^1^{{tree}}', '{}^3')
+    ])
 
-    :param str or unicode stash: stash reference to reverse apply
+    resolved = []
+    for i, stash in enumerate(stashes):
+        sha1, tree, base, base_tree, untracked = objects[i * 5:i * 5 + 5]
+        if not sha1 or sha1[1] != 'commit' or not base or base[1] != 'commit':
+            messages.error('{} is not a valid stash reference'.format(stash))
+        resolved.append(_Stash(stash, sha1[0], base[0], untracked[0] if untracked else None, tree != base_tree))
+    return resolved
+
+
+def restash(stashes=('stash@{0}',), quiet=False):
+    """Restash stash references.
+
+    :param list stashes: stash references, or ranges of them, to reverse apply
     :param bool quiet: suppress all output
     """
 
-    if not execute.check_output('git stash list'):
-        messages.error('no stashes exist')
-    if not _is_valid_stash(stash):
-        messages.error('{} is not a valid stash reference'.format(stash))
+    stashes = _resolve_stashes(_expand_stashes(stashes))
+    _reverse_modifications(stashes)
+    _remove_untracked_files(stashes)
+
+    for stash in stashes:
+        messages.info('Restashed {} ({})'.format(stash.name, stash.sha1), quiet)
+
+
+def _unmerged_entries(env):
+    """Read the unmerged entries of an index.
+
+    :return dict: path to a dict of stage to (mode, SHA1)
+    """
+
+    stages = {}
+    for record in execute.records(['git', 'ls-files', '--unmerged', '-z'], env=env):
+        info, path = record.split('\t', 1)
+        mode, sha1, stage = info.split(' ')
+        stages.setdefault(path, {})[int(stage)] = (mode, sha1)
+    return stages
+
+
+def _merge_entry(stages):
+    """Merge the reversal of a stash into a file that has also changed since the stash.
+
+    :param dict stages: the file's unmerged index entries
+
+    :return tuple: the (mode, SHA1) of the merged file or None if it cannot be merged cleanly
+    """
+
+    # stage 1 is the stash, 2 is the working tree, and 3 is the commit the stash was created on
+    if sorted(stages) != [1, 2, 3] or not all(mode.startswith('100') for mode, _ in stages.values()):
+        return None
 
-    _reverse_modifications(stash)
-    _remove_untracked_files(stash)
+    stash_file, worktree_file, base_file = [
+        execute.check_output(['git', 'unpack-file', stages[stage][1]]).strip() for stage in (1, 2, 3)
+    ]
+    reapplied_file = worktree_file + '.reapplied'
+    try:
+        with open(worktree_file, 'rb') as unpacked_file:
+            worktree_content = unpacked_file.read()
+        if execute.swallow(['git', 'merge-file', '--quiet', worktree_file, stash_file, base_file]):
+            return None
 
-    stash_sha = execute.check_output(['git', 'rev-parse', stash]).splitlines()[0]
-    messages.info('Restashed {} ({})'.format(stash, stash_sha), quiet)
+        # applying the stash to the merged file must give back the working tree, otherwise the stash was never applied
+        shutil.copyfile(worktree_file, reapplied_file)
+        if execute.swallow(['git', 'merge-file', '--quiet', reapplied_file, base_file, stash_file]):
+            return None
+        with open(reapplied_file, 'rb') as unpacked_file:
+            if unpacked_file.read() != worktree_content:
+                return None
 
+        sha1 = execute.check_output(['git', 'hash-object', '-w', '--no-filters', worktree_file]).strip()
+    finally:
+        for unpacked_file in (stash_file, worktree_file, base_file, reapplied_file):
+            if os.path.exists(unpacked_file):
+                os.remove(unpacked_file)
 
-def _reverse_modifications(stash):
-    # if there are modifications, reverse apply them
-    reverse_patch = execute.check_output(['git', 'stash', 'show', '--patch', '--no-color', stash])
-    if reverse_patch:
-        return_code = execute.call_input(['git', 'apply', '--reverse'], reverse_patch)
-        if return_code:
+    # keep a mode change made since the stash, otherwise take the mode the stash was created on
+    mode = stages[3][0] if stages[2][0] == stages[1][0] else stages[2][0]
+    return mode, sha1
+
+
+def _remove_empty_directories(directory):
+    try:
+        os.removedirs(directory)
+    except OSError:
+        pass  # the directory isn't empty or is the top of the working tree
+
+
+def _remove_path(path):
+    if os.path.lexists(path):
+        os.remove(path)
+        _remove_empty_directories(os.path.dirname(path))
+
+
+def _reverse_modifications(stashes):
+    """Reverse the modifications of stashes in the working tree.
+
+    Rather than reverse applying each stash as a text patch, the working tree is merged with the commit each stash was
+    created on using the stash itself as the merge base. The merges happen one after another between trees in a
+    temporary index so only files the stashes modified are read, and the working tree is written once only after every
+    stash has been reversed cleanly. Lists of paths are piped from one git command to the next rather than read into
+    memory.
+
+    :param list stashes: the _Stash for each stash to reverse
+    """
+
+    stashes = [stash for stash in stashes if stash.modified]
+    if not stashes:
+        return
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ, GIT_INDEX_FILE=os.path.join(temp_dir, 'index'))
+        try:
+            # the first stash with the files any stash modified as they are in the working tree
+            execute.check_output(['git', 'read-tree', stashes[0].sha1], env=env)
+            for stash in stashes:
+                if execute.pipe(
+                    ['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', stash.base, stash.sha1],
+                    ['git', 'update-index', '--add', '--remove', '-z', '--stdin'],
+                    env=env
+                ):
+                    messages.error('unable to reverse modifications', exit_=True)
+            worktree = tree = execute.check_output(['git', 'write-tree'], env=env).strip()
+
+            for stash in stashes:
+                # a path still as it was before the stash merges trivially, but its modifications were never applied
+                changed_since_base = set(
+                    execute.records(['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', stash.base, tree], env=env)
+                )
+                modified = execute.records(['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', stash.base, stash.sha1], env=env)
+                if any(path not in changed_since_base for path in modified):
+                    messages.error('unable to reverse modifications', exit_=True)
+
+                execute.check_output(['git', 'read-tree', '-m', '-i', '--aggressive', stash.sha1, tree, stash.base], env=env)
+                index_info = ''
+                for path, stages in _unmerged_entries(env).items():
+                    merged = _merge_entry(stages)
+                    if not merged:
+                        messages.error('unable to reverse modifications', exit_=True)
+                    index_info += '{} {}\t{}\0'.format(merged[0], merged[1], path)
+                if index_info:
+                    execute.call_input(['git', 'update-index', '-z', '--index-info'], index_info, env=env)
+                tree = execute.check_output(['git', 'write-tree'], env=env).strip()
+        except subprocess.CalledProcessError:
+            messages.error('unable to reverse modifications', exit_=True)
+
+        # write every file whose reversed content differs from the working tree then remove the ones reversed away
+        if execute.pipe(
+            ['git', 'diff-index', '--cached', '-z', '--name-only', '--diff-filter=AMT', worktree],
+            ['git', 'checkout-index', '--force', '-z', '--stdin'],
+            env=env
+        ):
             messages.error('unable to reverse modifications', exit_=True)
+        for path in execute.records(['git', 'diff-index', '--cached', '-z', '--name-only', '--diff-filter=D', worktree], env=env):
+            _remove_path(path)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def _clean(paths):
+    execute.call(['git', '--literal-pathspecs', 'clean', '--force', '--quiet', '--'] + paths)
+
+
+def _remove_untracked_files(stashes):
+    """Remove the untracked files saved by stashes.
+
+    Untracked files are listed recursively and passed to git clean in batches small enough to stay under any command
+    line length limit. Directories left empty are removed afterwards.
+
+    :param list stashes: the _Stash for each stash to remove untracked files for
+    """
 
+    # the third parent of a stash commit contains the untracked files
+    untracked_files = set()
+    for stash in stashes:
+        if stash.untracked:
+            untracked_files.update(execute.records(['git', 'ls-tree', '-r', '-z', '--name-only', stash.untracked]))
 
-def _remove_untracked_files(stash):
-    # check if we need remove any untracked files. For a stash ref, the third parent contains the untracked files.
-    parents = _parents(stash)
-    if len(parents) == 3:
-        untracked_files = execute.check_output(['git', 'ls-tree', '--name-only', '{}^3'.format(stash)]).splitlines()
+    # it's possible to have three parents and no untracked files if --include-untracked was unnecessarily used
+    batch, batch_length = [], 0
+    for path in sorted(untracked_files):
+        if batch and batch_length + len(path) > _MAX_CLEAN_ARGUMENTS_LENGTH:
+            _clean(batch)
+            batch, batch_length = [], 0
+        batch.append(path)
+        batch_length += len(path) + 1
+    if batch:
+        _clean(batch)
 
-        # it's possible to have three parents and no untracked files if --include-untracked was unnecessarily used
-        if untracked_files:
-            execute.call(['git', 'clean', '--force', '--quiet', '--'] + untracked_files)
+    for directory in sorted(set(os.path.dirname(path) for path in untracked_files), reverse=True):
+        if directory:
+            _remove_empty_directories(directory)
@@ -2,63 +2,317 @@
 
 from __future__ import absolute_import
 
+import os
+import shutil
+import subprocess  # nosec
+import tempfile
 import time
+from collections import namedtuple
 
-from .utils import execute, messages
+from .utils import execute, git, messages, parse_file
 
+# the working tree top level, the index path, the HEAD SHA1, and the '<branch>: <abbreviated SHA1> <subject>' summary
+_Head = namedtuple('_Head', ['toplevel', 'index', 'sha1', 'summary'])
 
-def _stash_buffer(quiet):
+
+def _stash_environment():
+    """Date the next stash so it cannot collide with the last one.
+
+    Two stashes of the same contents created within the same second are the same commit. Rather than waiting for the
+    clock to move on, date the new stash one second after the last one.
+
+    :return dict: the environment to create the stash with or None to use the current environment
     """
-    You cannot create two stashes of the same contents within the same second. So wait if we've executed too quickly.
+
+    stashes = git.stash_reflog()
+    if not stashes or stashes[0].timestamp < int(time.time()):
+        return None
+
+    stash_date = '@{} {}'.format(stashes[0].timestamp + 1, stashes[0].timezone)
+    return dict(os.environ, GIT_AUTHOR_DATE=stash_date, GIT_COMMITTER_DATE=stash_date)
+
+
+def _snapshot_message(stash):
+    """The message a snapshot was created with: everything after the 'On <branch>: ' prefix.
+
+    Branch names cannot contain ':' so the first ': ' always ends the prefix.
     """
+    return stash.message.split(': ', 1)[-1] if stash.message else None
 
-    # TODO: this should check that the stash would be a duplicate first
-    if execute.check_output('git stash list').strip():
-        last_stash_date = execute.check_output(['git', 'show', '-s', '--format=%ci', 'stash@{0}']).rstrip()
-        warned = False
-        while last_stash_date == time.strftime('%Y-%m-%d %H:%M:%S %z'):
-            warned = messages.warn('snapshot created too close to last stash', quiet=quiet, ignore=warned)
-            time.sleep(0.1)
 
+def _drop_stashes_by_message(snapshot_messages):
+    """Drop the newest snapshot with each message.
 
-def _drop_stash_by_message(message):
-    if not message:
+    :param list snapshot_messages: messages of the snapshots to drop
+    """
+
+    snapshot_messages = [message for message in snapshot_messages if message]
+    if not snapshot_messages:
         return
 
-    stashes = execute.check_output('git stash list').strip().splitlines()
-    for stash in stashes:
-        # include ': ' to make sure the match is the entire message
-        if stash.endswith(': ' + message):
-            stash_ref = stash[:stash.index(':')]
-            execute.call(['git', 'stash', 'drop', '--quiet', stash_ref])
-            return
+    stashes = git.stash_reflog()
+    stash_indexes = {}
+    for index, stash in enumerate(stashes):
+        stash_indexes.setdefault(_snapshot_message(stash), index)
+
+    indexes = [stash_indexes[message] for message in snapshot_messages if message in stash_indexes]
+    if indexes:
+        git.drop_stashes(indexes, stashes)
+
+
+def _read_manifest(manifest):
+    """Read the snapshots listed in a manifest.
+
+    Each line is split like a shell command: the first word is the snapshot message and any remaining words are the
+    pathspecs it covers. Blank lines and comments starting with '#' are ignored.
+
+    :param str or unicode manifest: path to the manifest or '-' to read from stdin
+
+    :return list: (message, pathspecs) tuples in manifest order
+    """
+
+    return [(words[0], words[1:]) for _, words in parse_file.read_shell_words(manifest, 'manifest', 'manifest')]
+
+
+def _head():
+    """Describe HEAD the way `git stash` does in its commit messages and locate the working tree and index.
+
+    :return _Head: the HEAD state
+    """
+
+    head = execute.stdout(['git', 'log', '-1', '--format=%H%n%h %s']).splitlines()
+    if not head:
+        messages.error('you do not have the initial commit yet')
+
+    toplevel, index, branch = execute.check_output(
+        ['git', 'rev-parse', '--show-toplevel', '--git-path', 'index', '--symbolic-full-name', 'HEAD']
+    ).splitlines()
+    branch = branch[len('refs/heads/'):] if branch.startswith('refs/heads/') else '(no branch)'
+    return _Head(toplevel, os.path.abspath(index), head[0], '{}: {}'.format(branch, head[1]))
+
+
+def _write_tree(head, index_file, paths=None, env=None):
+    """Update an index from the working tree and write it as a tree without touching the real index.
+
+    :param _Head head: the HEAD state
+    :param str index_file: the index to use. A missing file is an empty index.
+    :param list paths: paths relative to the top of the working tree to add, update, or remove in the index first
+    :param dict env: the environment to run with
+
+    :return str: the tree SHA1
+    """
+
+    env = dict(env or os.environ, GIT_INDEX_FILE=index_file)
+    if paths:
+        update_command = ['git', '-C', head.toplevel, 'update-index', '--add', '--remove', '-z', '--stdin']
+        if execute.call_input(update_command, '\x00'.join(paths) + '\x00', env=env):
+            messages.error('cannot save the current worktree state')
+    try:
+        return execute.check_output(['git', 'write-tree'], env=env).strip()
+    except subprocess.CalledProcessError:
+        messages.error('cannot save the current index state')
+
+
+def _commit_tree(tree, parents, message, env=None):
+    commit_command = ['git', 'commit-tree', tree]
+    for parent in parents:
+        commit_command += ['-p', parent]
+    return execute.check_output(commit_command + ['-m', message], env=env).strip()
+
+
+def _store_snapshot(head, temp_dir, entries, message):
+    """Build a stash from the index and the given status entries and add it to the stash reflog.
+
+    The stash has the same shape as one from `git stash push --include-untracked`: a working tree commit whose parents
+    are HEAD, a commit of the index, and, if there are any, a commit of the untracked files.
+
+    :return str: the stash message
+    """
+
+    env = _stash_environment()
+
+    index_file = os.path.join(temp_dir, 'index')
+    if os.path.exists(head.index):
+        shutil.copyfile(head.index, index_file)
+    index_commit = _commit_tree(_write_tree(head, index_file, env=env), [head.sha1], 'index on ' + head.summary, env)
+    parents = [head.sha1, index_commit]
+
+    untracked = [entry.path for entry in entries if entry.is_untracked]
+    if untracked:
+        untracked_file = os.path.join(temp_dir, 'untracked-index')
+        untracked_tree = _write_tree(head, untracked_file, untracked, env)
+        os.remove(untracked_file)
+        parents.append(_commit_tree(untracked_tree, [], 'untracked files on ' + head.summary, env))
+
+    # the index copy is updated in place with the tracked working tree changes
+    worktree = [entry.path for entry in entries if not entry.is_untracked and entry.worktree_state != '.']
+    worktree_tree = _write_tree(head, index_file, worktree, env)
 
+    if message:
+        stash_message = 'On {}: {}'.format(head.summary.split(':', 1)[0], message)
+    else:
+        stash_message = 'WIP on ' + head.summary
+    stash = _commit_tree(worktree_tree, parents, stash_message, env)
+    execute.call(['git', 'update-ref', '--create-reflog', '-m', stash_message, 'refs/stash', stash], env=env)
+    return stash_message
 
-def snapshot(message=None, replace=False, quiet=False, files=None):
+
+def _match_manifest(snapshots):
+    """Match each manifest snapshot's pathspecs against a single status scan.
+
+    :param list snapshots: (message, pathspecs) tuples
+
+    :return list: (message, status entries) tuples
+    """
+
+    entries = list(git.status())
+    return [(message, [
+        entry for entry in entries
+        if git.matches_pathspecs(entry.path, pathspecs) or
+        (entry.original_path and git.matches_pathspecs(entry.original_path, pathspecs))
+    ]) for message, pathspecs in snapshots]
+
+
+def _create_snapshots(snapshots, replace=False, quiet=False):
+    """Create a snapshot for each (message, status entries) pair. Pairs without any entries are skipped.
+
+    Every stash is built from git objects directly so files in the working tree are never removed and rewritten.
+    """
+
+    if replace:
+        _drop_stashes_by_message([message for message, entries in snapshots if entries])
+
+    head = None
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for message, entries in snapshots:
+            if not entries:
+                messages.info("No local changes to save for '{}'. No snapshot created.".format(message), quiet)
+                continue
+            head = head or _head()
+            stash_message = _store_snapshot(head, temp_dir, entries, message)
+            messages.info('Saved working directory and index state ' + stash_message, quiet)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def snapshot(message=None, replace=False, quiet=False, files=None, manifest=None):
     """Create a snapshot of the working directory and index.
 
     :param str or unicode message: the message to use when creating the underlying stash
     :param bool replace: replace any existing snapshot with the same message
     :param bool quiet: suppress all output
     :param list files: a list of pathspecs to specific files to use when creating the snapshot
+    :param str or unicode manifest: path to a manifest of snapshots to create or '-' to read from stdin. Each line is a
+        message followed by the pathspecs to include. Takes the place of message and files.
     """
 
-    status_output = execute.check_output('git status --porcelain').splitlines()
+    if manifest is not None:
+        _create_snapshots(_match_manifest(_read_manifest(manifest)), replace, quiet)
+        return
 
-    # if there aren't any changes then we don't have anything to do
-    if not status_output:
+    entries = list(git.status(pathspecs=files))
+    if not entries:
         messages.info('No local changes to save. No snapshot created.', quiet)
         return
 
-    if replace:
-        _drop_stash_by_message(message)
+    _create_snapshots([(message, entries)], replace, quiet)
+
+
+class _SnapshotInfo(object):
+    """The metadata shown for a snapshot when listing."""
+
+    __slots__ = ('message', 'timestamp', 'files', 'insertions', 'deletions')
+
+    def __init__(self, message, timestamp):
+        self.message = message
+        self.timestamp = timestamp
+        self.files = 0
+        self.insertions = 0
+        self.deletions = 0
+
+    def add_numstat(self, line):
+        """Count a `--numstat` line. Binary files count as a file without any lines."""
+        insertions, deletions, _ = line.split('\t', 2)
+        self.files += 1
+        self.insertions += int(insertions) if insertions != '-' else 0
+        self.deletions += int(deletions) if deletions != '-' else 0
+
+    def format(self, index):
+        return 'stash@{{{}}}: {} ({}, {} file{}, +{} -{})'.format(
+            index,
+            self.message,
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(self.timestamp)),
+            self.files,
+            '' if self.files == 1 else 's',
+            self.insertions,
+            self.deletions
+        )
+
+
+def _read_snapshot_infos():
+    """Read the metadata of every snapshot.
+
+    :return list: _SnapshotInfo objects, newest first, so an entry's index is its stash@{index}
+    """
+
+    log = execute.stdout([
+        'git', 'log', '--walk-reflogs', '--first-parent', '-m', '--numstat', '--format=%x00%P%x1f%ct%x1f%gs', 'refs/stash'
+    ])
+
+    infos = []
+    untracked = {}
+    for record in log.split('\x00')[1:]:
+        lines = record.split('\n')
+        parents, timestamp, message = lines[0].split('\x1f', 2)
+        info = _SnapshotInfo(message, int(timestamp))
+        for line in lines[1:]:
+            if line:
+                info.add_numstat(line)
+        infos.append(info)
+
+        # the third parent is the commit of untracked files
+        parents = parents.split()
+        if len(parents) > 2:
+            untracked.setdefault(parents[2], []).append(info)
+
+    if untracked:
+        diff = execute.stdout(['git', 'diff-tree', '--stdin', '-r', '--root', '--numstat'], '\n'.join(untracked) + '\n')
+        current = []
+        for line in diff.splitlines():
+            if '\t' not in line:
+                current = untracked.get(line, [])
+                continue
+            for info in current:
+                info.add_numstat(line)
+
+    return infos
+
+
+def list_():
+    """List snapshots with their date and the number of files and lines they change."""
+
+    infos = _read_snapshot_infos()
+    if infos:
+        messages.info(os.linesep.join(info.format(index) for index, info in enumerate(infos)))
+
+
+def restore(message, quiet=False):
+    """Restore the newest snapshot with a message to the working directory and index.
+
+    The snapshot is kept so it can be restored again.
+
+    :param str or unicode message: the message the snapshot was created with
+    :param bool quiet: suppress all output
+
+    :return int: the status code of applying the snapshot
+    """
 
-    stash_command = ['git', 'stash', 'push', '--include-untracked']
-    stash_command = stash_command if not quiet else stash_command + ['--quiet']
-    stash_command = stash_command if message is None else stash_command + ['--message', message]
-    stash_command = stash_command if not files else stash_command + ['--'] + files
-    _stash_buffer(quiet)
-    execute.call(stash_command)
+    stashes = git.stash_reflog()
+    index = next((i for i, stash in enumerate(stashes) if _snapshot_message(stash) == message), None)
+    if index is None:
+        messages.error("no snapshot found with message '{}'".format(message))
 
-    # apply isn't completely quiet when the stash only contains untracked files so swallow all output
-    execute.swallow(['git', 'stash', 'apply', '--quiet', '--index'])
+    apply_command = ['git', 'stash', 'apply', '--index']
+    apply_command = apply_command if not quiet else apply_command + ['--quiet']
+    return execute.call(apply_command + ['stash@{{{}}}'.format(index)])
@@ -2,18 +2,22 @@
 
 from __future__ import absolute_import
 
+import errno
+import fcntl
 import os
 import re
 import shlex
+import struct
 import sys
-from ast import literal_eval
+import termios
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 import colorama
 
 from . import settings
 from .stateextensions import status
-from .utils import directories, execute, git, messages, parse_string
+from .utils import cache, directories, execute, git, messages, parse_string
 
 
 def _print_section(title, accent=None, text=None, format_='compact', show_empty=False, color='auto'):
@@ -62,32 +66,108 @@ def _resolve_header_color(color):
     return header_color
 
 
-def _print_sections(sections, order=[], page=False, clear=False):
+def _terminal_lines():
+    """Determine the height of the terminal without forking `tput`.
 
-    state_result = ''
+    :return int: the number of lines in the terminal attached to stdout or stderr, $LINES, or 24 if neither is known
+    """
 
-    # print sections with a predefined order
-    for section in order:
-        if section in sections:
-            state_result += sections.pop(section)
+    for stream in (sys.__stdout__, sys.__stderr__):
+        try:
+            window_size = fcntl.ioctl(stream.fileno(), termios.TIOCGWINSZ, struct.pack('HHHH', 0, 0, 0, 0))
+        except (AttributeError, IOError, OSError, ValueError):
+            continue
+        terminal_lines = struct.unpack('HHHH', window_size)[0]
+        if terminal_lines:
+            return terminal_lines
+    try:
+        return int(os.environ.get('LINES', 24))
+    except ValueError:
+        return 24
 
-    # print any remaining sections in the order they were defined
-    for section_info in sections:
-        state_result += sections[section_info]
 
-    if state_result:
-        state_result = state_result[:-1]  # strip the extra trailing newline
-        state_lines = len(state_result.splitlines())
-        terminal_lines = literal_eval(execute.check_output(['tput', 'lines']))
-        if not page or terminal_lines >= state_lines + 2:  # one for the newline and one for the prompt
-            if clear and sys.stdout.isatty():
-                execute.call('clear')
-            messages.info(state_result)
-        else:
-            execute.pipe(['echo', state_result], ['less', '-r'])
+def _write_to_pager(pager, text):
+    """Write text to a pager, returning False once the pager has been closed."""
 
+    try:
+        pager.stdin.write(text.encode('UTF-8'))
+        pager.stdin.flush()
+    except (IOError, OSError) as e:
+        if e.errno != errno.EPIPE:
+            raise
+        return False
+    return True
 
-def _run_extension(extension, options, show_color):
+
+def _order_sections(sections, order=[]):
+    """Order sections so those named in order come first followed by the rest in the order they were defined."""
+
+    ordered_sections = OrderedDict((section, sections[section]) for section in order if section in sections)
+    for section in sections:
+        ordered_sections.setdefault(section, sections[section])
+    return ordered_sections
+
+
+def _print_sections(sections, page=False, clear=False):
+    """Print sections as they become available.
+
+    When paging, output is held until it either ends or outgrows the terminal. In the latter case `less` is started
+    and everything, including sections still to come, is written to it.
+
+    :param sections: an iterable of section texts in the order to print them
+    :param bool page: page output if too long
+    :param bool clear: clear terminal before printing
+    """
+
+    buffered = []
+    buffered_lines = 0
+    terminal_lines = None
+    pager = None
+    streaming = False
+    held = ''  # the final character is held back so the trailing newline can be stripped
+
+    for section in sections:
+        if not section:
+            continue
+        text, held = held + section[:-1], section[-1]
+
+        if pager:
+            if not _write_to_pager(pager, text):
+                break
+        elif streaming:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        elif page:
+            buffered.append(text)
+            buffered_lines += text.count('\n')
+            terminal_lines = terminal_lines or _terminal_lines()
+            if terminal_lines < buffered_lines + 1 + 2:  # one for the newline and one for the prompt
+                pager = execute.open_input(['less', '-r'])
+                _write_to_pager(pager, ''.join(buffered))
+                buffered = []
+        else:
+            if clear and sys.stdout.isatty():
+                execute.call('clear')
+            streaming = True
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    if pager:
+        _write_to_pager(pager, os.linesep)
+        try:
+            pager.stdin.close()
+        except (IOError, OSError):  # pragma: no cover since this only happens when less quits early
+            pass
+        pager.wait()
+    elif streaming:
+        sys.stdout.write(os.linesep)
+    elif held:
+        if clear and sys.stdout.isatty():
+            execute.call('clear')
+        messages.info(''.join(buffered))
+
+
+def _extension_command(extension, options, show_color):
     extension_command = git.get_config_value('git-state.extensions.' + extension + '.command')
     extension_name = git.get_config_value('git-state.extensions.' + extension + '.name', default=extension)
 
@@ -104,17 +184,119 @@ def _run_extension(extension, options, show_color):
     if git.get_config_value('git-state.extensions.' + extension + '.color', default=True, as_type=parse_string.as_bool):
         extension_command += ['--color={}'.format(show_color)]
 
-    extension_out, extension_error, extension_code = execute.execute(extension_command)
-    extension_text = extension_out if not extension_code else extension_error
+    extension_timeout = git.get_config_value(
+        'git-state.extensions.' + extension + '.timeout',
+        default=git.get_config_value('git-state.timeout', as_type=float),
+        as_type=float
+    )
+    extension_cache = git.get_config_value(
+        'git-state.extensions.' + extension + '.cache',
+        default=False,
+        as_type=parse_string.as_bool
+    )
+
+    return extension_name, extension_command, extension_timeout, extension_cache
+
+
+def _execute_extension(extension_command, timeout=None):
+    """Execute an extension command.
+
+    :return tuple: the section text and whether the command finished successfully
+    """
 
-    return extension_name, extension_text
+    try:
+        extension_out, extension_error, extension_code = execute.execute(extension_command, timeout=timeout)
+    except execute.TimeoutExpired as e:
+        # keep whatever was printed before the extension was killed
+        partial_output = e.output if not e.output or e.output.endswith(os.linesep) else e.output + os.linesep
+        return (partial_output or '') + 'timed out after {:g}s'.format(timeout) + os.linesep, False
+    return (extension_out, True) if not extension_code else (extension_error, False)
+
+
+def _execute_extension_command(extension_command):
+    _, command, timeout, _ = extension_command
+    return _execute_extension(command, timeout)
+
+
+def _run_extension(extension, options, show_color):
+    extension_name, extension_command, extension_timeout, _ = _extension_command(extension, options, show_color)
+    return extension_name, _execute_extension(extension_command, extension_timeout)[0]
+
+
+def _repository_fingerprint():
+    # dropping any stash but the newest only rewrites the stash reflog
+    return cache.fingerprint('HEAD', 'index', 'packed-refs', 'refs', os.path.join('logs', 'refs', 'stash'))
+
+
+def _run_extensions(extension_commands, jobs=None):
+    """Run extension commands concurrently.
+
+    Extensions that allow caching reuse their last output when neither the command nor HEAD, the index, any ref, or
+    the stash list has changed since it was cached. Edits to the working tree alone never invalidate the cache.
+
+    :param list extension_commands: a list of (name, command, timeout, cache) tuples
+    :param int jobs: the maximum number of extensions to run at once. All extensions run at once if None or less than 1.
+
+    :return generator: (name, text) pairs in the same order as the commands. Each is yielded once it and every
+        extension before it has finished.
+    """
+
+    if not extension_commands:
+        return
+
+    fingerprint = None
+    cached_extensions = {}
+    texts = [None] * len(extension_commands)
+    if any(cache_allowed for _, _, _, cache_allowed in extension_commands):
+        fingerprint = _repository_fingerprint()
+        cached_extensions = cache.load('state')
+        for i, (name, command, _, cache_allowed) in enumerate(extension_commands):
+            cached = cached_extensions.get(name)
+            if cache_allowed and fingerprint and cached and cached.get('fingerprint') == fingerprint \
+                    and cached.get('command') == command:
+                texts[i] = cached.get('text')
+
+    to_run = [i for i, text in enumerate(texts) if text is None]
+    results = _execute_extension_commands([extension_commands[i] for i in to_run], jobs)
+
+    cache_updated = False
+    for i, (name, command, _, cache_allowed) in enumerate(extension_commands):
+        if texts[i] is None:
+            texts[i], finished = next(results)
+            if cache_allowed and fingerprint and finished:
+                cached_extensions[name] = {'fingerprint': fingerprint, 'command': command, 'text': texts[i]}
+                cache_updated = True
+
+            # save as soon as the last extension finishes rather than waiting on the caller to read everything
+            if cache_updated and i == to_run[-1]:
+                cache.save('state', cached_extensions)
+        yield name, texts[i]
+
+
+def _execute_extension_commands(extension_commands, jobs):
+    if not extension_commands:
+        return
+
+    jobs = len(extension_commands) if not jobs or jobs < 1 else min(jobs, len(extension_commands))
+    if jobs == 1:
+        for command in extension_commands:
+            yield _execute_extension_command(command)
+        return
+
+    pool = ThreadPool(jobs)
+    try:
+        for result in pool.imap(_execute_extension_command, extension_commands):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
 
 
 def _extension_exists(extension):
     return bool(int(settings.list_('git-state.extensions.' + extension, format_=settings.FormatOption.COUNT)))
 
 
-def edit_extension(extension, command=None, name=None, options=None, show=None, color=True, config=None):
+def edit_extension(extension, command=None, name=None, options=None, show=None, color=True, timeout=None, cache=None, config=None):
     extension_section = 'git-state.extensions.' + extension
     already_exists = _extension_exists(extension)
     if command:
@@ -127,6 +309,10 @@ def edit_extension(extension, command=None, name=None, options=None, show=None,
         _update_extension_config(config, extension_section, 'show', str(show))
     if color is not None:
         _update_extension_config(config, extension_section, 'color', str(color))
+    if timeout is not None:
+        _update_extension_config(config, extension_section, 'timeout', '{:g}'.format(timeout))
+    if cache is not None:
+        _update_extension_config(config, extension_section, 'cache', str(cache))
     messages.info('Extension {} {}'.format(extension, 'updated' if already_exists else 'created'))
 
 
@@ -166,8 +352,7 @@ def run_extension(extension):
         extension_name, extension_text = _run_extension(extension, {}, color_when)
         format_ = git.get_config_value('git-state.format', default='compact')
         section_text = _print_section(extension_name, text=extension_text, format_=format_, show_empty=True, color=color_when)
-        sections = {extension_name: section_text}
-        _print_sections(sections, page=True)
+        _print_sections([section_text], page=True)
 
 
 def delete_extension(extension, quiet=False):
@@ -188,6 +373,7 @@ def state(**kwargs):
     :keyword list order: order to print sections in
     :keyword bool clear: clear terminal before printing
     :keyword bool page: page output if too long
+    :keyword int jobs: maximum number of extensions to run at once
     """
 
     if not directories.is_git_repository():
@@ -214,9 +400,10 @@ def state(**kwargs):
         extensions = _resolve_extensions(extensions, show_extensions, ignore_extensions)
 
         if 'status' in extensions:
-            status_output = status.get(new_repository=True, **kwargs)
+            status_result = status.run(new_repository=True, **kwargs)
+            status_output = status.get(new_repository=True, status_result=status_result, **kwargs)
             status_title = status.title()
-            status_accent = status.accent(new_repository=True, **kwargs)
+            status_accent = status.accent(new_repository=True, status_result=status_result, **kwargs)
             sections[status_title] = _print_section(status_title, status_accent, status_output, format_, show_empty=show_empty, color=show_color)
             extensions.remove('status')
     else:
@@ -224,13 +411,15 @@ def state(**kwargs):
         extensions = _resolve_extensions(extensions, show_extensions, ignore_extensions)
 
         if 'status' in extensions:
-            status_output = status.get(**kwargs)
+            status_result = status.run(**kwargs)
+            status_output = status.get(status_result=status_result, **kwargs)
             status_title = status.title()
-            status_accent = status.accent(show_color=show_color)
+            status_accent = status.accent(show_color=show_color, status_result=status_result)
             sections[status_title] = _print_section(status_title, status_accent, status_output, format_, show_empty=show_empty, color=show_color)
             extensions.remove('status')
 
-        # show any user defined sections
+        # show any user defined sections. They are run once the print order is known so each can be printed as
+        # soon as it and the sections before it are ready.
         options = kwargs.get('options')
         for extension in extensions or []:
 
@@ -239,18 +428,38 @@ def state(**kwargs):
                     not git.get_config_value('git-state.extensions.' + extension + '.show', default=True, as_type=parse_string.as_bool):
                 continue
 
-            extension_name, extension_text = _run_extension(extension, options, show_color)
+            extension_command = _extension_command(extension, options, show_color)
+            sections[extension_command[0]] = extension_command
+
+    order = kwargs.get('order', git.get_config_value('git-state.order', default=[], as_type=parse_string.as_delimited_list('|')))
+    sections = _order_sections(sections, order)
+    extension_commands = [section for section in sections.values() if isinstance(section, tuple)]
+    extension_results = _run_extensions(extension_commands, kwargs.get('jobs'))
+    _print_sections(
+        _render_sections(sections, extension_results, format_, show_empty, show_color),
+        kwargs.get('page', True),
+        kwargs.get('clear')
+    )
+
 
-            sections[extension_name] = _print_section(
+def _render_sections(sections, extension_results, format_, show_empty, color):
+    """Render sections in order, waiting on each extension's result as it is reached.
+
+    :param OrderedDict sections: section names to either their text or the extension command producing it
+    :param extension_results: (name, text) pairs for the extension commands in the same order as sections
+    """
+
+    for section in sections.values():
+        if isinstance(section, tuple):
+            extension_name, extension_text = next(extension_results)
+            section = _print_section(
                 title=extension_name,
                 text=extension_text,
                 format_=format_,
                 show_empty=show_empty,
-                color=show_color
+                color=color
             )
-
-    order = kwargs.get('order', git.get_config_value('git-state.order', default=[], as_type=parse_string.as_delimited_list('|')))
-    _print_sections(sections, order, kwargs.get('page', True), kwargs.get('clear'))
+        yield section
 
 
 def _resolve_extensions(all_extensions, show_extensions, ignore_extensions):
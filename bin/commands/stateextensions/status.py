@@ -2,10 +2,99 @@ from __future__ import absolute_import
 
 import os
 import re
+import subprocess  # nosec
+from collections import namedtuple
 
 from colorama import Fore
 
-from ..utils import execute
+from ..utils import execute, git, messages
+
+
+StatusResult = namedtuple('StatusResult', ['branch', 'changes', 'note'])
+
+UNTRACKED_FILES_MODES = ('all', 'normal', 'no', 'auto')
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+
+def _is_untracked_scan_cached():
+    """Whether git can list untracked files without walking the entire working tree."""
+
+    untracked_cache = git.get_config_value('core.untrackedCache', default='false').lower()
+    fsmonitor = git.get_config_value('core.fsmonitor', default='false').lower()
+    return untracked_cache in ('yes', 'on', 'true', '1') or fsmonitor not in ('no', 'off', 'false', '0')
+
+
+def _status_within_untracked_budget(status_command, limit, timeout):
+    """Run `git status` listing every untracked file unless that exceeds a file count or time budget.
+
+    The status is run once. It is killed if it runs past the timeout and its untracked files are counted once it
+    finishes so no separate walk of the working tree is needed.
+
+    :param list status_command: the status command without an untracked files mode
+    :param int limit: maximum number of untracked files
+    :param float timeout: maximum seconds to spend running the status
+
+    :return tuple: the status output, or None, and why the budget was exceeded, or None
+    """
+
+    # never take the index lock since the status may be killed while holding it
+    command = status_command[:1] + ['--no-optional-locks'] + status_command[1:] + ['--untracked-files=all']
+    try:
+        status_output, _, return_code = execute.execute(command, timeout=timeout)
+    except execute.TimeoutExpired:
+        return None, 'listing untracked files took longer than {:g}s'.format(timeout)
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, command)
+
+    untracked_count = sum(1 for line in _ANSI_ESCAPE.sub('', status_output).splitlines() if line.startswith('??'))
+    if untracked_count > limit:
+        return None, 'more than {} untracked files'.format(limit)
+    return status_output, None
+
+
+def _resolve_untracked_files():
+    """Resolve `git-state.status.untracked` to a `git status --untracked-files` mode.
+
+    :return str: the mode or 'auto' if it depends on how long listing every untracked file takes
+    """
+
+    untracked_files = git.get_config_value('git-state.status.untracked', default='all').lower()
+    if untracked_files not in UNTRACKED_FILES_MODES:
+        messages.error("unknown untracked files mode '{}'".format(untracked_files))
+    elif untracked_files == 'auto' and _is_untracked_scan_cached():
+        return 'all'
+    return untracked_files
+
+
+def run(**kwargs):
+    """Run `git status` once for both the accent and the section text.
+
+    :return StatusResult: the branch line (None for a new repository), the short format changes, and a note if
+        untracked files were not fully listed
+    """
+
+    new_repository = kwargs.get('new_repository', False)
+    show_color = kwargs.get('show_color', 'always')
+
+    status_command = ['git', '-c', 'color.status=' + show_color, 'status', '--short']
+    if new_repository:
+        return StatusResult(None, execute.check_output(status_command), None)
+
+    status_command.append('--branch')
+    untracked_files, note = _resolve_untracked_files(), None
+    if untracked_files == 'auto':
+        status_output, reason = _status_within_untracked_budget(
+            status_command,
+            git.get_config_value('git-state.status.untracked-limit', default=10000, as_type=int),
+            git.get_config_value('git-state.status.untracked-timeout', default=1.0, as_type=float)
+        )
+        if reason:
+            note = 'untracked directories not expanded: ' + reason
+            status_output = execute.check_output(status_command + ['--untracked-files=normal'])
+    else:
+        status_output = execute.check_output(status_command + ['--untracked-files=' + untracked_files])
+    branch, _, changes = status_output.partition('\n')
+    return StatusResult(branch, changes, note)
 
 
 def title():
@@ -20,10 +109,8 @@ def accent(**kwargs):
     if new_repository:
         status_title = '{no_color}({green}master{no_color})'.format(no_color=Fore.RESET, green=Fore.GREEN)
     else:
-        status_title = execute.check_output(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short']
-        ).splitlines()[0]
-        status_title = re.match('.*##.*? (.*)', status_title).group(1)
+        status_result = kwargs.get('status_result') or run(show_color=show_color)
+        status_title = re.match('.*##.*? (.*)', status_result.branch).group(1)
         status_title = '{}({})'.format(Fore.RESET, status_title)
 
     return status_title
@@ -35,15 +122,13 @@ def get(**kwargs):
     show_color = kwargs.get('show_color', 'always')
     show_clean_message = kwargs.get('show_clean_message', True)
 
-    status_command = ['git', '-c', 'color.status=' + show_color, 'status', '--short']
-    if new_repository:
-        no_changes_message = 'repository is empty'
-    else:
-        status_command += ['--untracked-files=all']
-        no_changes_message = 'working directory is clean'
+    status_result = kwargs.get('status_result') or run(new_repository=new_repository, show_color=show_color)
+    no_changes_message = 'repository is empty' if new_repository else 'working directory is clean'
 
-    status_output = execute.check_output(status_command)
+    status_output = status_result.changes
     if not status_output and show_clean_message:
         status_output = 'nothing to commit, ' + no_changes_message + os.linesep
+    if status_result.note:
+        status_output += '({})'.format(status_result.note) + os.linesep
 
     return status_output
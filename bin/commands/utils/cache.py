@@ -0,0 +1,108 @@
+"""A small on-disk cache kept inside the repository's git directory."""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+
+from . import execute
+
+_CACHE_DIRECTORY = 'git-commands'
+
+# git directories keyed by working directory
+_git_directories = {}
+
+
+def _git_directory():
+    """Locate the git directory, which is moved in linked worktrees and submodules.
+
+    :return str: the absolute path or None if not in a git repository
+    """
+
+    cwd = os.getcwd()
+    if cwd not in _git_directories:
+        resolved = execute.stdout(['git', 'rev-parse', '--git-dir']).strip()
+        _git_directories[cwd] = os.path.abspath(resolved) if resolved else None
+    return _git_directories[cwd]
+
+
+def _cache_file(name):
+    return os.path.join(_git_directory(), _CACHE_DIRECTORY, name + '.json')
+
+
+def load(name):
+    """Load a named cache.
+
+    :param str or unicode name: the cache name
+
+    :return dict: the cached entries or an empty dict if nothing is cached or the cache cannot be read
+    """
+
+    if not _git_directory():
+        return {}
+
+    try:
+        with open(_cache_file(name)) as cache_file:
+            entries = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def save(name, entries):
+    """Replace a named cache.
+
+    The file is written to a temporary location and renamed into place so readers never see a partial cache. Failures
+    are ignored since the cache is only an optimization.
+
+    :param str or unicode name: the cache name
+    :param dict entries: the entries to store
+    """
+
+    if not _git_directory():
+        return
+
+    cache_file = _cache_file(name)
+    temp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file))
+        with open(temp_file, 'w') as cache:
+            json.dump(entries, cache)
+        os.rename(temp_file, cache_file)
+    except (IOError, OSError):
+        pass
+
+
+def _stat_info(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return '{} missing'.format(path)
+    return '{} {!r} {} {}'.format(path, stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+def fingerprint(*paths):
+    """Summarize the stat information of git directory paths and everything beneath any that are directories.
+
+    Paths are relative to the git directory and resolved like `git rev-parse --git-path`, so in a linked worktree refs
+    are found in the common directory. Missing paths are included so creating them changes the fingerprint.
+
+    :param paths: paths relative to the git directory
+
+    :return str: a digest of the paths' stat information or None if there is no git directory
+    """
+
+    if not _git_directory():
+        return None
+
+    resolved = execute.stdout(['git', 'rev-parse'] + [argument for path in paths for argument in ('--git-path', path)])
+    stat_infos = []
+    for path in resolved.splitlines():
+        path = os.path.abspath(path)
+        stat_infos.append(_stat_info(path))
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            stat_infos += [_stat_info(os.path.join(root, name)) for name in directories + sorted(files)]
+    return hashlib.sha1('\n'.join(stat_infos).encode('UTF-8')).hexdigest()
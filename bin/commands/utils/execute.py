@@ -3,7 +3,29 @@
 from __future__ import absolute_import
 
 import os
+import signal
 import subprocess  # nosec
+import sys
+import threading
+import time
+
+# preexec_fn can deadlock the child when threads are running so it is only used where start_new_session is missing
+_NEW_SESSION = {'start_new_session': True} if sys.version_info >= (3, 2) else {'preexec_fn': os.setsid}
+
+# seconds a terminated command has to exit before it is killed
+_KILL_GRACE_PERIOD = 1.0
+
+
+class TimeoutExpired(Exception):
+    """Raised when a command is killed for running longer than its timeout."""
+
+    def __init__(self, command, timeout, output=None):
+        self.command = command
+        self.timeout = timeout
+        self.output = output
+
+    def __str__(self):
+        return "'{}' timed out after {} seconds".format(' '.join(self.command), self.timeout)
 
 
 def swallow(command):
@@ -17,50 +39,182 @@ def swallow(command):
         return subprocess.call(command, stdout=devnull, stderr=devnull)  # nosec
 
 
-def stdout(command):
+def stdout(command, input_=None):
     """Execute a command, swallow stderr only, and returning stdout.
 
     :param list command: command to execute
+    :param str or unicode input_: input to write to the command's stdin
     """
     if isinstance(command, str):
         command = command.split()
     with open(os.devnull, 'w') as devnull:
-        return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=devnull).communicate()[0].decode('UTF-8')  # nosec
+        if input_ is None:
+            return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=devnull).communicate()[0].decode('UTF-8')  # nosec
+        proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull)  # nosec
+        return proc.communicate(input=input_.encode('UTF-8'))[0].decode('UTF-8')
 
 
-def call_input(command, input_):
+def records(command, separator='\x00', chunk_size=65536, env=None):
+    """Execute a command, swallow stderr, and lazily yield its stdout split on a separator.
+
+    Output is read in chunks so large outputs are never held in memory all at once. Closing the generator early kills
+    and reaps the command.
+
+    :param list command: command to execute
+    :param str separator: the record separator
+    :param int chunk_size: number of bytes to read at a time
+    :param dict env: the environment to run the command with
+
+    :raise subprocess.CalledProcessError: if all output was read and the command exited non-zero
+    """
     if isinstance(command, str):
         command = command.split()
-    proc = subprocess.Popen(command, stdin=subprocess.PIPE)  # nosec
+    separator = separator.encode('UTF-8')
+    with open(os.devnull, 'w') as devnull:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=devnull, env=env)  # nosec
+        finished = False
+        try:
+            remainder = b''
+            for chunk in iter(lambda: os.read(proc.stdout.fileno(), chunk_size), b''):
+                chunk_records = (remainder + chunk).split(separator)
+                remainder = chunk_records.pop()
+                for record in chunk_records:
+                    yield record.decode('UTF-8')
+            if remainder:
+                yield remainder.decode('UTF-8')
+            finished = True
+        finally:
+            if not finished and proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+def call_input(command, input_, env=None):
+    if isinstance(command, str):
+        command = command.split()
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, env=env)  # nosec
     proc.communicate(input=input_.encode('UTF-8'))
     return proc.returncode
 
 
-def execute(command):
+def open_input(command):
+    """Start a command with a pipe to its stdin so input can be written to it incrementally.
+
+    :param list command: command to execute
+
+    :return subprocess.Popen: the running process
+    """
+    if isinstance(command, str):
+        command = command.split()
+    return subprocess.Popen(command, stdin=subprocess.PIPE)  # nosec
+
+
+def coprocess(command):
+    """Start a command with pipes to its stdin and stdout so it can answer requests for as long as it runs.
+
+    :param list command: command to execute
+
+    :return subprocess.Popen: the running process, whose stderr is swallowed
+    """
     if isinstance(command, str):
         command = command.split()
-    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)  # nosec
-    command_stdout, command_stderr = proc.communicate()
+    with open(os.devnull, 'w') as devnull:
+        return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull)  # nosec
+
+
+def _process_group_exists(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _kill_process_group(proc, killed):
+    # terminate first so commands like git can remove their lock files before exiting
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        killed.append(True)
+    except OSError:  # pragma: no cover since the process finished between the timeout and the kill
+        return
+
+    deadline = time.time() + _KILL_GRACE_PERIOD
+    while _process_group_exists(proc.pid) and time.time() < deadline:
+        time.sleep(0.01)
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def execute(command, timeout=None):
+    """Execute a command and return its stdout, stderr, and status code.
+
+    :param list command: command to execute
+    :param float timeout: seconds to wait before terminating the command and everything it started. Anything still
+        running after a short grace period is killed.
+
+    :raise TimeoutExpired: if the command was killed. Any output collected before then is kept on the exception.
+    """
+    if isinstance(command, str):
+        command = command.split()
+    if not timeout or timeout <= 0:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)  # nosec
+        command_stdout, command_stderr = proc.communicate()
+        return command_stdout.decode('UTF-8'), command_stderr.decode('UTF-8'), proc.returncode
+
+    # run in a new process group so anything the command started is killed along with it
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_NEW_SESSION)  # nosec
+    killed = []
+    timer = threading.Timer(timeout, _kill_process_group, [proc, killed])
+    timer.start()
+    try:
+        command_stdout, command_stderr = proc.communicate()
+    finally:
+        timer.cancel()
+
+    if killed:
+        raise TimeoutExpired(command, timeout, command_stdout.decode('UTF-8'))
     return command_stdout.decode('UTF-8'), command_stderr.decode('UTF-8'), proc.returncode
 
 
-def check_output(command):
+def check_output(command, env=None):
     if isinstance(command, str):
         command = command.split()
-    return subprocess.check_output(command).decode('UTF-8')  # nosec
+    return subprocess.check_output(command, env=env).decode('UTF-8')  # nosec
 
 
-def call(command):
+def call(command, env=None):
     if isinstance(command, str):
         command = command.split()
-    return subprocess.call(command)  # nosec
+    return subprocess.call(command, env=env)  # nosec
+
 
+def pipe(command1, command2, env=None):
+    """Stream one command's stdout straight into another's stdin.
 
-def pipe(command1, command2):
+    The output never passes through Python so memory use doesn't depend on how much is piped.
+
+    :param list command1: command whose stdout is piped
+    :param list command2: command reading from the pipe
+    :param dict env: the environment to run both commands with
+
+    :return int: the status code of the second command or, if it succeeded, of the first
+    """
     if isinstance(command1, str):
         command1 = command1.split()
     if isinstance(command2, str):
         command2 = command2.split()
-    command1_proc = subprocess.Popen(command1, stdout=subprocess.PIPE)  # nosec
-    subprocess.call(command2, stdin=command1_proc.stdout)  # nosec
-    command1_proc.wait()
+    command1_proc = subprocess.Popen(command1, stdout=subprocess.PIPE, env=env)  # nosec
+    command2_proc = subprocess.Popen(command2, stdin=command1_proc.stdout, env=env)  # nosec
+
+    # only the second command may hold the read end so the first isn't left blocked if the second exits early
+    command1_proc.stdout.close()
+
+    # wait on both so neither is left a zombie when the second fails
+    command2_return_code = command2_proc.wait()
+    command1_return_code = command1_proc.wait()
+    return command2_return_code or command1_return_code
@@ -2,6 +2,9 @@
 
 from __future__ import absolute_import
 
+import atexit
+import errno
+import fnmatch
 import os
 import re
 import sys
@@ -12,6 +15,26 @@ from . import directories
 from . import execute
 from . import messages
 
+# config snapshots keyed by (config, file_)
+_config_snapshots = {}
+
+# paths inside the git directory keyed by (working directory, path)
+_git_paths = {}
+
+_CONFIG_SECTION = re.compile(r'^\s*\[\s*([-.\w]+)\s*(?:"((?:[^"\\\n]|\\.)*)")?\s*\]')
+_CONFIG_VARIABLE = re.compile(r'^\s*([A-Za-z][-A-Za-z0-9]*)\s*(?:[=;#]|$)')
+_NULL_SHA1 = '0' * 40
+
+# batches are kept small enough that neither side of the cat-file process blocks on a full pipe
+_OBJECT_BATCH_SIZE = 128
+_OBJECT_BATCH_LENGTH = 8 * 1024
+_OBJECT_TYPES = ('commit', 'tree', 'blob', 'tag')
+_object_service_instance = None
+
+# the rules git uses to expand an abbreviated ref, in order
+_DWIM_RULES = ('{}', 'refs/{}', 'refs/tags/{}', 'refs/heads/{}', 'refs/remotes/{}', 'refs/remotes/{}/HEAD')
+_ref_index_instance = None
+
 
 class RefType(Enum):
     HEADS = 1
@@ -32,6 +55,85 @@ class GitException(Exception):  # pragma: no cover
         return repr(self.message)
 
 
+class _RefIndex(object):
+    """Full ref names indexed by their last component so refs can be matched the way git show-ref does.
+
+    git show-ref matches a name against whole trailing components of each ref, so only refs ending with the same last
+    component can ever match. Grouping on it keeps the index cheap to build even with hundreds of thousands of refs
+    while each lookup only checks a handful of candidates.
+    """
+
+    __slots__ = ('names', '_by_last_component')
+
+    def __init__(self, names):
+        self.names = set(names)
+        self._by_last_component = {}
+        get_candidates = self._by_last_component.get
+        for name in names:
+            last_component = name.rpartition('/')[2]
+            candidates = get_candidates(last_component)
+            if candidates is None:
+                self._by_last_component[last_component] = [name]
+            else:
+                candidates.append(name)
+
+    def matching(self, ref, limit=None):
+        """Find the refs matching a name the way git show-ref does.
+
+        :param str ref: the full ref or any trailing components of it
+        :param limit: ref types to limit to. May only contain: [heads, tags]
+
+        :return list: full names of the matching refs
+        """
+
+        if limit and isinstance(limit, RefType):
+            limit = [limit]
+        prefixes = tuple('refs/{}/'.format(ref_type.name.lower()) for ref_type in limit) if limit else ('refs/',)
+
+        suffix = '/' + ref
+        return [
+            name for name in self._by_last_component.get(ref.rpartition('/')[2], ())
+            if (name == ref or name.endswith(suffix)) and name.startswith(prefixes)
+        ]
+
+    def expand(self, ref):
+        """Expand an abbreviated ref using the same rules as git.
+
+        :return str: the full ref name or None if git wouldn't expand the ref
+        """
+
+        for rule in _DWIM_RULES:
+            if rule.format(ref) in self.names:
+                return rule.format(ref)
+        return None
+
+
+def _ref_index():
+    global _ref_index_instance
+    if _ref_index_instance is None:
+        _ref_index_instance = _RefIndex(execute.check_output(['git', 'for-each-ref', '--format=%(refname)']).splitlines())
+    return _ref_index_instance
+
+
+def clear_ref_cache():
+    """Drop the cached ref index so the next lookup re-reads the refs."""
+
+    global _ref_index_instance
+    _ref_index_instance = None
+
+
+def matching_refs(ref, limit=None):
+    """Find the refs matching a name the way git show-ref does.
+
+    :param str ref: the full ref or any trailing components of it
+    :param limit: ref types to limit to. May only contain: [heads, tags]
+
+    :return list: full names of the matching refs
+    """
+
+    return _ref_index().matching(ref, limit)
+
+
 def is_valid_reference(reference):
     """Determines if a reference is valid.
 
@@ -40,7 +142,95 @@ def is_valid_reference(reference):
     :return bool: whether or not the reference is valid
     """
 
-    return not execute.swallow(['git', 'show-ref', '--quiet', reference])
+    return bool(matching_refs(reference))
+
+
+class _ObjectService(object):
+    """A git cat-file --batch-check process answering object lookups so each one doesn't fork git.
+
+    The process is started on first use, restarted if the working directory changes, and stopped at exit.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._cwd = None
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except (IOError, OSError):
+                pass  # the process already died
+            self._proc.stdout.close()
+            self._proc.wait()
+            self._proc = None
+
+    def lookup(self, revisions):
+        """Look up objects, a batch at a time.
+
+        :param list revisions: revisions without newlines
+
+        :return list: a (SHA1, type) tuple for each revision or None if it doesn't name an object
+        """
+
+        infos = []
+        while len(infos) < len(revisions):
+            batch, batch_length = [], 0
+            for revision in revisions[len(infos):]:
+                if batch and (len(batch) == _OBJECT_BATCH_SIZE or batch_length + len(revision) > _OBJECT_BATCH_LENGTH):
+                    break
+                batch.append(revision)
+                batch_length += len(revision) + 1
+            infos += self._query(batch)
+        return infos
+
+    def _query(self, revisions):
+        if self._proc is not None and self._cwd != os.getcwd():
+            self.close()
+        if self._proc is None:
+            self._cwd = os.getcwd()
+            self._proc = execute.coprocess(['git', 'cat-file', '--batch-check=%(objectname) %(objecttype)'])
+
+        try:
+            self._proc.stdin.write(''.join(revision + '\n' for revision in revisions).encode('UTF-8'))
+            self._proc.stdin.flush()
+        except (IOError, OSError):
+            pass  # the process died part way through but answered everything before that
+
+        infos = []
+        for _ in revisions:
+            line = self._proc.stdout.readline().decode('UTF-8')
+            if not line:
+                # git dies on some revisions, like reflog indexes out of range, so restart it for any that follow
+                self.close()
+                return infos + [None]
+            fields = line.rstrip('\n').split(' ')
+            infos.append(tuple(fields) if len(fields) == 2 and fields[1] in _OBJECT_TYPES else None)
+        return infos
+
+
+def _object_service():
+    global _object_service_instance
+    if _object_service_instance is None:
+        _object_service_instance = _ObjectService()
+        atexit.register(_object_service_instance.close)
+    return _object_service_instance
+
+
+def object_infos(revisions):
+    """Look up the SHA1 and type of the objects revisions name.
+
+    All lookups in a run share one long-lived git cat-file process.
+
+    :param list revisions: revisions to look up
+
+    :return list: a (SHA1, type) tuple for each revision or None if it doesn't name an object
+    """
+
+    # a newline would split one revision into two lookups
+    lookups = [revision for revision in revisions if revision and '\n' not in revision]
+    infos = dict(zip(lookups, _object_service().lookup(lookups)))
+    return [infos.get(revision) for revision in revisions]
 
 
 def is_commit(object_):
@@ -51,7 +241,8 @@ def is_commit(object_):
     :return bool: whether or not the object is a commit object
     """
 
-    return execute.stdout(['git', 'cat-file', '-t', object_]).strip() == 'commit'
+    info = object_infos([object_])[0]
+    return info is not None and info[1] == 'commit'
 
 
 def is_detached():
@@ -77,7 +268,7 @@ def is_ref(object_):
     :return bool: whether or not the object is a ref
     """
 
-    return not execute.swallow(['git', 'show-ref', object_])
+    return bool(matching_refs(object_))
 
 
 def is_ref_ambiguous(ref, limit=None):
@@ -91,20 +282,9 @@ def is_ref_ambiguous(ref, limit=None):
     :raise GitException: if ref is not a ref
     """
 
-    # normalize input
-    if limit and isinstance(limit, RefType):
-        limit = [limit]
-
     if not is_ref(ref):
         raise GitException("'{}' is not a ref".format(ref))
-
-    show_ref_command = ['git', 'show-ref']
-    if limit:
-        show_ref_command += ['--' + l.name.lower() for l in limit]
-    show_ref_command += [ref]
-
-    show_ref = execute.stdout(show_ref_command)
-    return len(show_ref.splitlines()) > 1
+    return len(matching_refs(ref, limit)) > 1
 
 
 def symbolic_full_name(ref):
@@ -129,14 +309,339 @@ def current_branch():
     return execute.check_output('git rev-parse --abbrev-ref HEAD').strip()
 
 
+class RepositoryContext(object):
+    """HEAD and the full ref table, read once.
+
+    A context reflects the repository when it was created and should be discarded after refs change.
+    """
+
+    __slots__ = ('head', 'refs', '_head_ref', '_index')
+
+    def __init__(self):
+        self.head = execute.stdout(['git', 'rev-parse', '--quiet', '--verify', 'HEAD']).strip() or None
+        self.refs = []
+        self._head_ref = None
+        for line in execute.check_output(['git', 'for-each-ref', '--format=%(HEAD) %(refname)']).splitlines():
+            self.refs.append(line[2:])
+            if line[0] == '*':
+                self._head_ref = line[2:]
+        self._index = _RefIndex(self.refs)
+
+    @property
+    def is_empty(self):
+        """Whether HEAD has no commit yet, the equivalent of is_empty_repository."""
+        return self.head is None
+
+    @property
+    def is_detached(self):
+        """Whether HEAD is detached, the equivalent of is_detached."""
+        return self.head is not None and self._head_ref is None
+
+    @property
+    def current_branch(self):
+        """The current branch, 'HEAD' if detached, or None if empty, the equivalent of current_branch."""
+        if self._head_ref:
+            return self._head_ref[len('refs/heads/'):]
+        return 'HEAD' if self.head else None
+
+    def matching_refs(self, ref, limit=None):
+        """The equivalent of matching_refs."""
+        return self._index.matching(ref, limit)
+
+    def is_ref(self, object_):
+        """The equivalent of is_ref."""
+        return bool(self.matching_refs(object_))
+
+    def is_ref_ambiguous(self, ref, limit=None):
+        """The equivalent of is_ref_ambiguous.
+
+        :raise GitException: if ref is not a ref
+        """
+
+        if not self.is_ref(ref):
+            raise GitException("'{}' is not a ref".format(ref))
+        return len(self.matching_refs(ref, limit)) > 1
+
+    def symbolic_full_name(self, ref):
+        """The equivalent of symbolic_full_name.
+
+        :return str: the symbolic full name or None if git wouldn't expand the ref
+        """
+
+        if ref == 'HEAD':
+            # HEAD isn't in the ref table, it names the current branch
+            return self._head_ref or ('HEAD' if self.head else None)
+        return self._index.expand(ref)
+
+
+class StatusEntry(object):
+    """A single path from `git status --porcelain=v2`.
+
+    States use the porcelain v2 codes where '.' means unchanged. Untracked and ignored paths use '?' and '!' for both
+    states.
+    """
+
+    __slots__ = ('path', 'index_state', 'worktree_state', 'original_path', 'submodule')
+
+    def __init__(self, path, index_state, worktree_state, original_path=None, submodule='N...'):
+        self.path = path
+        self.index_state = index_state
+        self.worktree_state = worktree_state
+        self.original_path = original_path
+        self.submodule = submodule
+
+    def __repr__(self):
+        return 'StatusEntry({!r}, {!r}, {!r}, original_path={!r}, submodule={!r})'.format(
+            self.path, self.index_state, self.worktree_state, self.original_path, self.submodule
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, StatusEntry) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def is_untracked(self):
+        return self.index_state == '?'
+
+    @property
+    def is_ignored(self):
+        return self.index_state == '!'
+
+    @property
+    def is_staged(self):
+        return self.index_state not in '.?!'
+
+    @property
+    def is_deleted(self):
+        """Whether the path is deleted in either the index or the working tree, but not modified in the other."""
+        return (self.index_state, self.worktree_state) in (('D', '.'), ('.', 'D'))
+
+    @property
+    def is_submodule(self):
+        return self.submodule.startswith('S')
+
+
+# number of space separated fields before the path for each porcelain v2 entry type
+_STATUS_FIELD_COUNTS = {'1': 8, '2': 9, 'u': 10}
+
+
+def status(untracked_files='all', ignored=False, pathspecs=None):
+    """Stream the status of the working tree and index.
+
+    Runs `git status --porcelain=v2 -z` and parses each entry as it is read so paths are NUL-safe and large statuses
+    are never held in memory all at once.
+
+    :param str untracked_files: how to show untracked files. One of: all, normal, no
+    :param bool ignored: whether to include ignored files
+    :param list pathspecs: limit the status to these pathspecs
+
+    :return generator: StatusEntry objects in the order git reports them
+    """
+
+    status_command = ['git', 'status', '--porcelain=v2', '-z', '--untracked-files=' + untracked_files]
+    if ignored:
+        status_command += ['--ignored']
+    if pathspecs:
+        status_command += ['--'] + pathspecs
+
+    status_records = execute.records(status_command)
+    for record in status_records:
+        entry_type = record[:1]
+        if entry_type in ('?', '!'):
+            yield StatusEntry(record[2:], entry_type, entry_type)
+        elif entry_type in _STATUS_FIELD_COUNTS:
+            fields = record.split(' ', _STATUS_FIELD_COUNTS[entry_type])
+            original_path = next(status_records) if entry_type == '2' else None
+            yield StatusEntry(fields[-1], fields[1][0], fields[1][1], original_path, fields[2])
+
+
+_EXCLUDE_MAGIC = (':!', ':^', ':(exclude)')
+
+
+def _matches_pathspec(path, pathspec):
+    if pathspec.startswith(':/'):
+        pathspec = pathspec[2:]
+    if pathspec.startswith('./'):
+        pathspec = pathspec[2:]
+    pathspec = pathspec.rstrip('/')
+    if pathspec in ('', '.'):
+        return True
+    if path == pathspec or path.startswith(pathspec + '/'):
+        return True
+    return any(c in pathspec for c in '*?[') and fnmatch.fnmatchcase(path, pathspec)
+
+
+def matches_pathspecs(path, pathspecs):
+    """Determines whether a path is matched by a list of pathspecs the way git would match it.
+
+    Supports literal paths, leading directories, globs, and exclude magic (':!', ':^', ':(exclude)'). Paths and
+    pathspecs are relative to the top of the working tree. If only excludes are given, everything else matches.
+
+    :param str or unicode path: the path to match
+    :param list pathspecs: the pathspecs to match against. An empty list matches everything.
+
+    :return bool: whether or not the path is matched
+    """
+
+    if not pathspecs:
+        return True
+
+    included = False
+    only_excludes = True
+    for pathspec in pathspecs:
+        exclude = next((magic for magic in _EXCLUDE_MAGIC if pathspec.startswith(magic)), None)
+        if exclude:
+            if _matches_pathspec(path, pathspec[len(exclude):]):
+                return False
+        else:
+            only_excludes = False
+            included = included or _matches_pathspec(path, pathspec)
+    return included or only_excludes
+
+
 def deleted_files():
     """Get the deleted files in a dirty working tree.
 
     :return list: a list of deleted file paths
     """
 
-    all_files = execute.check_output('git status --short --porcelain')
-    return [match.group(1) for match in re.finditer('^(?:D\\s|\\sD)\\s(.*)', all_files, re.MULTILINE)]
+    return [entry.path for entry in status(untracked_files='no') if entry.is_deleted]
+
+
+class ReflogEntry(object):
+    """A single line of a reflog."""
+
+    __slots__ = ('old_sha1', 'new_sha1', 'identity', 'message')
+
+    def __init__(self, old_sha1, new_sha1, identity, message=None):
+        self.old_sha1 = old_sha1
+        self.new_sha1 = new_sha1
+        self.identity = identity
+        self.message = message
+
+    def __repr__(self):
+        return 'ReflogEntry({!r}, {!r}, {!r}, {!r})'.format(self.old_sha1, self.new_sha1, self.identity, self.message)
+
+    def __eq__(self, other):
+        return isinstance(other, ReflogEntry) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def parse(cls, line):
+        header, tab, message = line.partition('\t')
+        old_sha1, new_sha1, identity = header.split(' ', 2)
+        return cls(old_sha1, new_sha1, identity, message if tab else None)
+
+    @property
+    def timestamp(self):
+        """The time of the entry in seconds since the epoch."""
+        return int(self.identity.rsplit(' ', 2)[1])
+
+    @property
+    def timezone(self):
+        return self.identity.rsplit(' ', 1)[1]
+
+    def format(self):
+        line = '{} {} {}'.format(self.old_sha1, self.new_sha1, self.identity)
+        return line + '\t' + self.message if self.message is not None else line
+
+
+def git_path(path):
+    """Resolve a path inside the git directory, which is shared or moved in linked worktrees and submodules.
+
+    :param str path: the path relative to the git directory, such as logs/refs/stash
+
+    :return str: the absolute path or None if not in a git repository
+    """
+
+    key = (os.getcwd(), path)
+    if key not in _git_paths:
+        resolved = execute.stdout(['git', 'rev-parse', '--git-path', path]).strip()
+        _git_paths[key] = os.path.abspath(resolved) if resolved else None
+    return _git_paths[key]
+
+
+def stash_reflog():
+    """Read the stash reflog.
+
+    :return list: ReflogEntry objects, newest first, so an entry's index is its stash@{index}
+    """
+
+    reflog_path = git_path(os.path.join('logs', 'refs', 'stash'))
+    if not reflog_path:
+        return []
+    try:
+        with open(reflog_path, 'rb') as reflog:
+            lines = reflog.read().decode('UTF-8').split('\n')
+    except (IOError, OSError):
+        return []
+    return [ReflogEntry.parse(line) for line in reversed(lines) if line]
+
+
+def _write_locked(path, content):
+    """Replace a file, locking it the same way git does while it is rewritten.
+
+    :param str path: path to the file
+    :param str or unicode content: the new content
+    """
+
+    lock_path = path + '.lock'
+    try:
+        lock = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    except OSError as e:
+        reason = 'file exists' if e.errno == errno.EEXIST else e.strerror
+        messages.error("unable to lock '{}': {}".format(lock_path, reason))
+    with os.fdopen(lock, 'wb') as locked_file:
+        locked_file.write(content.encode('UTF-8'))
+    os.rename(lock_path, path)
+
+
+def _write_reflog(path, entries):
+    """Replace a reflog, locking it the same way git does while it is rewritten.
+
+    :param str path: path to the reflog
+    :param list entries: ReflogEntry objects, newest first
+    """
+
+    _write_locked(path, ''.join(entry.format() + '\n' for entry in reversed(entries)))
+
+
+def drop_stashes(indexes, reflog=None):
+    """Drop stashes from the stash reflog.
+
+    Like `git reflog delete --rewrite --updateref`, each remaining entry's old SHA1 is set to the new SHA1 of the entry
+    before it and refs/stash is rewritten to point at whichever entry is now on top.
+
+    :param indexes: stash indexes to drop
+    :param list reflog: the stash reflog if it has already been read. Its entries are modified.
+    :return list: the dropped ReflogEntry objects ordered by index
+    """
+
+    reflog = stash_reflog() if reflog is None else reflog
+    indexes = set(indexes)
+    dropped = [entry for i, entry in enumerate(reflog) if i in indexes]
+    if not dropped:
+        return []
+
+    kept = [entry for i, entry in enumerate(reflog) if i not in indexes]
+    if not kept:
+        # deleting the ref also deletes its reflog
+        execute.call(['git', 'update-ref', '-d', 'refs/stash', reflog[0].new_sha1])
+        clear_ref_cache()
+        return dropped
+
+    previous_sha1 = _NULL_SHA1
+    for entry in reversed(kept):
+        entry.old_sha1, previous_sha1 = previous_sha1, entry.new_sha1
+
+    # the ref is always rewritten, even when the newest stash is kept, just as `--updateref` does
+    _write_reflog(git_path(os.path.join('logs', 'refs', 'stash')), kept)
+    _write_locked(git_path(os.path.join('refs', 'stash')), kept[0].new_sha1 + '\n')
+    return dropped
 
 
 def is_empty_repository():
@@ -155,10 +660,8 @@ def resolve_sha1(revision):
     :return str: SHA1
     """
 
-    sha1 = execute.stdout(['git', 'rev-parse', '--verify', '--quiet', revision]).strip()
-    if not sha1:
-        return None
-    return sha1
+    info = object_infos([revision])[0]
+    return info[0] if info else None
 
 
 def resolve_coloring(color):
@@ -168,12 +671,132 @@ def resolve_coloring(color):
     return color_when
 
 
-def _get_command(key, config, file_):
+def _get_list_command(config, file_):
     if config is None:
-        return 'git', 'config', key
+        return ['git', 'config', '--list', '--null']
     elif file_ is not None:
-        return 'git', 'config', '--file', file_, key
-    return 'git', 'config', '--{}'.format(config), key
+        return ['git', 'config', '--list', '--null', '--file', file_]
+    return ['git', 'config', '--list', '--null', '--{}'.format(config)]
+
+
+def _normalize_config_key(key):
+    """Normalize a key the same way git does: section and variable names are case-insensitive, subsections are not."""
+
+    if '.' not in key:
+        return key.lower()
+    section, rest = key.split('.', 1)
+    if '.' not in rest:
+        return section.lower() + '.' + rest.lower()
+    subsection, name = rest.rsplit('.', 1)
+    return section.lower() + '.' + subsection + '.' + name.lower()
+
+
+def _get_config_snapshot(config, file_):
+    """Load all values for a config with a single `git config --list` call and cache them for the process.
+
+    :param str or unicode config: the config to load
+    :param str or unicode file_: path to a config file to load
+
+    :return dict: normalized keys to their effective (last) value
+    """
+
+    snapshot_key = (config, file_)
+    if snapshot_key not in _config_snapshots:
+        snapshot = {}
+        for entry in execute.stdout(_get_list_command(config, file_)).split('\x00'):
+            if entry:
+                key, _, value = entry.partition('\n')
+                snapshot[key] = value
+        _config_snapshots[snapshot_key] = snapshot
+    return _config_snapshots[snapshot_key]
+
+
+def _config_section_key(match):
+    section, subsection = match.groups()
+    if subsection is None:
+        # the deprecated [section.subsection] syntax is case-insensitive throughout
+        return section.lower()
+    return section.lower() + '.' + re.sub(r'\\(.)', r'\1', subsection)
+
+
+def _quote_config(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+def set_local_config_values(values):
+    """Set and unset many local config values.
+
+    Every existing value of a key is removed, along with any section left empty, and new values are appended in one
+    section per subsection.
+
+    :param dict values: config keys, as section.subsection.name, to their new value or None to unset them. Nothing is
+        locked or written if it is empty.
+    """
+
+    if not values:
+        return
+
+    values = dict((_normalize_config_key(key), value) for key, value in values.items())
+    config_path = git_path('config')
+    try:
+        with open(config_path, 'rb') as config_file:
+            lines = config_file.read().decode('UTF-8').splitlines(True)
+    except (IOError, OSError):
+        lines = []
+
+    kept, section, section_start, section_dropped, continued = [], None, None, False, False
+    for line in lines:
+        if continued:
+            continued = line.rstrip('\r\n').endswith('\\')
+            continue
+
+        header = _CONFIG_SECTION.match(line)
+        if header:
+            # drop the previous section if every variable in it was removed
+            if section_dropped and not any(kept_line.strip() for kept_line in kept[section_start + 1:]):
+                del kept[section_start:]
+            section, section_start, section_dropped = _config_section_key(header), len(kept), False
+            variable_line = line[header.end():]
+            variable = _CONFIG_VARIABLE.match(variable_line)
+            if variable and section + '.' + variable.group(1).lower() in values:
+                # a variable on the header line itself
+                line, section_dropped = line[:header.end()] + '\n', True
+                continued = variable_line.rstrip('\r\n').endswith('\\')
+            kept.append(line)
+            continue
+
+        variable = _CONFIG_VARIABLE.match(line)
+        if section and variable and section + '.' + variable.group(1).lower() in values:
+            section_dropped = True
+            continued = line.rstrip('\r\n').endswith('\\')
+            continue
+        kept.append(line)
+    if section_dropped and not any(kept_line.strip() for kept_line in kept[section_start + 1:]):
+        del kept[section_start:]
+
+    if kept and not kept[-1].endswith('\n'):
+        kept[-1] += '\n'
+    sections = {}
+    for key, value in sorted(values.items()):
+        if value is not None:
+            section, name = key.rsplit('.', 1)
+            sections.setdefault(section, []).append('\t{} = {}\n'.format(name, _quote_config(value)))
+    for section in sorted(sections):
+        if '.' in section:
+            section_name, subsection = section.split('.', 1)
+            kept.append('[{} {}]\n'.format(section_name, _quote_config(subsection)))
+        else:
+            kept.append('[{}]\n'.format(section))
+        kept += sections[section]
+
+    _write_locked(config_path, ''.join(kept))
+    clear_config_cache()
+
+
+def clear_config_cache():
+    """Drop all cached config snapshots so the next lookup re-reads the config files."""
+
+    _config_snapshots.clear()
 
 
 def validate_config(config=None):
@@ -204,8 +827,7 @@ def get_config_value(key, default=None, config=None, file_=None, as_type=str):
     if not hasattr(as_type, '__call__') and not hasattr(as_type, '__bases__'):
         raise TypeError('{} is not callable'.format(as_type))
 
-    command = _get_command(key, config, file_)
-    value = execute.stdout(command).strip()
+    value = _get_config_snapshot(config, file_).get(_normalize_config_key(key), '').strip()
 
     if not value:
         return default
@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+
+import shlex
+import sys
+
+from . import messages
+
+
+def read_shell_words(path, file_description, line_description):
+    """Read a file whose lines are split like shell commands.
+
+    Blank lines and comments starting with '#' are ignored.
+
+    :param str or unicode path: path to the file or '-' to read from stdin
+    :param str or unicode file_description: what the file is called in the error when it cannot be read
+    :param str or unicode line_description: what its lines are called in the error when one cannot be split
+
+    :return list: (line number, words) tuples in file order
+    """
+
+    try:
+        input_file = sys.stdin if path == '-' else open(path)
+    except (IOError, OSError):
+        messages.error("cannot read {} '{}'".format(file_description, path))
+
+    lines = []
+    try:
+        for line_number, line in enumerate(input_file, 1):
+            try:
+                words = shlex.split(line, comments=True)
+            except ValueError as e:
+                messages.error('invalid {} line {}: {}'.format(line_description, line_number, e))
+            if words:
+                lines.append((line_number, words))
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+    return lines
@@ -279,6 +279,26 @@ class TestGitAbandon(unittest.TestCase):
         self.assertEqual(expected, stderr.strip())
         self.assertFalse(stdout)
 
+    def test_abandon_linkedWorktree(self):
+
+        # given: a linked worktree, whose .git is a file, sharing the stashes
+        subprocess.call('git worktree add --quiet linked'.split())
+        os.chdir('linked')
+
+        # expect: a dry run lists the stashes
+        dry_run_output = subprocess.check_output('git abandon -d 2'.split()).decode('utf-8').splitlines()
+        self.assertEqual(dry_run_output, [
+            _DRY_RUN_FORMAT.format('0', self.stash0),
+            _DRY_RUN_FORMAT.format('1', self.stash1)
+        ])
+
+        # and: the stashes are dropped
+        abandon_output = subprocess.check_output('git abandon 0 1'.split()).decode('utf-8').splitlines()
+        self.assertEqual(abandon_output, [_DROPPED_FORMAT.format('0', self.stash0)])
+        stash_output = self._stashes().splitlines()
+        self.assertEqual(len(stash_output), 3)
+        self.assertEqual(stash_output[0], _STASH_FORMAT.format(self.stash1_abbrev, '0', self.initial_commit))
+
     def test_abandon_version(self):
 
         # expect
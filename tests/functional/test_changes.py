@@ -140,6 +140,19 @@ class TestChangesView(unittest.TestCase):
         self.assertEqual('1', self.repo.git.changes('view', 'HEAD^', '--count', '--', '*md'))
         self.assertEqual('0', self.repo.git.changes('view', 'HEAD^', '--count', '--', '*py'))
 
+    def test_view_count_cachedUntilHeadMoves(self):
+
+        # given
+        base = str(self.repo.rev_parse('HEAD^'))
+        self.assertEqual('1', self.repo.git.changes('view', base, '--count'))
+
+        # when
+        self.repo.index.commit('Another commit')
+
+        # then
+        self.assertEqual('2', self.repo.git.changes('view', base, '--count'))
+        self.assertEqual('1', self.repo.git.changes('view', 'HEAD^', '--count'))
+
     def test_view_stat(self):
 
         # expect:
@@ -235,6 +248,18 @@ class TestChangesAssociate(unittest.TestCase):
         self.assertEqual('master has been associated with {}'.format(sha), output)
         self.assertEqual(sha, self.repo.git.config('git-changes.associations.master.with'))
 
+    def test_associate_head_withRemoteHead(self):
+
+        # given
+        self.repo.git.update_ref('refs/remotes/origin/HEAD', 'HEAD')
+
+        # when
+        output = self.repo.git.changes('associate', 'HEAD')
+
+        # then
+        self.assertEqual('master has been associated with refs/heads/master', output)
+        self.assertEqual('refs/heads/master', self.repo.git.config('git-changes.associations.master.with'))
+
     def test_associate_quiet(self):
 
         # when
@@ -322,9 +347,9 @@ class TestChangesAssociate(unittest.TestCase):
         ).communicate()]
 
         # then
-        self.assertEqual('usage: git changes associate [-h] [-u] [-V] [COMMIT-ISH [-q]]', stdout)
+        self.assertEqual('usage: git changes associate [-h] [-u] [-V] [COMMIT-ISH [-q] | --from-file FILE [-q]]', stdout)
         self.assertEqual('git changes: error: argument -q/--quiet: not allowed without positional argument committish '
-                         'or option -u/--upstream', stderr)
+                         'or options -u/--upstream or --from-file', stderr)
 
     def test_associate_filesNotSupported(self):
 
@@ -336,9 +361,127 @@ class TestChangesAssociate(unittest.TestCase):
         ).communicate()]
 
         # then
-        self.assertEqual('usage: git changes associate [-h] [-u] [-V] [COMMIT-ISH [-q]]', stdout)
+        self.assertEqual('usage: git changes associate [-h] [-u] [-V] [COMMIT-ISH [-q] | --from-file FILE [-q]]', stdout)
         self.assertEqual('git changes: error: argument FILES: only supported for view sub-command', stderr)
 
+    def test_associate_fromFile(self):
+
+        # given
+        self.repo.git.branch('feature')
+        with open('associations', 'w') as associations_file:
+            associations_file.write('# branch commit-ish\nmaster HEAD^\nfeature master\n')
+
+        # when
+        output = self.repo.git.changes('associate', '--from-file', 'associations')
+
+        # then
+        sha = str(self.repo.rev_parse('HEAD^'))
+        self.assertEqual(os.linesep.join([
+            'master has been associated with {}'.format(sha),
+            'feature has been associated with refs/heads/master'
+        ]), output)
+        self.assertEqual(sha, self.repo.git.config('git-changes.associations.master.with'))
+        self.assertEqual('refs/heads/master', self.repo.git.config('git-changes.associations.feature.with'))
+
+    def test_associate_fromFile_stdin(self):
+
+        # when
+        stdout, stderr = [x.decode('utf-8').strip() for x in subprocess.Popen(
+            'git changes associate --quiet --from-file -'.split(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate(b'master HEAD^\n')]
+
+        # then
+        self.assertFalse(stdout)
+        self.assertFalse(stderr)
+        self.assertEqual(str(self.repo.rev_parse('HEAD^')), self.repo.git.config('git-changes.associations.master.with'))
+
+    def test_associate_fromFile_invalidRevision(self):
+
+        # given
+        with open('associations', 'w') as associations_file:
+            associations_file.write('master HEAD^\nfeature nope\n')
+
+        # when
+        stdout, stderr = [x.decode('utf-8').strip() for x in subprocess.Popen(
+            'git changes associate --from-file associations'.split(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()]
+
+        # then
+        self.assertFalse(stdout)
+        self.assertEqual('error: nope is not a valid revision', stderr)
+        self.assertFalse(self.repo.git.config('--get-regexp', 'git-changes.associations', with_exceptions=False))
+
+    def test_associate_fromFile_notAllowedWithCommittish(self):
+
+        # when
+        stdout, stderr = [x.decode('utf-8').strip() for x in subprocess.Popen(
+            'git changes associate HEAD --from-file associations'.split(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()]
+
+        # then
+        self.assertEqual('usage: git changes associate [-h] [-u] [-V] [COMMIT-ISH [-q] | --from-file FILE [-q]]', stdout)
+        self.assertEqual('git changes: error: argument --from-file: not allowed with positional argument committish or '
+                         'options -u/--upstream or -V/--verbose', stderr)
+
+
+class TestChangesExport(unittest.TestCase):
+    layer = GitChangesFunctional
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        self.repo = git.Repo.init(self.dirpath)
+        testutils.init_local_config(self.repo)
+
+        open('README.md', 'w').close()
+        self.repo.index.add(['README.md'])
+        self.repo.index.commit('Initial commit')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+        os.chdir(self.proj_dir)
+
+    def test_export(self):
+
+        # given
+        self.repo.git.config('git-changes.associations.master.with', 'refs/heads/upstream')
+        self.repo.git.config('git-changes.associations.odd branch.with', 'abc123')
+
+        # when
+        output = self.repo.git.changes('export')
+
+        # then
+        self.assertEqual(os.linesep.join(['master refs/heads/upstream', "'odd branch' abc123"]), output)
+
+    def test_export_roundTrip(self):
+
+        # given
+        self.repo.git.changes('associate', '--quiet', 'HEAD')
+        self.repo.git.config('git-changes.associations.odd branch.with', 'refs/heads/master')
+        exported = self.repo.git.changes('export')
+        with open('associations', 'w') as associations_file:
+            associations_file.write(exported + os.linesep)
+        self.repo.git.changes('unassociate', '--all')
+
+        # when
+        self.repo.git.changes('associate', '--quiet', '--from-file', 'associations')
+
+        # then
+        self.assertEqual(exported, self.repo.git.changes('export'))
+
+    def test_export_noAssociations(self):
+
+        # expect
+        self.assertFalse(self.repo.git.changes('export'))
+
 
 class TestChangesUnassociate(unittest.TestCase):
     layer = GitChangesFunctional
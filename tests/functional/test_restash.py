@@ -193,3 +193,238 @@ class TestGitRestash(unittest.TestCase):
         # expect
         self.assertTrue(self._output('git restash -h'.split()))
         self.assertTrue(self._output('git restash --help'.split()))
+
+    def test_restash_withLaterChanges(self):
+
+        # given
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('a\nb\nc\nd\ne\n')
+        self.repo.index.add(['README.md'])
+        self.repo.index.commit('More lines')
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('A\nb\nc\nd\ne\n')
+        self.repo.git.stash()
+        self.repo.git.stash('apply')
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('A\nb\nc\nd\nE\n')
+
+        # when
+        self.repo.git.restash()
+
+        # then
+        with open('README.md') as readme_file:
+            self.assertEqual(readme_file.read(), 'a\nb\nc\nd\nE\n')
+
+    def test_restash_conflictingChanges(self):
+
+        # given
+        self.repo.git.stash()
+        self.repo.git.stash('apply')
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('b')
+
+        # when
+        error_message = subprocess.Popen(
+            'git restash'.split(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()[1].decode('utf-8').strip()
+
+        # then
+        self.assertEqual(error_message, 'error: unable to reverse modifications')
+        with open('README.md') as readme_file:
+            self.assertEqual(readme_file.read(), 'b')
+        self.assertEqual(sorted(os.listdir('.')), ['.git', 'CHANGELOG.md', 'README.md'])
+
+    def test_restash_notApplied(self):
+
+        # given
+        self.repo.git.stash()
+
+        # when
+        error_message = subprocess.Popen(
+            'git restash'.split(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()[1].decode('utf-8').strip()
+
+        # then
+        self.assertEqual(error_message, 'error: unable to reverse modifications')
+        self.assertFalse(self.repo.git.status('--short'))
+
+    def test_restash_notApplied_withLaterChanges(self):
+
+        # given
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('a\nb\nc\nd\ne\n')
+        self.repo.index.add(['README.md'])
+        self.repo.index.commit('More lines')
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('A\nb\nc\nd\ne\n')
+        self.repo.git.stash()
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('a\nb\nc\nd\nE\n')
+
+        # when
+        error_message = subprocess.Popen(
+            'git restash'.split(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()[1].decode('utf-8').strip()
+
+        # then
+        self.assertEqual(error_message, 'error: unable to reverse modifications')
+        with open('README.md') as readme_file:
+            self.assertEqual(readme_file.read(), 'a\nb\nc\nd\nE\n')
+
+    def test_restash_binaryFiles(self):
+
+        # given
+        with open('image.bin', 'wb') as binary_file:
+            binary_file.write(b'\x00\x01')
+        self.repo.index.add(['image.bin'])
+        self.repo.index.commit('Add binary')
+        with open('image.bin', 'wb') as binary_file:
+            binary_file.write(b'\x00\x02')
+        self.repo.git.stash()
+        self.repo.git.stash('apply')
+
+        # when
+        self.repo.git.restash()
+
+        # then
+        self.assertFalse(subprocess.check_output('git status --short'.split()).decode('utf-8').strip())
+
+    def test_restash_multipleStashes(self):
+
+        # given
+        self.repo.git.stash()
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+        with open('untracked.txt', 'w') as untracked_file:
+            untracked_file.write('c')
+        self.repo.git.stash('--include-untracked')
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('a')
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+        with open('untracked.txt', 'w') as untracked_file:
+            untracked_file.write('c')
+
+        # when
+        restash_output = self.repo.git.restash('stash@{0}', 'stash@{1}')
+
+        # then
+        self.assertEqual(restash_output, 'Restashed stash@{{0}} ({})\nRestashed stash@{{1}} ({})'.format(
+            self.repo.git.rev_parse('stash@{0}'),
+            self.repo.git.rev_parse('stash@{1}')
+        ))
+        self.assertFalse(self.repo.git.status('--short'))
+
+    def test_restash_multipleStashes_oneNotApplied(self):
+
+        # given
+        self.repo.git.stash()
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+        self.repo.git.stash()
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+
+        # when
+        error_message = subprocess.Popen(
+            ['git', 'restash', 'stash@{0}', 'stash@{1}'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()[1].decode('utf-8').strip()
+
+        # then
+        self.assertEqual(error_message, 'error: unable to reverse modifications')
+        self.assertEqual(self.repo.git.status('--short'), ' M CHANGELOG.md')
+
+    def test_restash_linkedWorktree(self):
+
+        # given: a linked worktree, whose .git is a file, sharing the stashes
+        self.repo.git.stash()
+        subprocess.call('git worktree add --quiet linked'.split())
+        os.chdir('linked')
+        subprocess.call('git stash apply --quiet'.split())
+
+        # when
+        restash_output = self._output('git restash'.split())
+
+        # then
+        self.assertEqual(restash_output, 'Restashed stash@{{0}} ({})'.format(self.repo.git.rev_parse('stash@{0}')))
+        self.assertFalse(self._output('git status --short'.split()))
+
+    def test_restash_stashRange(self):
+
+        # given
+        self.repo.git.stash()
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+        self.repo.git.stash()
+        with open('README.md', 'w') as readme_file:
+            readme_file.write('a')
+        with open('CHANGELOG.md', 'w') as changelog_file:
+            changelog_file.write('b')
+
+        # when
+        self.repo.git.restash('stash@{0}..stash@{1}', '--quiet')
+
+        # then
+        self.assertFalse(self.repo.git.status('--short'))
+
+    def test_restash_multipleStashes_invalidStash(self):
+
+        # given
+        self.repo.git.stash()
+        self.repo.git.stash('apply')
+
+        # when
+        error_message = subprocess.Popen(
+            ['git', 'restash', 'stash@{0}', 'stash@{1}'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ).communicate()[1].decode('utf-8').strip()
+
+        # then
+        self.assertEqual(error_message, 'error: stash@{1} is not a valid stash reference')
+        self.assertEqual(self.repo.git.status('--short'), ' M README.md')
+
+    def test_restash_nestedUntrackedFiles(self):
+
+        # given
+        os.makedirs('dir/nested')
+        for path in ('dir/nested/file1', 'dir/file2', '[literal].txt'):
+            with open(path, 'w') as untracked_file:
+                untracked_file.write('a')
+        self.repo.git.stash('--include-untracked')
+        self.repo.git.stash('apply')
+        with open('dir/later.txt', 'w') as later_file:
+            later_file.write('b')
+        with open('l.txt', 'w') as later_file:
+            later_file.write('b')
+
+        # when
+        self.repo.git.restash()
+
+        # then
+        self.assertEqual(self.repo.git.status('--short', '--untracked-files=all'), '?? dir/later.txt\n?? l.txt')
+        self.assertFalse(os.path.exists('dir/nested'))
+
+    def test_restash_manyUntrackedFiles(self):
+
+        # given
+        os.makedirs('untracked')
+        for i in range(2000):
+            open(os.path.join('untracked', 'file-with-a-long-enough-name-{:04}.txt'.format(i)), 'w').close()
+        self.repo.git.stash('--include-untracked')
+        self.repo.git.stash('apply')
+
+        # when
+        self.repo.git.restash()
+
+        # then
+        self.assertFalse(self.repo.git.status('--short', '--untracked-files=all'))
+        self.assertFalse(os.path.exists('untracked'))
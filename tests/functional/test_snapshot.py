@@ -280,11 +280,192 @@ A  file3.txt
         call('git stash pop --quiet'.split())
         self.assertEqual(self._status(), " M CONTRIBUTING.md\n")
 
+    def test_snapshot_replace_linkedWorktree(self):
+
+        # given: a snapshot and a linked worktree, whose .git is a file, sharing it
+        self._output(('git', 'snapshot', '--quiet', 'mine'))
+        call('git worktree add --quiet linked'.split())
+        os.chdir('linked')
+        with open('CONTRIBUTING.md', 'w') as a_file:
+            a_file.write('contributing\n')
+
+        # when
+        stdout, stderr = self._output(('git', 'snapshot', '--replace', 'mine'))
+
+        # then
+        self.assertEqual(stdout, 'Saved working directory and index state On linked: mine')
+        self.assertFalse(stderr)
+        stashes = self._stashes()
+        self.assertEqual(len(stashes), 1)
+        self.assertEqual(stashes[0], 'stash@{0}: On linked: mine')
+
     def test_snapshot_replaceWithoutMessage(self):
 
         # when
         stdout, stderr = self._output(('git', 'snapshot', '--replace'))
 
         # then
-        self.assertEqual(stdout, 'usage: git snapshot [MESSAGE] [-h] [-v] [-r] [-q] [-- FILE [FILE ...]]')
+        self.assertEqual(stdout, 'usage: git snapshot [MESSAGE] [-h] [-v] [-r] [-q] [--manifest FILE] [-- FILE [FILE ...]]')
         self.assertEqual(stderr, 'git snapshot: error: argument -r/--replace: not allowed without positional argument message')
+
+    def test_snapshot_manifest(self):
+
+        # given
+        with open('CONTRIBUTING.md', 'w') as a_file:
+            a_file.write('contributing\n')
+        call('touch file1.txt'.split())
+        with open('manifest', 'w') as manifest:
+            manifest.write('# one snapshot per line\n')
+            manifest.write('changelog CHANGELOG.md\n')
+            manifest.write('"text files" *.txt\n')
+            manifest.write('nothing missing.md\n')
+
+        # when
+        stdout, stderr = self._output('git snapshot --manifest manifest'.split())
+
+        # then
+        self.assertEqual(stdout.splitlines(), [
+            'Saved working directory and index state On master: changelog',
+            'Saved working directory and index state On master: text files',
+            "No local changes to save for 'nothing'. No snapshot created."
+        ])
+        self.assertFalse(stderr)
+        self.assertEqual(self._status(), " M CHANGELOG.md\n M CONTRIBUTING.md\n?? file1.txt\n?? manifest\n")
+        self.assertEqual(self._stashes(), ['stash@{0}: On master: text files', 'stash@{1}: On master: changelog'])
+
+        call('git reset --hard --quiet'.split())
+        call('git clean --force --quiet'.split())
+        call('git stash pop --quiet stash@{1}'.split())
+        self.assertEqual(self._status(), " M CHANGELOG.md\n")
+        call('git reset --hard --quiet'.split())
+        call('git stash pop --quiet'.split())
+        self.assertEqual(self._status(), "?? file1.txt\n")
+
+    def test_snapshot_manifest_stdin(self):
+
+        # when
+        proc = Popen('git snapshot --quiet --manifest -'.split(), stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = proc.communicate(b'from-stdin\n')
+
+        # then
+        self.assertFalse(stdout)
+        self.assertFalse(stderr)
+        self.assertEqual(self._stashes(), ['stash@{0}: On master: from-stdin'])
+        self.assertEqual(self._status(), " M CHANGELOG.md\n")
+
+    def test_snapshot_manifest_withMessage(self):
+
+        # when
+        stdout, stderr = self._output('git snapshot message --manifest -'.split())
+
+        # then
+        self.assertEqual(stdout, 'usage: git snapshot [MESSAGE] [-h] [-v] [-r] [-q] [--manifest FILE] [-- FILE [FILE ...]]')
+        self.assertEqual(stderr, 'git snapshot: error: argument --manifest: not allowed with positional argument message or files')
+
+    def test_snapshot_leavesFilesUntouched(self):
+
+        # given
+        call('touch untracked.txt'.split())
+        with open('CONTRIBUTING.md', 'w') as a_file:
+            a_file.write('contributing\n')
+        call('git add CONTRIBUTING.md'.split())
+        os.utime('CHANGELOG.md', (0, 0))
+        before = [(os.stat(f).st_mtime, os.stat(f).st_ino) for f in ('CHANGELOG.md', 'CONTRIBUTING.md', 'untracked.txt')]
+
+        # when
+        self._output('git snapshot message'.split())
+
+        # then
+        after = [(os.stat(f).st_mtime, os.stat(f).st_ino) for f in ('CHANGELOG.md', 'CONTRIBUTING.md', 'untracked.txt')]
+        self.assertEqual(after, before)
+        self.assertEqual(self._status(), " M CHANGELOG.md\nM  CONTRIBUTING.md\n?? untracked.txt\n")
+
+        call('git reset --hard --quiet'.split())
+        call('git clean --force --quiet'.split())
+        call('git stash pop --quiet --index'.split())
+        self.assertEqual(self._status(), " M CHANGELOG.md\nM  CONTRIBUTING.md\n?? untracked.txt\n")
+
+    def test_snapshot_manifest_replace(self):
+
+        # given
+        self._output(('git', 'snapshot', 'first'))
+        self._output(('git', 'snapshot', 'other'))
+        self._output(('git', 'snapshot', 'second'))
+        with open('manifest', 'w') as manifest:
+            manifest.write('first CHANGELOG.md\nsecond CHANGELOG.md\n')
+
+        # when
+        stdout, stderr = self._output('git snapshot --quiet --replace --manifest manifest'.split())
+
+        # then
+        self.assertFalse(stdout)
+        self.assertFalse(stderr)
+        self.assertEqual(self._stashes(), [
+            'stash@{0}: On master: second',
+            'stash@{1}: On master: first',
+            'stash@{2}: On master: other'
+        ])
+        self.assertFalse(call('git rev-parse --verify --quiet stash@{2}^2'.split(), stdout=PIPE))
+
+    def test_snapshot_list(self):
+
+        # given
+        call('touch untracked.txt'.split())
+        self._output(('git', 'snapshot', '--quiet', 'first', '--', 'CHANGELOG.md'))
+        self._output(('git', 'snapshot', '--quiet', 'second'))
+
+        # when
+        stdout, stderr = self._output('git snapshot list'.split())
+
+        # then
+        self.assertFalse(stderr)
+        lines = stdout.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertRegexpMatches(lines[0], r'^stash@\{0\}: On master: second \([-0-9]+ [:0-9]+, 2 files, \+1 -0\)$')
+        self.assertRegexpMatches(lines[1], r'^stash@\{1\}: On master: first \([-0-9]+ [:0-9]+, 1 file, \+1 -0\)$')
+
+    def test_snapshot_list_noSnapshots(self):
+
+        # expect
+        self.assertEqual(self._output('git snapshot list'.split()), ['', ''])
+
+    def test_snapshot_restore(self):
+
+        # given
+        self._output(('git', 'snapshot', '--quiet', 'mine'))
+        call('git reset --hard --quiet'.split())
+
+        # when
+        stdout, stderr = self._output('git snapshot restore --quiet mine'.split())
+
+        # then
+        self.assertFalse(stdout)
+        self.assertFalse(stderr)
+        self.assertEqual(self._status(), " M CHANGELOG.md\n")
+        self.assertEqual(len(self._stashes()), 1)
+
+    def test_snapshot_restore_linkedWorktree(self):
+
+        # given: a snapshot and a linked worktree, whose .git is a file, sharing it
+        self._output(('git', 'snapshot', '--quiet', 'mine'))
+        call('git reset --hard --quiet'.split())
+        call('git worktree add --quiet linked'.split())
+        os.chdir('linked')
+
+        # when
+        stdout, stderr = self._output('git snapshot restore --quiet mine'.split())
+
+        # then
+        self.assertFalse(stdout)
+        self.assertFalse(stderr)
+        self.assertEqual(self._status(), " M CHANGELOG.md\n")
+        self.assertEqual(len(self._stashes()), 1)
+
+    def test_snapshot_restore_notFound(self):
+
+        # when
+        stdout, stderr = self._output('git snapshot restore missing'.split())
+
+        # then
+        self.assertFalse(stdout)
+        self.assertEqual(stderr, "error: no snapshot found with message 'missing'")
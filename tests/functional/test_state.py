@@ -3,6 +3,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 import unittest
 
 import git
@@ -154,6 +155,86 @@ nothing to commit, working directory is clean
         # expect
         self.assertFalse(self._output('git state'))
 
+    def test_state_view_untrackedFiles(self):
+
+        # given: an initial commit and an untracked directory
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.mkdir('build')
+        subprocess.call('touch build/a build/b build/c'.split())
+
+        # expect
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/a
+?? build/b
+?? build/c
+''')
+        self._output('git config git-state.status.untracked normal')
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/
+''')
+        self._output('git config git-state.status.untracked no')
+        self.assertEqual(self._output('git state'), '''# status (master)
+nothing to commit, working directory is clean
+''')
+
+    def test_state_view_untrackedFiles_auto(self):
+
+        # given: an initial commit and an untracked directory
+        subprocess.call('touch README.md'.split())
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.mkdir('build')
+        subprocess.call('touch build/a build/b build/c'.split())
+        self._output('git config git-state.status.untracked auto')
+
+        # expect: within the budget
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/a
+?? build/b
+?? build/c
+''')
+
+        # expect: over the budget
+        self._output('git config git-state.status.untracked-limit 2')
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/
+(untracked directories not expanded: more than 2 untracked files)
+''')
+
+        # expect: the untracked cache makes listing cheap
+        self._output('git config core.untrackedCache true')
+        self.assertEqual(self._output('git state'), '''# status (master)
+?? build/a
+?? build/b
+?? build/c
+''')
+
+    def test_state_view_untrackedFiles_auto_timeoutLeavesNoIndexLock(self):
+
+        # given: a stat-dirty tracked file whose slow clean filter makes git status run past its timeout
+        with open('.gitattributes', 'w') as attributes:
+            attributes.write('tracked filter=slow\n')
+        subprocess.call(['git', 'config', 'filter.slow.clean', 'sleep 1; cat'])
+        with open('tracked', 'w') as tracked:
+            tracked.write('tracked\n')
+        subprocess.call('git add -A'.split())
+        subprocess.call(['git', 'commit', '--quiet', '-m', 'Initial commit'])
+        os.utime('tracked', (0, 0))
+        os.mkdir('build')
+        subprocess.call('touch build/a'.split())
+        self._output('git config git-state.status.untracked auto')
+        self._output('git config git-state.status.untracked-timeout 0.3')
+
+        # when
+        output = self._output('git state')
+
+        # then
+        self.assertIn('(untracked directories not expanded: listing untracked files took longer than 0.3s)', output)
+        self.assertFalse(os.path.exists(os.path.join('.git', 'index.lock')))
+        self.assertEqual(subprocess.call(['git', 'add', 'tracked']), 0)
+
 
 class TestStateViewWithExtension(unittest.TestCase):
     layer = GitStateFunctional
@@ -264,6 +345,100 @@ nothing to commit, working directory is clean
 {}
 '''.format(self.full_log))
 
+    def test_state_viewWithExtension_jobs(self):
+
+        # given
+        self.repo.config_writer('repository').set_value('git-state.extensions.changelog', 'command', 'git log --oneline -1').release()
+        self._output('git config git-state.order changelog|log|status')
+        expected = '''# changelog
+{}
+# log
+{}
+# status (master)
+nothing to commit, working directory is clean
+'''.format(self.commit3_log, self.full_log)
+
+        # expect
+        self.assertEqual(self._output('git state'), expected)
+        self.assertEqual(self._output('git state --jobs 1'), expected)
+        self.assertEqual(self._output('git state -j 2'), expected)
+
+        # and: jobs config
+        self._output('git config git-state.jobs 1')
+        self.assertEqual(self._output('git state'), expected)
+
+    def test_state_viewWithExtension_timeout(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.slow.command', "sh -c 'echo started; sleep 10'"])
+        self._output('git config git-state.extensions.slow.color false')
+        self._output('git config git-state.extensions.slow.timeout 0.5')
+
+        # expect
+        self.assertEqual(self._output('git state --order status log slow'), '''# status (master)
+nothing to commit, working directory is clean
+# log
+{}
+# slow
+started
+timed out after 0.5s
+'''.format(self.full_log))
+
+    def test_state_viewWithExtension_timeout_global(self):
+
+        # given
+        self._output(['git', 'config', 'git-state.extensions.slow.command', "sh -c 'sleep 10'"])
+        self._output('git config git-state.extensions.slow.color false')
+        self._output('git config git-state.timeout 0.5')
+
+        # expect
+        self.assertEqual(self._output('git state --no-show log'), '''# status (master)
+nothing to commit, working directory is clean
+# slow
+timed out after 0.5s
+''')
+
+    def test_state_viewWithExtension_cache(self):
+
+        # given: an extension that prints how many times it has run
+        self._output(['git', 'config', 'git-state.extensions.counter.command', "sh -c 'echo run >> .git/runs; wc -l < .git/runs'"])
+        self._output('git config git-state.extensions.counter.color false')
+        self._output('git config git-state.extensions.counter.cache true')
+
+        # let git status settle any racily clean index entries so the index is not rewritten between runs
+        time.sleep(1)
+        subprocess.call('git status --short'.split())
+
+        # expect: the cached output is reused
+        self.assertIn('# counter\n1\n', self._output('git state --no-show log'))
+        self.assertIn('# counter\n1\n', self._output('git state --no-show log'))
+
+        # and: a new commit invalidates it
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'empty'])
+        self.assertIn('# counter\n2\n', self._output('git state --no-show log'))
+
+    def test_state_viewWithExtension_cache_stashDropped(self):
+
+        # given: a cached stash list and three stashes
+        self._output(['git', 'config', 'git-state.extensions.stashes.command', "sh -c 'git stash list --format=%s'"])
+        self._output('git config git-state.extensions.stashes.color false')
+        self._output('git config git-state.extensions.stashes.cache true')
+        for i in range(3):
+            with open('README.md', 'a') as a_file:
+                a_file.write('stash {}\n'.format(i))
+            subprocess.call(['git', 'stash', 'push', '--quiet', '-m', 'stash {}'.format(i)])
+
+        # let git status settle any racily clean index entries so the index is not rewritten between runs
+        time.sleep(1)
+        subprocess.call('git status --short'.split())
+        self.assertIn('# stashes\nOn master: stash 2\nOn master: stash 1\nOn master: stash 0\n', self._output('git state --no-show log'))
+
+        # when: a stash other than the newest is dropped, which leaves refs/stash pointing at the same commit
+        subprocess.call('git abandon 1 2'.split())
+
+        # then
+        self.assertIn('# stashes\nOn master: stash 2\nOn master: stash 0\n', self._output('git state --no-show log'))
+
     def test_state_viewWithExtension_options(self):
 
         # given
@@ -614,6 +789,18 @@ class TestStateExtensions(unittest.TestCase):
         self.assertIn('git-state.extensions.testlog.show=False', extension_config)
         self.assertIn('git-state.extensions.testlog.color=False', extension_config)
 
+    def test_state_extensions_edit_timeout(self):
+
+        # given
+        self.repo.config_writer('repository').set_value('git-state.extensions.testlog', 'command', 'git log').release()
+
+        # when
+        edit_output = self._output(['git', 'state', 'extensions', 'edit', 'testlog', '--timeout', '2.5'], set_config=False)
+
+        # then
+        self.assertEqual('Extension testlog updated', edit_output.strip())
+        self.assertIn('git-state.extensions.testlog.timeout=2.5', self._output('git settings list git-state.extensions.testlog'))
+
     def test_state_extensions_edit_extensionDoesNotExist(self):
 
         # when
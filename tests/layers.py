@@ -118,6 +118,12 @@ class Utils(Unit):
         pass
 
 
+class UtilsCache(Utils):
+    @classmethod
+    def setUp(cls):
+        pass
+
+
 class UtilsDirectories(Utils):
     @classmethod
     def setUp(cls):
@@ -148,6 +154,12 @@ class UtilsParseActions(Utils):
         pass
 
 
+class UtilsParseFile(Utils):
+    @classmethod
+    def setUp(cls):
+        pass
+
+
 class UtilsParseString(Utils):
     @classmethod
     def setUp(cls):
@@ -1,9 +1,14 @@
 import mock
 import os
+import shutil
+import subprocess
+import tempfile
+import time
 import unittest
 
 from colorama import Fore
 
+from .. import testutils
 from ...layers import GitStateExtensions
 from bin.commands.stateextensions import status
 
@@ -25,51 +30,76 @@ class TestStatus(unittest.TestCase):
             '{no_color}({green}master{no_color})'.format(no_color=Fore.RESET, green=Fore.GREEN)
         )
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='the full title\n')
-    @mock.patch('re.match')
-    def test_accent_notNewRepository(self, mock_rematch, mock_checkoutput):
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_run(self, mock_checkoutput, mock_resolveuntrackedfiles):
 
-        # setup
-        mock_match = mock.Mock()
-        mock_match.group = mock.Mock()
-        mock_match.group.return_value = 'the short title'
-        mock_rematch.return_value = mock_match
+        # given
+        mock_checkoutput.return_value = '## master...origin/master\n M a.txt\n?? b.txt\n'
 
         # when
         show_color = 'always'
-        actual_status = status.accent(new_repository=False, show_color=show_color)
+        status_result = status.run(show_color=show_color)
 
         # then
-        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'the short title'))
-
+        self.assertEqual(status_result, status.StatusResult('## master...origin/master', ' M a.txt\n?? b.txt\n', None))
         mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short']
+            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--branch', '--untracked-files=all']
         )
-        mock_rematch.assert_called_once_with('.*##.*? (.*)', 'the full title')
-        mock_match.group.assert_called_once_with(1)
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='the full title\n')
-    @mock.patch('re.match')
-    def test_accent_notNewRepository_butNotPassedInAsArgument(self, mock_rematch, mock_checkoutput):
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\n')
+    def test_run_clean(self, mock_checkoutput, mock_resolveuntrackedfiles):
+
+        # expect
+        self.assertEqual(status.run(show_color='never'), status.StatusResult('## master', '', None))
+
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='?? a.txt\n')
+    def test_run_newRepository(self, mock_checkoutput):
+
+        # when
+        show_color = 'never'
+        status_result = status.run(new_repository=True, show_color=show_color)
+
+        # then
+        self.assertEqual(status_result, status.StatusResult(None, '?? a.txt\n', None))
+        mock_checkoutput.assert_called_once_with(['git', '-c', 'color.status=' + show_color, 'status', '--short'])
+
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_accent_notNewRepository(self, mock_checkoutput):
+
+        # when
+        status_result = status.StatusResult('## master...origin/master [ahead 1]', '', None)
+        actual_status = status.accent(new_repository=False, show_color='always', status_result=status_result)
+
+        # then
+        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'master...origin/master [ahead 1]'))
+        mock_checkoutput.assert_not_called()
 
-        # setup
-        mock_match = mock.Mock()
-        mock_match.group = mock.Mock()
-        mock_match.group.return_value = 'the short title'
-        mock_rematch.return_value = mock_match
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\n M a.txt\n')
+    def test_accent_notNewRepository_withoutStatusResult(self, mock_checkoutput, mock_resolveuntrackedfiles):
 
         # when
         show_color = 'always'
         actual_status = status.accent(show_color=show_color)
 
         # then
-        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'the short title'))
-
+        self.assertEqual(actual_status, '{}({})'.format(Fore.RESET, 'master'))
         mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--branch', '--short']
+            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--branch', '--untracked-files=all']
         )
-        mock_rematch.assert_called_once_with('.*##.*? (.*)', 'the full title')
-        mock_match.group.assert_called_once_with(1)
+
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_get_withStatusResult(self, mock_checkoutput):
+
+        # when
+        status_result = status.StatusResult('## master', ' M a.txt\n', None)
+        actual_status = status.get(show_color='always', status_result=status_result)
+
+        # then
+        self.assertEqual(actual_status, ' M a.txt\n')
+        mock_checkoutput.assert_not_called()
 
     @mock.patch('bin.commands.utils.execute.check_output', return_value='the status')
     def test_get_newRepository(self, mock_checkoutput):
@@ -93,8 +123,9 @@ class TestStatus(unittest.TestCase):
         self.assertEqual(actual_status, 'nothing to commit, repository is empty' + os.linesep)
         mock_checkoutput.assert_called_once_with(['git', '-c', 'color.status=' + show_color, 'status', '--short'])
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='the status')
-    def test_get_notNewRepository(self, mock_checkoutput):
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\nthe status')
+    def test_get_notNewRepository(self, mock_checkoutput, mock_resolveuntrackedfiles):
 
         # when
         show_color = 'auto'
@@ -103,11 +134,12 @@ class TestStatus(unittest.TestCase):
         # then
         self.assertEqual(actual_status, 'the status')
         mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
+            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--branch', '--untracked-files=all']
         )
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='')
-    def test_get_notNewRepository_noStatus_andShowCleanMessage(self, mock_checkoutput):
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\n')
+    def test_get_notNewRepository_noStatus_andShowCleanMessage(self, mock_checkoutput, mock_resolveuntrackedfiles):
 
         # when
         show_color = 'auto'
@@ -116,11 +148,12 @@ class TestStatus(unittest.TestCase):
         # then
         self.assertEqual(actual_status, 'nothing to commit, working directory is clean' + os.linesep)
         mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
+            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--branch', '--untracked-files=all']
         )
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='')
-    def test_get_notNewRepository_noStatus_andNoShowCleanMessage(self, mock_checkoutput):
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='all')
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\n')
+    def test_get_notNewRepository_noStatus_andNoShowCleanMessage(self, mock_checkoutput, mock_resolveuntrackedfiles):
 
         # when
         show_color = 'auto'
@@ -129,5 +162,168 @@ class TestStatus(unittest.TestCase):
         # then
         self.assertEqual(actual_status, '')
         mock_checkoutput.assert_called_once_with(
-            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--untracked-files=all']
+            ['git', '-c', 'color.status=' + show_color, 'status', '--short', '--branch', '--untracked-files=all']
         )
+
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='auto')
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=[10, 0.5])
+    @mock.patch('bin.commands.stateextensions.status._status_within_untracked_budget', return_value=('## master\n?? dir/a\n', None))
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_run_auto_withinBudget(self, mock_checkoutput, mock_statuswithinbudget, mock_getconfigvalue, mock_resolveuntrackedfiles):
+
+        # when
+        status_result = status.run(show_color='never')
+
+        # then
+        self.assertEqual(status_result, status.StatusResult('## master', '?? dir/a\n', None))
+        mock_statuswithinbudget.assert_called_once_with(
+            ['git', '-c', 'color.status=never', 'status', '--short', '--branch'], 10, 0.5
+        )
+        mock_getconfigvalue.assert_has_calls([
+            mock.call('git-state.status.untracked-limit', default=10000, as_type=int),
+            mock.call('git-state.status.untracked-timeout', default=1.0, as_type=float)
+        ])
+        mock_checkoutput.assert_not_called()
+
+    @mock.patch('bin.commands.stateextensions.status._resolve_untracked_files', return_value='auto')
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=[10, 0.5])
+    @mock.patch('bin.commands.stateextensions.status._status_within_untracked_budget', return_value=(None, 'the reason'))
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='## master\n?? dir/\n')
+    def test_run_auto_exceedsBudget(self, mock_checkoutput, mock_statuswithinbudget, mock_getconfigvalue, mock_resolveuntrackedfiles):
+
+        # when
+        status_result = status.run(show_color='never')
+
+        # then
+        self.assertEqual(
+            status_result,
+            status.StatusResult('## master', '?? dir/\n', 'untracked directories not expanded: the reason')
+        )
+        mock_checkoutput.assert_called_once_with(
+            ['git', '-c', 'color.status=never', 'status', '--short', '--branch', '--untracked-files=normal']
+        )
+
+    def test_get_withNote(self):
+
+        # when
+        status_result = status.StatusResult('## master', '?? dir/\n', 'the note')
+        actual_status = status.get(status_result=status_result)
+
+        # then
+        self.assertEqual(actual_status, '?? dir/\n(the note)' + os.linesep)
+
+
+class TestStatusResolveUntrackedFiles(unittest.TestCase):
+    layer = GitStateExtensions
+
+    @mock.patch('bin.commands.utils.git.get_config_value')
+    def test_resolveUntrackedFiles_explicitModes(self, mock_getconfigvalue):
+
+        for mode in ('all', 'normal', 'no', 'NO'):
+
+            # given
+            mock_getconfigvalue.return_value = mode
+
+            # expect
+            self.assertEqual(status._resolve_untracked_files(), mode.lower())
+            mock_getconfigvalue.assert_called_with('git-state.status.untracked', default='all')
+
+    @mock.patch('bin.commands.utils.git.get_config_value', return_value='some')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_resolveUntrackedFiles_unknownMode(self, mock_error, mock_getconfigvalue):
+
+        # when
+        with self.assertRaises(SystemExit):
+            status._resolve_untracked_files()
+
+        # then
+        mock_error.assert_called_once_with("unknown untracked files mode 'some'")
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=['auto', 'false', 'true'])
+    def test_resolveUntrackedFiles_auto_fsmonitor(self, mock_getconfigvalue):
+
+        # expect
+        self.assertEqual(status._resolve_untracked_files(), 'all')
+        mock_getconfigvalue.assert_has_calls([
+            mock.call('git-state.status.untracked', default='all'),
+            mock.call('core.untrackedCache', default='false'),
+            mock.call('core.fsmonitor', default='false')
+        ])
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=['auto', 'true', '.git/hooks/query-watchman'])
+    def test_resolveUntrackedFiles_auto_untrackedCache(self, mock_getconfigvalue):
+
+        # expect
+        self.assertEqual(status._resolve_untracked_files(), 'all')
+
+    @mock.patch('bin.commands.utils.git.get_config_value', side_effect=['auto', 'keep', 'false'])
+    def test_resolveUntrackedFiles_auto_notCached(self, mock_getconfigvalue):
+
+        # expect
+        self.assertEqual(status._resolve_untracked_files(), 'auto')
+
+
+class TestStatusWithinUntrackedBudget(unittest.TestCase):
+    layer = GitStateExtensions
+
+    @mock.patch('bin.commands.utils.execute.execute')
+    def test_statusWithinUntrackedBudget_withinBudget(self, mock_execute):
+
+        # given
+        output = '## master\n\x1b[31m??\x1b[m a\n\x1b[31m??\x1b[m b\n M c\n'
+        mock_execute.return_value = (output, '', 0)
+
+        # when
+        result = status._status_within_untracked_budget(['git', 'status'], 2, 10)
+
+        # then
+        self.assertEqual(result, (output, None))
+        mock_execute.assert_called_once_with(['git', '--no-optional-locks', 'status', '--untracked-files=all'], timeout=10)
+
+    @mock.patch('bin.commands.utils.execute.execute', return_value=('## master\n?? a\n?? b\n?? c\n', '', 0))
+    def test_statusWithinUntrackedBudget_tooManyFiles(self, mock_execute):
+
+        # expect
+        self.assertEqual(
+            status._status_within_untracked_budget(['git', 'status'], 2, 10),
+            (None, 'more than 2 untracked files')
+        )
+
+    @mock.patch('bin.commands.utils.execute.execute')
+    def test_statusWithinUntrackedBudget_tooSlow(self, mock_execute):
+
+        # given
+        mock_execute.side_effect = status.execute.TimeoutExpired(['git', 'status'], 2, '## master\n')
+
+        # expect
+        self.assertEqual(
+            status._status_within_untracked_budget(['git', 'status'], 10, 2),
+            (None, 'listing untracked files took longer than 2s')
+        )
+
+    @mock.patch('bin.commands.utils.execute.execute', return_value=('', 'fatal', 128))
+    def test_statusWithinUntrackedBudget_fails(self, mock_execute):
+
+        # expect
+        with self.assertRaises(subprocess.CalledProcessError):
+            status._status_within_untracked_budget(['git', 'status'], 10, 2)
+
+    def test_statusWithinUntrackedBudget_killsSlowStatus(self):
+
+        # given: a status that never produces output
+        dirpath = tempfile.mkdtemp()
+        slow_status = os.path.join(dirpath, 'slow-status')
+        with open(slow_status, 'w') as script:
+            script.write('#!/bin/sh\nsleep 5\n')
+        os.chmod(slow_status, 0o755)
+        start = time.time()
+
+        # when
+        try:
+            result = status._status_within_untracked_budget([slow_status, 'status'], 10, 0.2)
+        finally:
+            shutil.rmtree(dirpath)
+
+        # then
+        self.assertEqual(result, (None, 'listing untracked files took longer than 0.2s'))
+        self.assertLess(time.time() - start, 4)
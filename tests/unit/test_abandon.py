@@ -4,21 +4,23 @@ import unittest
 from . import testutils
 from ..layers import GitAbandon
 from bin.commands import abandon
+from bin.commands.utils import git
+
+
+def _stashes(count):
+    return [git.ReflogEntry('0' * 40, 'stash{}'.format(i), 'identity', 'message {}'.format(i)) for i in range(count)]
 
 
 class TestAbandon(unittest.TestCase):
     layer = GitAbandon
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(4))
+    @mock.patch('bin.commands.utils.git.drop_stashes')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_abandon(self, mock_info, mock_call, mock_checkoutput):
+    def test_abandon(self, mock_info, mock_dropstashes, mock_stashreflog):
 
         #  setup
-        existing_stashes = '1\n2\n3\n4'
-        stash1 = 'stash1\n'
-        stash2 = 'stash2\n'
-        mock_checkoutput.side_effect = [existing_stashes, stash1, stash2]
+        mock_dropstashes.return_value = _stashes(4)[1:3]
 
         # when
         start = 1
@@ -26,51 +28,37 @@ class TestAbandon(unittest.TestCase):
         abandon.abandon(start, end)
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call(['git', 'stash', 'list']),
-            mock.call(['git', 'rev-parse', 'stash@{1}']),
-            mock.call(['git', 'rev-parse', 'stash@{1}'])
-        ])
-        mock_call.assert_called_with('git stash drop --quiet stash@{{{}}}'.format(start).split())
-        self.assertEqual(mock_call.call_count, 2)
+        mock_stashreflog.assert_called_once_with()
+        mock_dropstashes.assert_called_once_with(range(1, 3), reflog=mock_stashreflog.return_value)
         mock_info.assert_has_calls([
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, stash1.strip()), False),
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(2, stash2.strip()), False)
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, 'stash1'), False),
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(2, 'stash2'), False)
         ])
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(4))
+    @mock.patch('bin.commands.utils.git.drop_stashes')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_abandon_quiet(self, mock_info, mock_call, mock_checkoutput):
+    def test_abandon_quiet(self, mock_info, mock_dropstashes, mock_stashreflog):
 
         #  setup
-        existing_stashes = '1\n2\n3\n4'
-        stash1 = 'stash1\n'
-        stash2 = 'stash2\n'
-        mock_checkoutput.side_effect = [existing_stashes, stash1, stash2]
+        mock_dropstashes.return_value = _stashes(4)[1:3]
 
         # when
         start = 1
         end = 3
-        quiet = True
-        abandon.abandon(start, end, quiet=quiet)
+        abandon.abandon(start, end, quiet=True)
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call(['git', 'stash', 'list']),
-            mock.call(['git', 'rev-parse', 'stash@{1}']),
-            mock.call(['git', 'rev-parse', 'stash@{1}'])
-        ])
-        mock_call.assert_called_with('git stash drop --quiet stash@{{{}}}'.format(start).split())
-        self.assertEqual(mock_call.call_count, 2)
+        mock_stashreflog.assert_called_once_with()
+        mock_dropstashes.assert_called_once_with(range(1, 3), reflog=mock_stashreflog.return_value)
         mock_info.assert_has_calls([
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, stash1.strip()), quiet),
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(2, stash2.strip()), quiet)
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, 'stash1'), True),
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(2, 'stash2'), True)
         ])
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='1\n2\n3\n')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(3))
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_abandon_endLessThanZero(self, mock_error, mock_checkoutput):
+    def test_abandon_endLessThanZero(self, mock_error, mock_stashreflog):
 
         # when
         try:
@@ -81,9 +69,9 @@ class TestAbandon(unittest.TestCase):
 
         mock_error.assert_called_once_with('end cannot be negative')
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='1\n2\n3\n')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(3))
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_abandon_endBeforeStart(self, mock_error, mock_checkoutput):
+    def test_abandon_endBeforeStart(self, mock_error, mock_stashreflog):
 
         # when
         try:
@@ -94,9 +82,9 @@ class TestAbandon(unittest.TestCase):
 
         mock_error.assert_called_once_with('end of range cannot come before the start')
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='one\ntwo')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(2))
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_abandon_startGreaterThanStashCount(self, mock_error, mock_checkoutput):
+    def test_abandon_startGreaterThanStashCount(self, mock_error, mock_stashreflog):
 
         # when
         try:
@@ -106,22 +94,19 @@ class TestAbandon(unittest.TestCase):
             pass
 
         # then
-        mock_checkoutput.assert_called_once_with('git stash list'.split())
+        mock_stashreflog.assert_called_once_with()
         mock_error.assert_has_calls([
             mock.call('start too high', exit_=False),
             mock.call('only 2 stashes exist')
         ])
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(2))
+    @mock.patch('bin.commands.utils.git.drop_stashes')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_abandon_endGreaterThanStashCount(self, mock_info, mock_call, mock_checkoutput):
+    def test_abandon_endGreaterThanStashCount(self, mock_info, mock_dropstashes, mock_stashreflog):
 
         #  setup
-        existing_stashes = '1\n2\n'
-        stash1 = 'stash1\n'
-        stash2 = 'stash2\n'
-        mock_checkoutput.side_effect = [existing_stashes, stash1, stash2]
+        mock_dropstashes.return_value = _stashes(2)
 
         # when
         start = 0
@@ -129,27 +114,16 @@ class TestAbandon(unittest.TestCase):
         abandon.abandon(start, end)
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call(['git', 'stash', 'list']),
-            mock.call(['git', 'rev-parse', 'stash@{0}']),
-            mock.call(['git', 'rev-parse', 'stash@{0}'])
-        ])
-        mock_call.assert_called_with('git stash drop --quiet stash@{{{}}}'.format(start).split())
-        self.assertEqual(mock_call.call_count, 2)
+        mock_dropstashes.assert_called_once_with(range(0, 2), reflog=mock_stashreflog.return_value)
         mock_info.assert_has_calls([
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(0, stash1.strip()), False),
-            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, stash2.strip()), False)
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(0, 'stash0'), False),
+            mock.call('Dropped refs/stash@{{{}}} ({})'.format(1, 'stash1'), False)
         ])
 
-    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(4))
+    @mock.patch('bin.commands.utils.git.drop_stashes')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_abandon_dryRun(self, mock_info, mock_checkoutput):
-
-        #  setup
-        existing_stashes = '1\n2\n3\n4'
-        stash1 = 'stash1\n'
-        stash2 = 'stash2\n'
-        mock_checkoutput.side_effect = [existing_stashes, stash1, stash2]
+    def test_abandon_dryRun(self, mock_info, mock_dropstashes, mock_stashreflog):
 
         # when
         start = 1
@@ -157,39 +131,29 @@ class TestAbandon(unittest.TestCase):
         abandon.abandon(start, end, dry_run=True)
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call(['git', 'stash', 'list']),
-            mock.call(['git', 'rev-parse', 'stash@{1}']),
-            mock.call(['git', 'rev-parse', 'stash@{2}'])
-        ])
+        mock_stashreflog.assert_called_once_with()
+        mock_dropstashes.assert_not_called()
         mock_info.assert_has_calls([
-            mock.call('Would drop refs/stash@{{{}}} ({})'.format(1, stash1.strip())),
-            mock.call('Would drop refs/stash@{{{}}} ({})'.format(2, stash2.strip()))
+            mock.call('Would drop refs/stash@{{{}}} ({})'.format(1, 'stash1')),
+            mock.call('Would drop refs/stash@{{{}}} ({})'.format(2, 'stash2'))
         ])
+        self.assertEqual(mock_info.call_count, 2)
 
-    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=_stashes(4))
+    @mock.patch('bin.commands.utils.git.drop_stashes')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_abandon_dryRun_quiet(self, mock_info, mock_checkoutput):
+    def test_abandon_dryRun_quiet(self, mock_info, mock_dropstashes, mock_stashreflog):
         """Same as test_abandon_dryRun since a quiet dry run isn't useful."""
 
-        #  setup
-        existing_stashes = '1\n2\n3\n4'
-        stash1 = 'stash1\n'
-        stash2 = 'stash2\n'
-        mock_checkoutput.side_effect = [existing_stashes, stash1, stash2]
-
         # when
         start = 1
         end = 3
         abandon.abandon(start, end, dry_run=True, quiet=True)
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call(['git', 'stash', 'list']),
-            mock.call(['git', 'rev-parse', 'stash@{1}']),
-            mock.call(['git', 'rev-parse', 'stash@{2}'])
-        ])
+        mock_stashreflog.assert_called_once_with()
+        mock_dropstashes.assert_not_called()
         mock_info.assert_has_calls([
-            mock.call('Would drop refs/stash@{{{}}} ({})'.format(1, stash1.strip())),
-            mock.call('Would drop refs/stash@{{{}}} ({})'.format(2, stash2.strip()))
+            mock.call('Would drop refs/stash@{{{}}} ({})'.format(1, 'stash1')),
+            mock.call('Would drop refs/stash@{{{}}} ({})'.format(2, 'stash2'))
         ])
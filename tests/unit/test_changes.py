@@ -1,4 +1,7 @@
 import mock
+import os
+import shutil
+import tempfile
 import unittest
 
 from . import testutils
@@ -7,36 +10,26 @@ from bin.commands import changes, upstream
 from bin.commands.utils import git
 
 
+def _repository(is_empty=False, is_detached=False, is_ref=True, is_ref_ambiguous=False, full_name='fullname'):
+    repository = mock.Mock()
+    repository.is_empty = is_empty
+    repository.is_detached = is_detached
+    repository.is_ref.return_value = is_ref
+    repository.is_ref_ambiguous.return_value = is_ref_ambiguous
+    repository.symbolic_full_name.return_value = full_name
+    repository.current_branch = 'cur-branch'
+    return repository
+
+
 class TestChangesAssociate(unittest.TestCase):
     layer = GitChanges
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=False)
-    @mock.patch('bin.commands.utils.git.symbolic_full_name')
-    @mock.patch('bin.commands.utils.git.current_branch')
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository())
+    @mock.patch('bin.commands.utils.git.object_infos')
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_associate_isRef_notAmbiguous(
-            self,
-            mock_info,
-            mock_call,
-            mock_currentbranch,
-            mock_symbolicfullname,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_isdetached,
-            mock_isemptyrepository,
-            mock_isgitrepository
-    ):
-
-        # setup
-        cur_branch = 'cur-branch'
-        mock_currentbranch.return_value = cur_branch
-        fullname = 'fullname'
-        mock_symbolicfullname.return_value = fullname
+    def test_associate_isRef_notAmbiguous(self, mock_info, mock_call, mock_objectinfos, mock_repositorycontext, mock_isgitrepository):
 
         # when
         committish = 'c123'
@@ -45,40 +38,28 @@ class TestChangesAssociate(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once()
-        mock_isemptyrepository.assert_called_once_with()
-        mock_isdetached.assert_called_once()
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
-        mock_symbolicfullname.assert_called_once_with(committish)
-        mock_currentbranch.assert_called_once()
+        mock_repositorycontext.assert_called_once_with()
+        repository = mock_repositorycontext.return_value
+        repository.is_ref.assert_called_once_with(committish)
+        repository.is_ref_ambiguous.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
+        repository.symbolic_full_name.assert_called_once_with(committish)
+        mock_objectinfos.assert_not_called()
         mock_call.assert_called_once_with(
-            ['git', 'config', '--local', 'git-changes.associations.' + cur_branch + '.with', fullname]
+            ['git', 'config', '--local', 'git-changes.associations.cur-branch.with', 'fullname']
         )
-        mock_info.assert_called_once_with('{} has been associated with {}'.format(cur_branch, fullname), quiet)
+        mock_info.assert_called_once_with('cur-branch has been associated with fullname', quiet)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_ref_ambiguous=True))
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_associate_isRef_isAmbiguous(
-            self,
-            mock_error,
-            mock_checkoutput,
-            mock_isrefambiguous,
-            mock_isref,
-            mock_isdetached,
-            mock_isemptyrepository,
-            mock_isgitrepository
-    ):
+    def test_associate_isRef_isAmbiguous(self, mock_error, mock_checkoutput, mock_repositorycontext, mock_isgitrepository):
 
         # given
         committish = 'abc123'
-        ref_names = ['refs/heads/master', 'refs/tags/master']
-        refs = '\n'.join(['84f9c10be201690f30252c0c6ef1504fad68251d ' + r for r in ref_names]) + '\n'
-        mock_checkoutput.return_value = refs
+        ref_names = ['refs/heads/abc123', 'refs/tags/abc123']
+        repository = mock_repositorycontext.return_value
+        repository.matching_refs.return_value = ref_names
 
         # when
         try:
@@ -88,41 +69,38 @@ class TestChangesAssociate(unittest.TestCase):
             pass
 
         # then
-        mock_isgitrepository.assert_called_once()
-        mock_isemptyrepository.assert_called_once_with()
-        mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_isrefambiguous.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
-        mock_checkoutput.assert_called_once_with(['git', 'show-ref', '--tags', '--heads', committish])
+        repository.is_ref.assert_called_once_with(committish)
+        repository.is_ref_ambiguous.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
+        repository.matching_refs.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
+        mock_checkoutput.assert_not_called()
         mock_error.assert_called_once_with(
-            '{0!r} is an ambiguous ref. Use one of:\n{1}'.format(committish, '\n'.join(ref_names))
+            "'{0}' is an ambiguous ref. Use one of:\n{1}".format(committish, '\n'.join(ref_names))
         )
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.resolve_sha1')
-    @mock.patch('bin.commands.utils.git.current_branch')
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(full_name=None))
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('sha123', 'commit')])
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_associate_notARef(
-            self,
-            mock_info,
-            mock_call,
-            mock_currentbranch,
-            mock_resolvesha1,
-            mock_isref,
-            mock_isdetached,
-            mock_isemptyrepository,
-            mock_isgitrepository
-    ):
+    def test_associate_isRef_notExpandable(self, mock_info, mock_call, mock_objectinfos, mock_repositorycontext, mock_isgitrepository):
+
+        # when
+        changes.associate('feature', quiet=True)
+
+        # then
+        mock_objectinfos.assert_called_once_with(['feature'])
+        mock_call.assert_called_once_with(['git', 'config', '--local', 'git-changes.associations.cur-branch.with', 'sha123'])
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_ref=False))
+    @mock.patch('bin.commands.utils.git.object_infos')
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_associate_notARef(self, mock_info, mock_call, mock_objectinfos, mock_repositorycontext, mock_isgitrepository):
 
         # setup
-        cur_branch = 'cur-branch'
-        mock_currentbranch.return_value = cur_branch
         resolved_sha1 = 'sha123'
-        mock_resolvesha1.return_value = resolved_sha1
+        mock_objectinfos.return_value = [(resolved_sha1, 'commit')]
 
         # when
         committish = 'c123'
@@ -131,31 +109,20 @@ class TestChangesAssociate(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_isemptyrepository.assert_called_once_with()
-        mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_resolvesha1.assert_called_once_with(committish)
-        mock_currentbranch.assert_called_once()
+        repository = mock_repositorycontext.return_value
+        repository.is_ref.assert_called_once_with(committish)
+        repository.is_ref_ambiguous.assert_not_called()
+        mock_objectinfos.assert_called_once_with([committish])
         mock_call.assert_called_once_with(
-            ['git', 'config', '--local', 'git-changes.associations.' + cur_branch + '.with', resolved_sha1]
+            ['git', 'config', '--local', 'git-changes.associations.cur-branch.with', resolved_sha1]
         )
-        mock_info.assert_called_once_with('{} has been associated with {}'.format(cur_branch, resolved_sha1), quiet)
+        mock_info.assert_called_once_with('cur-branch has been associated with {}'.format(resolved_sha1), quiet)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_detached', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
-    @mock.patch('bin.commands.utils.git.resolve_sha1', return_value=None)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_ref=False))
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[None])
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_associate_notARef_invalidRevision(
-            self,
-            mock_error,
-            mock_resolvesha1,
-            mock_isref,
-            mock_isdetached,
-            mock_isemptyrepository,
-            mock_isgitrepository
-    ):
+    def test_associate_notARef_invalidRevision(self, mock_error, mock_objectinfos, mock_repositorycontext, mock_isgitrepository):
 
         # when
         committish = 'c123'
@@ -168,10 +135,8 @@ class TestChangesAssociate(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_isemptyrepository.assert_called_once_with()
-        mock_isdetached.assert_called_once_with()
-        mock_isref.assert_called_once_with(committish)
-        mock_resolvesha1.assert_called_once_with(committish)
+        mock_repositorycontext.return_value.is_ref.assert_called_once_with(committish)
+        mock_objectinfos.assert_called_once_with([committish])
         mock_error.assert_called_once_with('{} is not a valid revision'.format(committish))
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=False)
@@ -192,9 +157,9 @@ class TestChangesAssociate(unittest.TestCase):
         mock_getcwd.assert_called_once_with()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_empty=True))
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_associate_repositoryisempty(self, mock_error, mock_isemptyrepository, mock_isgitrepository):
+    def test_associate_repositoryisempty(self, mock_error, mock_repositorycontext, mock_isgitrepository):
 
         # when
         try:
@@ -205,14 +170,12 @@ class TestChangesAssociate(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_isemptyrepository.assert_called_once_with()
         mock_error.assert_called_once_with('cannot associate while empty')
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
-    @mock.patch('bin.commands.utils.git.is_detached', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_detached=True))
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_associate_isDetached(self, mock_error, mock_isdetached, mock_isemptyrepository, mock_isgitrepository):
+    def test_associate_isDetached(self, mock_error, mock_repositorycontext, mock_isgitrepository):
 
         # when
         try:
@@ -223,11 +186,246 @@ class TestChangesAssociate(unittest.TestCase):
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_isemptyrepository.assert_called_once_with()
-        mock_isdetached.assert_called_once_with()
         mock_error.assert_called_once_with('cannot associate while HEAD is detached')
 
 
+class TestChangesCached(unittest.TestCase):
+    layer = GitChanges
+
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('headsha', 'commit'), ('basesha', 'commit')])
+    @mock.patch('bin.commands.utils.cache.load', return_value={'count headsha basesha': 3})
+    @mock.patch('bin.commands.utils.cache.save')
+    def test_cached_hit(self, mock_save, mock_load, mock_objectinfos):
+
+        # given
+        compute = mock.Mock()
+
+        # when
+        value = changes._cached('count', 'base', None, compute)
+
+        # then
+        self.assertEqual(value, 3)
+        mock_objectinfos.assert_called_once_with(['HEAD^{commit}', 'base^{commit}'])
+        mock_load.assert_called_once_with('changes')
+        compute.assert_not_called()
+        mock_save.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('headsha', 'commit'), ('basesha', 'commit')])
+    @mock.patch('bin.commands.utils.cache.load', return_value={'count headsha other': 3})
+    @mock.patch('bin.commands.utils.cache.save')
+    def test_cached_miss(self, mock_save, mock_load, mock_objectinfos):
+
+        # when
+        value = changes._cached('count', 'base', ['*md', '*txt'], lambda: 5)
+
+        # then
+        self.assertEqual(value, 5)
+        mock_save.assert_called_once_with('changes', {'count headsha other': 3, 'count headsha basesha *md *txt': 5})
+
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('headsha', 'commit'), ('basesha', 'commit')])
+    @mock.patch('bin.commands.utils.cache.load')
+    @mock.patch('bin.commands.utils.cache.save')
+    def test_cached_miss_full(self, mock_save, mock_load, mock_objectinfos):
+
+        # given
+        mock_load.return_value = dict(('count {} basesha'.format(i), i) for i in range(changes._MAX_CACHE_ENTRIES))
+
+        # when
+        changes._cached('count', 'base', None, lambda: 5)
+
+        # then
+        mock_save.assert_called_once_with('changes', {'count headsha basesha': 5})
+
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('headsha', 'commit'), None])
+    @mock.patch('bin.commands.utils.cache.load')
+    @mock.patch('bin.commands.utils.cache.save')
+    def test_cached_unresolved(self, mock_save, mock_load, mock_objectinfos):
+
+        # expect
+        self.assertEqual(changes._cached('count', 'base', None, lambda: 5), 5)
+        mock_load.assert_not_called()
+        mock_save.assert_not_called()
+
+
+class TestChangesAssociateFromFile(unittest.TestCase):
+    layer = GitChanges
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def _write(self, content):
+        path = os.path.join(self.dirpath, 'associations')
+        with open(path, 'w') as associations_file:
+            associations_file.write(content)
+        return path
+
+    def test_readAssociations(self):
+
+        # given
+        path = self._write('# comment\n\nfeature master\n"odd branch" HEAD~1  # trailing\n')
+
+        # expect
+        self.assertEqual(changes._read_associations(path), [('feature', 'master'), ('odd branch', 'HEAD~1')])
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_readAssociations_invalidLine(self, mock_error):
+
+        for content, message in (
+            ('feature master\nfeature\n', 'invalid associations line 2: expected a branch and a commit-ish'),
+            ('a b c\n', 'invalid associations line 1: expected a branch and a commit-ish'),
+            ('"unclosed master\n', 'invalid associations line 1: No closing quotation')
+        ):
+            mock_error.reset_mock()
+
+            # when
+            try:
+                changes._read_associations(self._write(content))
+                self.fail('expected to exit but did not')  # pragma: no cover
+            except SystemExit:
+                pass
+
+            # then
+            mock_error.assert_called_once_with(message)
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_readAssociations_cannotRead(self, mock_error):
+
+        # when
+        try:
+            changes._read_associations(os.path.join(self.dirpath, 'missing'))
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with("cannot read associations file '{}'".format(os.path.join(self.dirpath, 'missing')))
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext')
+    @mock.patch('bin.commands.changes._read_associations')
+    @mock.patch('bin.commands.utils.git.object_infos')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_associateFromFile(
+            self, mock_info, mock_setlocalconfigvalues, mock_objectinfos, mock_readassociations, mock_repositorycontext,
+            mock_isgitrepository
+    ):
+
+        # given
+        repository = _repository()
+        repository.is_ref.side_effect = lambda committish: committish == 'master'
+        repository.symbolic_full_name.return_value = 'refs/heads/master'
+        mock_repositorycontext.return_value = repository
+        mock_readassociations.return_value = [('one', 'master'), ('two', 'HEAD~1'), ('three', 'abc123')]
+        mock_objectinfos.return_value = [('sha1', 'commit'), ('sha2', 'commit')]
+
+        # when
+        changes.associate_from_file('file', quiet=False)
+
+        # then
+        mock_readassociations.assert_called_once_with('file')
+        mock_objectinfos.assert_called_once_with(['HEAD~1', 'abc123'])
+        mock_setlocalconfigvalues.assert_called_once_with({
+            'git-changes.associations.one.with': 'refs/heads/master',
+            'git-changes.associations.two.with': 'sha1',
+            'git-changes.associations.three.with': 'sha2'
+        })
+        mock_info.assert_has_calls([
+            mock.call('one has been associated with refs/heads/master', False),
+            mock.call('two has been associated with sha1', False),
+            mock.call('three has been associated with sha2', False)
+        ])
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_ref=False))
+    @mock.patch('bin.commands.changes._read_associations', return_value=[('one', 'HEAD'), ('two', 'nope')])
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('sha1', 'commit'), None])
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_associateFromFile_invalidRevision(
+            self, mock_error, mock_setlocalconfigvalues, mock_objectinfos, mock_readassociations, mock_repositorycontext,
+            mock_isgitrepository
+    ):
+
+        # when
+        try:
+            changes.associate_from_file('file')
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with('nope is not a valid revision')
+        mock_setlocalconfigvalues.assert_not_called()
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository())
+    @mock.patch('bin.commands.changes._read_associations', return_value=[])
+    @mock.patch('bin.commands.utils.git.object_infos')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_associateFromFile_noAssociations(
+            self, mock_info, mock_setlocalconfigvalues, mock_objectinfos, mock_readassociations, mock_repositorycontext,
+            mock_isgitrepository
+    ):
+
+        # when
+        changes.associate_from_file('file')
+
+        # then
+        mock_objectinfos.assert_not_called()
+        mock_setlocalconfigvalues.assert_not_called()
+        mock_info.assert_not_called()
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.git.RepositoryContext', return_value=_repository(is_empty=True))
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_associateFromFile_emptyRepository(self, mock_error, mock_repositorycontext, mock_isgitrepository):
+
+        # when
+        try:
+            changes.associate_from_file('file')
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with('cannot associate while empty')
+
+
+class TestChangesExport(unittest.TestCase):
+    layer = GitChanges
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_export(self, mock_stdout, mock_isgitrepository):
+
+        # given
+        mock_stdout.return_value = (
+            'git-changes.associations.feature.with\nrefs/heads/master\x00'
+            'git-changes.associations.odd branch.with\nabc123\x00'
+        )
+
+        # when
+        exported = changes.export()
+
+        # then
+        self.assertEqual(exported, os.linesep.join(['feature refs/heads/master', "'odd branch' abc123"]))
+        mock_stdout.assert_called_once_with(
+            ['git', 'config', '--local', '--null', '--get-regexp', r'^git-changes\.associations\..*\.with$']
+        )
+
+    @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('bin.commands.utils.execute.stdout', return_value='')
+    def test_export_noAssociations(self, mock_stdout, mock_isgitrepository):
+
+        # expect
+        self.assertEqual(changes.export(), '')
+
+
 class TestChangesAssociateUpstream(unittest.TestCase):
     layer = GitChanges
 
@@ -317,22 +515,20 @@ class TestChangesPruneAssociations(unittest.TestCase):
 
     def setUp(self):
         # store private methods so they can be restored after tests that mock them
-        self._unassociate = changes.unassociate
         self._get_associated_branches = changes._get_associated_branches
 
     def tearDown(self):
-        changes.unassociate = self._unassociate
         changes._get_associated_branches = self._get_associated_branches
 
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.changes._get_associated_branches')
-    @mock.patch('bin.commands.changes.unassociate')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_prune_associations(self, mock_info, mock_unassociate, mock_getassociatedbranches, mock_checkoutput):
+    def test_prune_associations(self, mock_info, mock_setlocalconfigvalues, mock_getassociatedbranches, mock_checkoutput):
 
         # setup
         refs = "84f9c10be201690f30252c0c6ef1504fad68251d refs/heads/master\n"
-        association_keys = ['develop', 'master']
+        association_keys = ['develop', 'master', 'feature']
         mock_checkoutput.return_value = refs
         mock_getassociatedbranches.return_value = association_keys
 
@@ -343,14 +539,38 @@ class TestChangesPruneAssociations(unittest.TestCase):
         # then
         mock_checkoutput.assert_called_once_with('git show-ref --heads')
         mock_getassociatedbranches.assert_called_once()
-        mock_unassociate.assert_called_once_with('develop')
-        mock_info.assert_called_once_with("Removed association 'develop'", quiet)
+        mock_setlocalconfigvalues.assert_called_once_with({
+            'git-changes.associations.develop.with': None,
+            'git-changes.associations.feature.with': None
+        })
+        mock_info.assert_has_calls([
+            mock.call("Removed association 'develop'", quiet),
+            mock.call("Removed association 'feature'", quiet)
+        ])
+        self.assertEqual(mock_info.call_count, 2)
+
+    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.changes._get_associated_branches')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_prune_associations_nothingStale(self, mock_info, mock_setlocalconfigvalues, mock_getassociatedbranches, mock_checkoutput):
+
+        # setup
+        mock_checkoutput.return_value = "84f9c10be201690f30252c0c6ef1504fad68251d refs/heads/master\n"
+        mock_getassociatedbranches.return_value = ['master']
+
+        # when
+        changes._prune_associations(changes.CleanupOption.PRUNE, quiet=False)
+
+        # then
+        mock_setlocalconfigvalues.assert_not_called()
+        mock_info.assert_not_called()
 
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.changes._get_associated_branches')
-    @mock.patch('bin.commands.changes.unassociate')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_prune_associations_dryRun(self, mock_info, mock_unassociate, mock_getassociatedbranches, mock_checkoutput):
+    def test_prune_associations_dryRun(self, mock_info, mock_setlocalconfigvalues, mock_getassociatedbranches, mock_checkoutput):
 
         # setup
         refs = "84f9c10be201690f30252c0c6ef1504fad68251d refs/heads/master\n"
@@ -365,21 +585,17 @@ class TestChangesPruneAssociations(unittest.TestCase):
         # then
         mock_checkoutput.assert_called_once_with('git show-ref --heads')
         mock_getassociatedbranches.assert_called_once()
-        mock_unassociate.assert_not_called()
+        mock_setlocalconfigvalues.assert_not_called()
         mock_info.assert_called_once_with("Would remove association 'develop'", quiet)
 
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.changes._get_associated_branches')
-    @mock.patch('bin.commands.changes.unassociate')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_prune_associations_all(self, mock_info, mock_unassociate, mock_getassociatedbranches, mock_checkoutput):
+    def test_prune_associations_all(self, mock_info, mock_setlocalconfigvalues, mock_getassociatedbranches, mock_checkoutput):
 
         # setup
-        refs = """84f9c10be201690f30252c0c6ef1504fad68251d refs/heads/develop
-84f9c10be201690f30252c0c6ef1504fad68251d refs/heads/master
-"""
         association_keys = ['develop', 'master']
-        mock_checkoutput.return_value = refs
         mock_getassociatedbranches.return_value = association_keys
 
         # when
@@ -387,18 +603,17 @@ class TestChangesPruneAssociations(unittest.TestCase):
         changes._prune_associations(changes.CleanupOption.ALL, quiet=quiet)
 
         # then
-        mock_checkoutput.assert_called_once_with('git show-ref --heads')
+        mock_checkoutput.assert_not_called()
         mock_getassociatedbranches.assert_called_once()
-        mock_unassociate.assert_has_calls([
-            mock.call('develop'),
-            mock.call('master')
-        ])
+        mock_setlocalconfigvalues.assert_called_once_with({
+            'git-changes.associations.develop.with': None,
+            'git-changes.associations.master.with': None
+        })
         mock_info.assert_has_calls([
             mock.call("Removed association 'develop'", quiet),
             mock.call("Removed association 'master'", quiet)
         ])
 
-
 class TestChangesUnassociate(unittest.TestCase):
     layer = GitChanges
 
@@ -409,6 +624,28 @@ class TestChangesUnassociate(unittest.TestCase):
     def tearDown(self):
         changes.get_association = self._get_association
 
+    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.changes._get_associated_branches')
+    @mock.patch('bin.commands.utils.git.set_local_config_values')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_prune_associations_multipleValues(self, mock_info, mock_setlocalconfigvalues, mock_getassociatedbranches, mock_checkoutput):
+
+        # setup
+        mock_getassociatedbranches.return_value = ['master', 'develop', 'master']
+
+        # when
+        changes._prune_associations(changes.CleanupOption.ALL, quiet=False)
+
+        # then
+        mock_setlocalconfigvalues.assert_called_once_with({
+            'git-changes.associations.master.with': None,
+            'git-changes.associations.develop.with': None
+        })
+        self.assertEqual(mock_info.call_args_list, [
+            mock.call("Removed association 'master'", False),
+            mock.call("Removed association 'develop'", False)
+        ])
+
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.utils.git.current_branch')
@@ -892,15 +1129,14 @@ class TestChangesChanges(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref_ambiguous', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.utils.git.matching_refs')
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
     def test_changes_isrefandisambiguous(
-            self, mock_error, mock_checkoutput, mock_isrefambiguous, mock_isref, mock_iscommit, mock_isgitrepository
+            self, mock_error, mock_matchingrefs, mock_isrefambiguous, mock_isref, mock_iscommit, mock_isgitrepository
     ):
         # setup
         ref_names = ['refs/heads/master', 'refs/tags/mtag']
-        refs = '\n'.join(['84f9c10be201690f30252c0c6ef1504fad68251d ' + r for r in ref_names]) + '\n'
-        mock_checkoutput.return_value = refs
+        mock_matchingrefs.return_value = ref_names
 
         # when
         committish = 'commit-ish'
@@ -915,7 +1151,7 @@ class TestChangesChanges(unittest.TestCase):
         mock_iscommit.assert_called_once_with(committish)
         mock_isref.assert_called_once_with(committish)
         mock_isrefambiguous.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
-        mock_checkoutput.assert_called_once_with(['git', 'show-ref', '--tags', '--heads', committish])
+        mock_matchingrefs.assert_called_once_with(committish, limit=(git.RefType.HEADS, git.RefType.TAGS))
         mock_error.assert_called_once_with(
             '{0!r} is an ambiguous ref. Use one of:\n{1}'.format(committish, '\n'.join(ref_names))
         )
@@ -1065,19 +1301,19 @@ class TestChangesChanges(unittest.TestCase):
             ['git', 'diff', '--color={}'.format(color_when), '--stat', committish + '...HEAD', '--', ' '.join(files)]
         )
 
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('head', 'commit'), None])
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_changes_details_count(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_count(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository, mock_objectinfos):
 
         # given
         committish = 'commit-ish'
         color_when = changes.ColorOption.NEVER
-        log = ['one', 'two', 'three']
-        mock_checkoutput.return_value = '\n'.join(log) + '\n'
+        mock_checkoutput.return_value = '3\n'
         mock_resolvecoloring.return_value = color_when
 
         # when
@@ -1087,23 +1323,25 @@ class TestChangesChanges(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_iscommit.assert_called_once_with(committish)
         mock_isref.assert_called_once_with(committish)
-        mock_checkoutput.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish)])
-        mock_info.assert_called_once_with(str(len(log)))
+        mock_checkoutput.assert_called_once_with(['git', 'rev-list', '--count', '{}..HEAD'.format(committish)])
+        mock_info.assert_called_once_with('3')
 
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('head', 'commit'), None])
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_changes_details_count_withFiles(self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_count_withFiles(
+            self, mock_info, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository, mock_objectinfos
+    ):
 
         # given
         committish = 'commit-ish'
         color_when = changes.ColorOption.NEVER
         files = ['*txt', '*md']
-        log = ['one', 'two', 'three']
-        mock_checkoutput.return_value = '\n'.join(log) + '\n'
+        mock_checkoutput.return_value = '3\n'
         mock_resolvecoloring.return_value = color_when
 
         # when
@@ -1113,17 +1351,19 @@ class TestChangesChanges(unittest.TestCase):
         mock_isgitrepository.assert_called_once_with()
         mock_iscommit.assert_called_once_with(committish)
         mock_isref.assert_called_once_with(committish)
-        mock_checkoutput.assert_called_once_with(
-            ['git', 'log', '--no-decorate', '--oneline', '{}..HEAD'.format(committish), '--', ' '.join(files)])
-        mock_info.assert_called_once_with(str(len(log)))
+        mock_checkoutput.assert_called_once_with(['git', 'rev-list', '--count', '{}..HEAD'.format(committish), '--', ' '.join(files)])
+        mock_info.assert_called_once_with('3')
 
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('head', 'commit'), None])
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.utils.execute.call')
-    def test_changes_details_inverse_log(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_inverse_log(
+            self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository, mock_objectinfos
+    ):
 
         # given
         committish = 'commit-ish'
@@ -1142,13 +1382,16 @@ class TestChangesChanges(unittest.TestCase):
         mock_checkoutput.assert_called_once_with(['git', 'merge-base', committish, 'HEAD'])
         mock_call.assert_called_once_with(['git', 'log', '--no-decorate', '--oneline', '-10', merge_base, '--color=' + color_when.name.lower()])
 
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('head', 'commit'), None])
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.is_commit', return_value=True)
     @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
     @mock.patch('bin.commands.utils.git.resolve_coloring')
     @mock.patch('bin.commands.utils.execute.check_output')
     @mock.patch('bin.commands.utils.execute.call')
-    def test_changes_details_inverse_log_withFiles(self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository):
+    def test_changes_details_inverse_log_withFiles(
+            self, mock_call, mock_checkoutput, mock_resolvecoloring, mock_isref, mock_iscommit, mock_isgitrepository, mock_objectinfos
+    ):
 
         # given
         committish = 'commit-ish'
@@ -4,78 +4,80 @@ import unittest
 from . import testutils
 from ..layers import GitReindex
 from bin.commands import reindex
+from bin.commands.utils import git
 
 
 class TestReindex(unittest.TestCase):
     layer = GitReindex
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files', return_value=['file3'])
+    @mock.patch('bin.commands.utils.git.status')
     @mock.patch('bin.commands.utils.execute.call')
-    def test_reindex_noneDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    def test_reindex_noneDeleted(self, mock_call, mock_status, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
+        mock_status.return_value = iter([
+            git.StatusEntry('file1', 'M', '.'),
+            git.StatusEntry('file2', 'A', 'M'),
+            git.StatusEntry('file3', '.', 'M')
+        ])
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_called_once_with(['git', 'add', '--'] + files)
+        mock_status.assert_called_once_with(untracked_files='no')
+        mock_call.assert_called_once_with(['git', 'add', '--', 'file1', 'file2'])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files')
+    @mock.patch('bin.commands.utils.git.status')
     @mock.patch('bin.commands.utils.execute.call')
-    def test_reindex_someDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    def test_reindex_someDeleted(self, mock_call, mock_status, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2', 'file3']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
-        mock_deletedfiles.return_value = ['file2']
+        mock_status.return_value = iter([
+            git.StatusEntry('file1', 'M', '.'),
+            git.StatusEntry('file2', 'D', '.'),
+            git.StatusEntry('file3', 'R', 'M', original_path='file0'),
+            git.StatusEntry('file4', 'M', 'D')
+        ])
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
-        mock_call.assert_called_once_with(['git', 'add', '--', 'file1', 'file3'])
+        mock_status.assert_called_once_with(untracked_files='no')
+        mock_call.assert_called_once_with(['git', 'add', '--', 'file1', 'file3', 'file4'])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.git.deleted_files')
+    @mock.patch('bin.commands.utils.git.status')
     @mock.patch('bin.commands.utils.execute.call')
-    def test_reindex_allDeleted(self, mock_call, mock_deletedfiles, mock_checkoutput, mock_isgitrepository):
+    def test_reindex_allDeleted(self, mock_call, mock_status, mock_isgitrepository):
 
         # setup
-        files = ['file1', 'file2']
-        mock_checkoutput.return_value = '\n'.join(files) + '\n'
-        mock_deletedfiles.return_value = files
+        mock_status.return_value = iter([git.StatusEntry('file1', 'D', '.'), git.StatusEntry('file2', 'D', '.')])
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
+        mock_status.assert_called_once_with(untracked_files='no')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output', return_value = '')
+    @mock.patch('bin.commands.utils.git.status', return_value=iter([]))
     @mock.patch('bin.commands.utils.execute.call')
-    def test_reindex_noFilesToIndex(self, mock_call, mock_checkoutput, mock_isgitrepository):
+    def test_reindex_noFilesToIndex(self, mock_call, mock_status, mock_isgitrepository):
 
         # when
         reindex.reindex()
 
         # then
         mock_isgitrepository.assert_called_once_with()
-        mock_checkoutput.assert_called_once_with('git diff --name-only --cached'.split())
+        mock_status.assert_called_once_with(untracked_files='no')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=False)
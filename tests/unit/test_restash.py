@@ -1,233 +1,318 @@
 import mock
+import subprocess
 import unittest
 
 from . import testutils
 from ..layers import GitRestash
 from bin.commands import restash
+from bin.commands.utils import git
+
+
+def _stash(name='stash@{0}', sha1='sha', base='base', untracked=None, modified=True):
+    return restash._Stash(name, sha1, base, untracked, modified)
 
 
 class TestRestash(unittest.TestCase):
     layer = GitRestash
 
-    def setUp(self):
-        # store private methods so they can be restored after tests that mock them
-        self._is_valid_stash = restash._is_valid_stash
-        self._parents = restash._parents
+    @mock.patch('bin.commands.restash._resolve_stashes')
+    @mock.patch('bin.commands.restash._reverse_modifications')
+    @mock.patch('bin.commands.restash._remove_untracked_files')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_restash(self, mock_info, mock_removeuntrackedfiles, mock_reversemodifications, mock_resolvestashes):
 
-    def tearDown(self):
-        restash._is_valid_stash = self._is_valid_stash
-        restash._parents = self._parents
+        # setup
+        stashes = [_stash('stash@{0}', 'sha0'), _stash('stash@{2}', 'sha2')]
+        mock_resolvestashes.return_value = stashes
 
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call_input')
-    @mock.patch('bin.commands.restash._parents', return_value=[1, 2])
+        # when
+        restash.restash(['stash@{0}', 'stash@{2}'])
+
+        # then
+        mock_resolvestashes.assert_called_once_with(['stash@{0}', 'stash@{2}'])
+        mock_reversemodifications.assert_called_once_with(stashes)
+        mock_removeuntrackedfiles.assert_called_once_with(stashes)
+        mock_info.assert_has_calls([
+            mock.call('Restashed stash@{0} (sha0)', False),
+            mock.call('Restashed stash@{2} (sha2)', False)
+        ])
+
+    @mock.patch('bin.commands.restash._resolve_stashes', return_value=[_stash()])
+    @mock.patch('bin.commands.restash._reverse_modifications')
+    @mock.patch('bin.commands.restash._remove_untracked_files')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_restash_noUntrackedFiles(self, mock_info, mock_parents, mock_callinput, mock_checkoutput, mock_isvalidstash):
+    def test_restash_defaultsToLatestStash(self, mock_info, mock_removeuntrackedfiles, mock_reversemodifications, mock_resolvestashes):
+
+        # when
+        restash.restash(quiet=True)
+
+        # then
+        mock_resolvestashes.assert_called_once_with(['stash@{0}'])
+        mock_info.assert_called_once_with('Restashed stash@{0} (sha)', True)
+
+    def test_expandStashes(self):
+
+        # expect
+        self.assertEqual(restash._expand_stashes(['stash@{0}']), ['stash@{0}'])
+        self.assertEqual(
+            restash._expand_stashes(['stash@{1}..stash@{3}', 'stash@{0}']),
+            ['stash@{1}', 'stash@{2}', 'stash@{3}', 'stash@{0}']
+        )
+        self.assertEqual(restash._expand_stashes(['stash@{2}..stash@{1}']), ['stash@{1}', 'stash@{2}'])
+        self.assertEqual(restash._expand_stashes(['stash@{1}', 'stash@{0}..stash@{1}']), ['stash@{1}', 'stash@{0}'])
+        self.assertEqual(restash._expand_stashes(['blarg']), ['blarg'])
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.git.object_infos')
+    def test_resolveStashes(self, mock_objectinfos, mock_stashreflog):
 
         # setup
-        reverse_patch_output = 'reverse patch'
-        stash_sha = 'stash sha'
-        mock_checkoutput.side_effect = ['stash1', reverse_patch_output, stash_sha + '\n']
-        mock_callinput.return_value = 0
+        mock_stashreflog.return_value = [git.ReflogEntry('old', 'sha0', 'identity'), git.ReflogEntry('old', 'sha1', 'identity')]
+        mock_objectinfos.return_value = [
+            ('sha1', 'commit'), ('tree1', 'tree'), ('base1', 'commit'), ('tree1', 'tree'), ('untracked1', 'commit'),
+            ('sha2', 'commit'), ('tree2', 'tree'), ('base2', 'commit'), ('basetree2', 'tree'), None
+        ]
 
         # when
-        restash.restash()
+        stashes = restash._resolve_stashes(['stash@{1}', 'stash@{1.hour.ago}'])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call('git stash show --patch --no-color stash@{0}'.split()),
-            mock.call('git rev-parse stash@{0}'.split())
+        self.assertEqual(stashes, [
+            restash._Stash('stash@{1}', 'sha1', 'base1', 'untracked1', False),
+            restash._Stash('stash@{1.hour.ago}', 'sha2', 'base2', None, True)
+        ])
+        mock_objectinfos.assert_called_once_with([
+            'sha1', 'sha1^{tree}', 'sha1^1', 'sha1^1^{tree}', 'sha1^3',
+            'stash@{1.hour.ago}', 'stash@{1.hour.ago}^{tree}', 'stash@{1.hour.ago}^1', 'stash@{1.hour.ago}^1^{tree}',
+            'stash@{1.hour.ago}^3'
         ])
-        mock_callinput.assert_called_once_with(['git', 'apply', '--reverse'], reverse_patch_output)
-        mock_parents.assert_called_once_with('stash@{0}')
-        mock_info.assert_called_once_with('Restashed stash@{{0}} ({})'.format(stash_sha), False)
 
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call_input')
-    @mock.patch('bin.commands.restash._parents', return_value=[1, 2, 3])
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=[])
+    @mock.patch('bin.commands.utils.git.object_infos')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_resolveStashes_noStashesExist(self, mock_error, mock_objectinfos, mock_stashreflog):
+
+        # when
+        try:
+            restash._resolve_stashes(['stash@{0}'])
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with('no stashes exist')
+        mock_objectinfos.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=[git.ReflogEntry('old', 'sha0', 'identity')])
+    @mock.patch('bin.commands.utils.git.object_infos')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_resolveStashes_invalidStash(self, mock_error, mock_objectinfos, mock_stashreflog):
+
+        for stash in ('blarg', 'stash@{1}'):
+            mock_error.reset_mock()
+
+            # when
+            try:
+                restash._resolve_stashes(['stash@{0}', stash])
+                self.fail('expected to exit but did not')  # pragma: no cover
+            except SystemExit:
+                pass
+
+            # then
+            mock_error.assert_called_once_with('{} is not a valid stash reference'.format(stash))
+        mock_objectinfos.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=[git.ReflogEntry('old', 'sha0', 'identity')])
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[None] * 5)
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_resolveStashes_notACommit(self, mock_error, mock_objectinfos, mock_stashreflog):
+
+        # when
+        try:
+            restash._resolve_stashes(['stash@{x}'])
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with('stash@{x} is not a valid stash reference')
+
+    @mock.patch('bin.commands.utils.execute.records')
     @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.messages.info')
-    def test_restash_untrackedFiles(self, mock_info, mock_call, mock_parents, mock_callinput, mock_checkoutput, mock_isvalidstash):
+    @mock.patch('os.removedirs')
+    def test_removeUntrackedFiles(self, mock_removedirs, mock_call, mock_records):
 
         # setup
-        reverse_patch_output = 'reverse patch'
-        stash_sha = 'stash sha'
-        untracked_files = ['file1', 'file2']
-        mock_checkoutput.side_effect = ['stash1', reverse_patch_output, '\n'.join(untracked_files), stash_sha + '\n']
-        mock_callinput.return_value = 0
+        mock_records.side_effect = [iter(['file2', 'dir/file1']), iter(['dir/nested/file3', 'dir/file1'])]
 
         # when
-        restash.restash()
+        restash._remove_untracked_files([_stash(untracked='u1'), _stash(), _stash(untracked='u2')])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call('git stash show --patch --no-color stash@{0}'.split()),
-            mock.call('git ls-tree --name-only stash@{0}^3'.split()),
-            mock.call('git rev-parse stash@{0}'.split())
+        mock_records.assert_has_calls([
+            mock.call(['git', 'ls-tree', '-r', '-z', '--name-only', 'u1']),
+            mock.call(['git', 'ls-tree', '-r', '-z', '--name-only', 'u2'])
         ])
-        mock_callinput.assert_called_once_with(['git', 'apply', '--reverse'], reverse_patch_output)
-        mock_parents.assert_called_once_with('stash@{0}')
-        mock_call.assert_called_once_with(['git', 'clean', '--force', '--quiet', '--'] + untracked_files)
-        mock_info.assert_called_once_with('Restashed stash@{{0}} ({})'.format(stash_sha), False)
+        mock_call.assert_called_once_with(
+            ['git', '--literal-pathspecs', 'clean', '--force', '--quiet', '--', 'dir/file1', 'dir/nested/file3', 'file2']
+        )
+        mock_removedirs.assert_has_calls([mock.call('dir/nested'), mock.call('dir')])
 
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call_input')
-    @mock.patch('bin.commands.restash._parents', return_value=[1, 2, 3])
+    @mock.patch('bin.commands.utils.execute.records')
     @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.messages.info')
-    def test_restash_untrackedFiles_butNoneFound(self, mock_info, mock_call, mock_parents, mock_callinput, mock_checkoutput, mock_isvalidstash):
-        """This case is possible if --include-untracked is used when not needed."""
+    def test_removeUntrackedFiles_inBatches(self, mock_call, mock_records):
 
         # setup
-        reverse_patch_output = 'reverse patch'
-        stash_sha = 'stash sha'
-        mock_checkoutput.side_effect = ['stash1', reverse_patch_output, '', stash_sha + '\n']
-        mock_callinput.return_value = 0
+        paths = ['{:05}'.format(i) + 'x' * 1000 for i in range(100)]
+        mock_records.return_value = iter(paths)
 
         # when
-        restash.restash()
+        restash._remove_untracked_files([_stash(untracked='u1')])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call('git stash show --patch --no-color stash@{0}'.split()),
-            mock.call('git ls-tree --name-only stash@{0}^3'.split()),
-            mock.call('git rev-parse stash@{0}'.split())
-        ])
-        mock_callinput.assert_called_once_with(['git', 'apply', '--reverse'], reverse_patch_output)
-        mock_parents.assert_called_once_with('stash@{0}')
+        self.assertEqual(mock_call.call_count, 4)
+        cleaned = []
+        for call in mock_call.call_args_list:
+            command = call[0][0]
+            self.assertEqual(command[:6], ['git', '--literal-pathspecs', 'clean', '--force', '--quiet', '--'])
+            self.assertLessEqual(sum(len(path) + 1 for path in command[6:]), restash._MAX_CLEAN_ARGUMENTS_LENGTH)
+            cleaned += command[6:]
+        self.assertEqual(cleaned, paths)
+
+    @mock.patch('bin.commands.utils.execute.records')
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_removeUntrackedFiles_noUntrackedParent(self, mock_call, mock_records):
+
+        # when
+        restash._remove_untracked_files([_stash()])
+
+        # then
+        mock_records.assert_not_called()
         mock_call.assert_not_called()
-        mock_info.assert_called_once_with('Restashed stash@{{0}} ({})'.format(stash_sha), False)
 
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=True)
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call_input')
-    @mock.patch('bin.commands.restash._parents', return_value=[1, 2, 3])
+    @mock.patch('bin.commands.utils.execute.records', return_value=iter([]))
     @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.messages.info')
-    def test_restash_untrackedFiles_noPatchToReverce(self, mock_info, mock_call, mock_parents, mock_callinput, mock_checkoutput, mock_isvalidstash):
-        """This tests stashes consisting only of untracked files."""
+    def test_removeUntrackedFiles_butNoneFound(self, mock_call, mock_records):
+        """This case is possible if --include-untracked is used when not needed."""
 
-        # setup
-        stash_sha = 'stash sha'
-        untracked_files = ['file1', 'file2']
-        mock_checkoutput.side_effect = ['stash1', '', '\n'.join(untracked_files), stash_sha + '\n']
+        # when
+        restash._remove_untracked_files([_stash(untracked='u1')])
+
+        # then
+        mock_call.assert_not_called()
+
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_reverseModifications_noModifications(self, mock_checkoutput):
+        """This tests stashes consisting only of untracked files."""
 
         # when
-        restash.restash()
+        restash._reverse_modifications([_stash(modified=False)])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call('git stash show --patch --no-color stash@{0}'.split()),
-            mock.call('git ls-tree --name-only stash@{0}^3'.split()),
-            mock.call('git rev-parse stash@{0}'.split())
-        ])
-        mock_callinput.assert_not_called()
-        mock_parents.assert_called_once_with('stash@{0}')
-        mock_call.assert_called_once_with(['git', 'clean', '--force', '--quiet', '--'] + untracked_files)
-        mock_info.assert_called_once_with('Restashed stash@{{0}} ({})'.format(stash_sha), False)
+        mock_checkoutput.assert_not_called()
 
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=True)
     @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.utils.execute.call_input')
+    @mock.patch('bin.commands.utils.execute.pipe', return_value=0)
+    @mock.patch('bin.commands.utils.execute.records')
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_restash_unableToReverseApplyPath(self, mock_error, mock_callinput, mock_checkoutput, mock_isvaidstash):
+    def test_reverseModifications_unableToMerge(self, mock_error, mock_records, mock_pipe, mock_checkoutput):
 
         # setup
-        reverse_patch_output = 'reverse patch'
-        stash_sha = 'stash sha'
-        mock_checkoutput.side_effect = ['stash1', reverse_patch_output, stash_sha + '\n']
-        mock_callinput.return_value = 1
+        mock_records.side_effect = [iter(['README.md']), iter(['README.md'])]
+        mock_checkoutput.side_effect = ['', 'worktree\n', subprocess.CalledProcessError(128, 'git read-tree')]
+        stashes = [_stash('stash@{0}', 'sha0', 'base0'), _stash('stash@{1}', 'sha1', 'base1', modified=False), _stash('stash@{2}', 'sha2', 'base2')]
 
         # when
         try:
-            restash.restash()
+            restash._reverse_modifications(stashes)
             self.fail('expected to exit but did not')  # pragma: no cover
         except SystemExit:
             pass
 
         # then
         mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call('git stash show --patch --no-color stash@{0}'.split())
+            mock.call(['git', 'read-tree', 'sha0'], env=mock.ANY),
+            mock.call(['git', 'write-tree'], env=mock.ANY),
+            mock.call(['git', 'read-tree', '-m', '-i', '--aggressive', 'sha0', 'worktree', 'base0'], env=mock.ANY)
+        ])
+        mock_pipe.assert_has_calls([
+            mock.call(
+                ['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', 'base0', 'sha0'],
+                ['git', 'update-index', '--add', '--remove', '-z', '--stdin'],
+                env=mock.ANY
+            ),
+            mock.call(
+                ['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', 'base2', 'sha2'],
+                ['git', 'update-index', '--add', '--remove', '-z', '--stdin'],
+                env=mock.ANY
+            )
+        ])
+        mock_records.assert_has_calls([
+            mock.call(['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', 'base0', 'worktree'], env=mock.ANY),
+            mock.call(['git', 'diff-tree', '-r', '-z', '--no-renames', '--name-only', 'base0', 'sha0'], env=mock.ANY)
         ])
-        mock_callinput.assert_called_once_with(['git', 'apply', '--reverse'], reverse_patch_output)
+        self.assertTrue(mock_pipe.call_args[1]['env']['GIT_INDEX_FILE'].endswith('index'))
         mock_error.assert_called_once_with('unable to reverse modifications', exit_=True)
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='')
+    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.utils.execute.pipe', return_value=0)
+    @mock.patch('bin.commands.utils.execute.records')
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_restash_noStashesExist(self, mock_error, mock_checkoutput):
+    def test_reverseModifications_notApplied(self, mock_error, mock_records, mock_pipe, mock_checkoutput):
+
+        # setup
+        mock_records.side_effect = [iter(['CHANGELOG.md']), iter(['README.md'])]
+        mock_checkoutput.side_effect = ['', 'worktree\n']
 
         # when
         try:
-            restash.restash()
+            restash._reverse_modifications([_stash('stash@{0}', 'sha0', 'base0')])
             self.fail('expected to exit but did not')  # pragma: no cover
         except SystemExit:
             pass
 
         # then
-        mock_checkoutput.assert_called_once_with('git stash list')
-        mock_error.assert_called_once_with('no stashes exist')
+        self.assertEqual(mock_checkoutput.call_count, 2)
+        mock_error.assert_called_once_with('unable to reverse modifications', exit_=True)
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='stash1')
-    @mock.patch('bin.commands.restash._is_valid_stash', return_value=False)
+    @mock.patch('bin.commands.utils.execute.check_output')
+    @mock.patch('bin.commands.utils.execute.pipe', return_value=128)
     @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
-    def test_restash_invalidStash(self, mock_error, mock_isvalidstash, mock_checkoutput):
+    def test_reverseModifications_unableToReadWorkingTree(self, mock_error, mock_pipe, mock_checkoutput):
 
         # when
-        stash = 'stash@{10}'
         try:
-            restash.restash(stash)
+            restash._reverse_modifications([_stash()])
             self.fail('expected to exit but did not')  # pragma: no cover
         except SystemExit:
             pass
 
         # then
-        mock_checkoutput.assert_called_once_with('git stash list')
-        mock_isvalidstash.assert_called_once_with(stash)
-        mock_error.assert_called_once_with('{} is not a valid stash reference'.format(stash))
-
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_isValidStash(self, mock_swallow):
-
-        # setup
-        mock_swallow.return_value = 0
-
-        # when
-        stash = 'stash@{2}'
-        is_valid_stash = restash._is_valid_stash(stash)
-
-        # then
-        mock_swallow.assert_called_once_with(['git', 'cat-file', '-t', stash])
-        self.assertEqual(is_valid_stash, True)
-
-    @mock.patch('subprocess.Popen')
-    def test_isValidStash_failsRegex(self, mock_popen):
+        mock_checkoutput.assert_called_once_with(['git', 'read-tree', 'sha'], env=mock.ANY)
+        mock_error.assert_called_once_with('unable to reverse modifications', exit_=True)
 
-        # when
-        is_valid_stash = restash._is_valid_stash('not valid')
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_mergeEntry_notMergeable(self, mock_checkoutput):
 
-        # then
-        self.assertEqual(is_valid_stash, False)
-        mock_popen.assert_not_called()
+        # expect
+        self.assertIsNone(restash._merge_entry({1: ('100644', 'a'), 2: ('100644', 'b')}))
+        self.assertIsNone(restash._merge_entry({1: ('120000', 'a'), 2: ('120000', 'b'), 3: ('120000', 'c')}))
+        mock_checkoutput.assert_not_called()
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    def test_parents(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.execute.records')
+    def test_unmergedEntries(self, mock_records):
 
         # setup
-        expected_parents = ['p1', 'p2', 'p3']
-        mock_checkoutput.return_value = ' '.join(['p0'] + expected_parents)
+        mock_records.return_value = iter([
+            '100644 bbb 1\tconflict', '100644 ccc 2\tconflict', '100755 ddd 3\tconflict', '100644 eee 1\tdeleted'
+        ])
 
         # when
-        commit = 'sha123'
-        actual_parents = restash._parents(commit)
+        stages = restash._unmerged_entries({'the': 'env'})
 
         # then
-        self.assertEqual(actual_parents, expected_parents)
-        mock_checkoutput.assert_called_once_with(['git', 'rev-list', '--parents', '-1', commit])
+        self.assertEqual(stages, {
+            'conflict': {1: ('100644', 'bbb'), 2: ('100644', 'ccc'), 3: ('100755', 'ddd')},
+            'deleted': {1: ('100644', 'eee')}
+        })
+        mock_records.assert_called_once_with(['git', 'ls-files', '--unmerged', '-z'], env={'the': 'env'})
@@ -1,229 +1,438 @@
 import mock
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
+from . import testutils
 from ..layers import GitSnapshot
 from bin.commands import snapshot
+from bin.commands.utils import git
 
 
 class TestSnapshotSnapshot(unittest.TestCase):
     layer = GitSnapshot
 
-    def setUp(self):
-        # store private methods so they can be restored after tests that mock them
-        self._stash_buffer = snapshot._stash_buffer
-
-    def tearDown(self):
-        snapshot._stash_buffer = self._stash_buffer
+    @mock.patch('bin.commands.utils.git.status')
+    @mock.patch('bin.commands.snapshot._create_snapshots')
+    def test_snapshot_noMessage(self, mock_createsnapshots, mock_status):
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_noMessage(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+        # given
+        entries = [git.StatusEntry('file.txt', '.', 'M')]
+        mock_status.return_value = iter(entries)
 
         # when
         snapshot.snapshot()
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with('git stash push --include-untracked'.split())
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_status.assert_called_once_with(pathspecs=None)
+        mock_createsnapshots.assert_called_once_with([(None, entries)], False, False)
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_quiet(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.status')
+    @mock.patch('bin.commands.snapshot._create_snapshots')
+    def test_snapshot_withMessageAndFiles(self, mock_createsnapshots, mock_status):
+
+        # given
+        entries = [git.StatusEntry('file1', '.', 'M'), git.StatusEntry('file2', '?', '?')]
+        mock_status.return_value = iter(entries)
 
         # when
-        snapshot.snapshot(quiet=True)
+        snapshot.snapshot('the message', replace=True, quiet=True, files=['file1', 'file2'])
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with('git stash push --include-untracked --quiet'.split())
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_status.assert_called_once_with(pathspecs=['file1', 'file2'])
+        mock_createsnapshots.assert_called_once_with([('the message', entries)], True, True)
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_withMessage(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.status', return_value=iter([]))
+    @mock.patch('bin.commands.snapshot._create_snapshots')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_snapshot_noChangesToSnapshot(self, mock_info, mock_createsnapshots, mock_status):
 
         # when
-        message = 'the message'
-        snapshot.snapshot(message)
+        quiet = False
+        snapshot.snapshot(quiet=quiet)
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with(['git', 'stash', 'push', '--include-untracked', '--message', message])
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_status.assert_called_once_with(pathspecs=None)
+        mock_info.assert_called_once_with('No local changes to save. No snapshot created.', quiet)
+        mock_createsnapshots.assert_not_called()
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_withFiles(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+    @mock.patch('bin.commands.snapshot._read_manifest', return_value=[('the message', ['a'])])
+    @mock.patch('bin.commands.snapshot._match_manifest', return_value=[('the message', [])])
+    @mock.patch('bin.commands.snapshot._create_snapshots')
+    @mock.patch('bin.commands.utils.git.status')
+    def test_snapshot_manifest(self, mock_status, mock_createsnapshots, mock_matchmanifest, mock_readmanifest):
 
         # when
-        message = None
-        files = ['file1', 'file2']
-        snapshot.snapshot(message, files=files)
+        snapshot.snapshot(replace=True, quiet=True, manifest='the-manifest')
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with(['git', 'stash', 'push', '--include-untracked', '--'] + files)
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_readmanifest.assert_called_once_with('the-manifest')
+        mock_matchmanifest.assert_called_once_with([('the message', ['a'])])
+        mock_createsnapshots.assert_called_once_with([('the message', [])], True, True)
+        mock_status.assert_not_called()
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_withFilesAndMessages(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+
+class TestSnapshotCreateSnapshots(unittest.TestCase):
+    layer = GitSnapshot
+
+    @mock.patch('bin.commands.snapshot._head', return_value='the head')
+    @mock.patch('bin.commands.snapshot._store_snapshot', side_effect=['On master: first', 'WIP on master: abc123 subject'])
+    @mock.patch('bin.commands.snapshot._drop_stashes_by_message')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_snapshot_createSnapshots(self, mock_info, mock_dropstashes, mock_storesnapshot, mock_head):
 
         # when
-        message = 'the message'
-        files = ['file1', 'file2']
-        snapshot.snapshot(message, files=files)
+        snapshot._create_snapshots([('first', ['entry1']), ('none', []), (None, ['entry2'])], replace=True)
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with(['git', 'stash', 'push', '--include-untracked', '--message', message, '--'] + files)
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_dropstashes.assert_called_once_with(['first', None])
+        mock_head.assert_called_once_with()
+        mock_storesnapshot.assert_has_calls([
+            mock.call('the head', mock.ANY, ['entry1'], 'first'),
+            mock.call('the head', mock.ANY, ['entry2'], None)
+        ])
+        self.assertFalse(os.path.exists(mock_storesnapshot.call_args[0][1]))
+        mock_info.assert_has_calls([
+            mock.call('Saved working directory and index state On master: first', False),
+            mock.call("No local changes to save for 'none'. No snapshot created.", False),
+            mock.call('Saved working directory and index state WIP on master: abc123 subject', False)
+        ])
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='')
+    @mock.patch('bin.commands.snapshot._head', return_value='the head')
+    @mock.patch('bin.commands.snapshot._store_snapshot', return_value='On master: first')
+    @mock.patch('bin.commands.snapshot._drop_stashes_by_message')
     @mock.patch('bin.commands.utils.messages.info')
-    def test_snapshot_noChangesToSnapshot(self, mock_info, mock_checkoutput):
+    def test_snapshot_createSnapshots_noReplace(self, mock_info, mock_dropstashes, mock_storesnapshot, mock_head):
 
         # when
-        quiet = False
-        snapshot.snapshot(quiet=quiet)
+        snapshot._create_snapshots([('first', ['entry1'])], quiet=True)
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_info.assert_called_once_with('No local changes to save. No snapshot created.', quiet)
+        mock_dropstashes.assert_not_called()
+        mock_info.assert_called_once_with('Saved working directory and index state On master: first', True)
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_replace(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+    @mock.patch('bin.commands.snapshot._head')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_snapshot_createSnapshots_noChanges(self, mock_info, mock_head):
+
+        # when
+        snapshot._create_snapshots([('none', [])])
+
+        # then
+        mock_head.assert_not_called()
+        mock_info.assert_called_once_with("No local changes to save for 'none'. No snapshot created.", False)
+
+
+class TestSnapshotDropStashesByMessage(unittest.TestCase):
+    layer = GitSnapshot
+
+    def _stash(self, message):
+        return git.ReflogEntry('0' * 40, '1' * 40, 'Some One <one@example.com> 1000 +0000', message)
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.git.drop_stashes')
+    def test_snapshot_dropStashesByMessage(self, mock_dropstashes, mock_stashreflog):
 
         # given
-        mock_checkoutput.side_effect = [
-            'status\noutput\n',
-            'stash@{0}: WIP on master: 8a3a15e edit readme\nstash@{1}: On master: edit readme\n'
+        stashes = [
+            self._stash('WIP on master: 8a3a15e edit readme'),
+            self._stash('On master: edit readme'),
+            self._stash('On feature: a: b'),
+            self._stash('On master: edit readme'),
+            self._stash(None)
         ]
+        mock_stashreflog.return_value = stashes
 
         # when
-        snapshot.snapshot('edit readme', replace=True)
+        snapshot._drop_stashes_by_message(['edit readme', 'a: b', 'missing', 'b'])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git status --porcelain'),
-            mock.call('git stash list')
-        ])
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_has_calls([
-            mock.call('git stash drop --quiet stash@{1}'.split()),
-            mock.call(['git', 'stash', 'push', '--include-untracked', '--message', 'edit readme'])
-        ])
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_stashreflog.assert_called_once_with()
+        mock_dropstashes.assert_called_once_with([1, 2], stashes)
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.git.drop_stashes')
+    def test_snapshot_dropStashesByMessage_nothingMatches(self, mock_dropstashes, mock_stashreflog):
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_replace_nothingMatches(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
         # given
-        mock_checkoutput.side_effect = [
-            'status\noutput\n',
-            'stash@{0}: WIP on master: 8a3a15e edit readme\n'
-        ]
+        mock_stashreflog.return_value = [self._stash('WIP on master: 8a3a15e edit readme')]
+
+        # when
+        snapshot._drop_stashes_by_message(['edit readme'])
+
+        # then
+        mock_dropstashes.assert_not_called()
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    def test_snapshot_dropStashesByMessage_noMessages(self, mock_stashreflog):
 
         # when
-        snapshot.snapshot('edit readme', replace=True)
+        snapshot._drop_stashes_by_message([None])
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git status --porcelain'),
-            mock.call('git stash list')
+        mock_stashreflog.assert_not_called()
+
+
+class TestSnapshotReadManifest(unittest.TestCase):
+    layer = GitSnapshot
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.dirpath, 'manifest')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_snapshot_readManifest(self):
+
+        # given
+        with open(self.manifest, 'w') as manifest:
+            manifest.write('# a comment\n\nfrontend web/ "docs/read me.md"\n"no files"  # trailing comment\n')
+
+        # expect
+        self.assertEqual(snapshot._read_manifest(self.manifest), [
+            ('frontend', ['web/', 'docs/read me.md']),
+            ('no files', [])
         ])
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with(['git', 'stash', 'push', '--include-untracked', '--message', 'edit readme'])
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='status\noutput\n')
-    @mock.patch('bin.commands.snapshot._stash_buffer')
-    @mock.patch('bin.commands.utils.execute.call')
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_snapshot_replace_noMessageIncluded(self, mock_swallow, mock_call, mock_stashbuffer, mock_checkoutput):
+    @mock.patch('sys.stdin')
+    def test_snapshot_readManifest_stdin(self, mock_stdin):
+
+        # given
+        mock_stdin.__iter__ = mock.Mock(return_value=iter(['backend server/\n']))
+
+        # expect
+        self.assertEqual(snapshot._read_manifest('-'), [('backend', ['server/'])])
+        mock_stdin.close.assert_not_called()
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_snapshot_readManifest_missing(self, mock_error):
+
+        # when
+        try:
+            snapshot._read_manifest(self.manifest)
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with("cannot read manifest '{}'".format(self.manifest))
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_snapshot_readManifest_invalidLine(self, mock_error):
+
+        # given
+        with open(self.manifest, 'w') as manifest:
+            manifest.write('valid\n"unclosed\n')
 
         # when
-        snapshot.snapshot(replace=True)
+        try:
+            snapshot._read_manifest(self.manifest)
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
 
         # then
-        mock_checkoutput.assert_called_once_with('git status --porcelain')
-        mock_stashbuffer.assert_called_once()
-        mock_call.assert_called_once_with('git stash push --include-untracked'.split())
-        mock_swallow.assert_called_once_with('git stash apply --quiet --index'.split())
+        mock_error.assert_called_once_with('invalid manifest line 2: No closing quotation')
 
 
-class TestSnapshotStashBuffer(unittest.TestCase):
+class TestSnapshotMatchManifest(unittest.TestCase):
     layer = GitSnapshot
 
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='\n')
-    def test_snapshot_stashBuffer_noPreviousStashes(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.status')
+    def test_snapshot_matchManifest(self, mock_status):
+
+        # given
+        web = git.StatusEntry('web/a.js', '.', 'M')
+        untracked = git.StatusEntry('new.txt', '?', '?')
+        renamed = git.StatusEntry('docs/b.md', 'R', '.', 'web/b.md')
+        mock_status.return_value = iter([web, untracked, renamed])
 
         # when
-        snapshot._stash_buffer(False)
+        matched = snapshot._match_manifest([('web', ['web']), ('none', ['server']), ('all', [])])
 
         # then
-        mock_checkoutput.assert_called_once_with('git stash list')
+        mock_status.assert_called_once_with()
+        self.assertEqual(matched, [('web', [web, renamed]), ('none', []), ('all', [web, untracked, renamed])])
+
+
+class TestSnapshotStashEnvironment(unittest.TestCase):
+    layer = GitSnapshot
+
+    def _stash(self, timestamp, timezone='-0500'):
+        return git.ReflogEntry('0' * 40, '1' * 40, 'Some One <one@example.com> {} {}'.format(timestamp, timezone), 'msg')
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('time.strftime')
-    def test_snapshot_stashBuffer_previousStashesButNoConflict(self, mock_strftime, mock_checkoutput):
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=[])
+    def test_snapshot_stashEnvironment_noPreviousStashes(self, mock_stashreflog):
+
+        # expect
+        self.assertIsNone(snapshot._stash_environment())
+        mock_stashreflog.assert_called_once_with()
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('time.time', return_value=1000.5)
+    def test_snapshot_stashEnvironment_previousStashesButNoConflict(self, mock_time, mock_stashreflog):
+
+        # given
+        mock_stashreflog.return_value = [self._stash(999), self._stash(1000)]
+
+        # expect
+        self.assertIsNone(snapshot._stash_environment())
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('time.time', return_value=1000.5)
+    @mock.patch.dict(os.environ, {'PATH': '/the/path'}, clear=True)
+    def test_snapshot_stashEnvironment_conflictFound(self, mock_time, mock_stashreflog):
 
         # given
-        mock_checkoutput.side_effect = ['stash0\n', 'time1']
-        mock_strftime.return_value = 'time0'
+        mock_stashreflog.return_value = [self._stash(1000), self._stash(900)]
+
+        # expect
+        self.assertEqual(snapshot._stash_environment(), {
+            'PATH': '/the/path',
+            'GIT_AUTHOR_DATE': '@1001 -0500',
+            'GIT_COMMITTER_DATE': '@1001 -0500'
+        })
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('time.time', return_value=1000.5)
+    def test_snapshot_stashEnvironment_lastStashInTheFuture(self, mock_time, mock_stashreflog):
+
+        # given: a previous snapshot was already pushed ahead
+        mock_stashreflog.return_value = [self._stash(1002)]
+
+        # expect
+        self.assertEqual(snapshot._stash_environment()['GIT_COMMITTER_DATE'], '@1003 -0500')
+
+
+class TestSnapshotList(unittest.TestCase):
+    layer = GitSnapshot
+
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_snapshot_readSnapshotInfos(self, mock_stdout):
+
+        # given
+        mock_stdout.side_effect = [
+            '\x00h1 i1 u1\x1f1000\x1fOn master: first\n\n1\t2\ta.txt\n-\t-\timage.png\n'
+            '\x00h1 i2\x1f900\x1fWIP on master: abc123 subject\n\n3\t0\tb.txt\n'
+            '\x00h1 i3 u1\x1f800\x1fOn master: untracked only\n',
+            'u1\n4\t0\tnew.txt\n'
+        ]
 
         # when
-        snapshot._stash_buffer(True)
+        infos = snapshot._read_snapshot_infos()
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call(['git', 'show', '-s', '--format=%ci', 'stash@{0}'])
+        self.assertEqual(
+            [(i.message, i.timestamp, i.files, i.insertions, i.deletions) for i in infos],
+            [
+                ('On master: first', 1000, 3, 5, 2),
+                ('WIP on master: abc123 subject', 900, 1, 3, 0),
+                ('On master: untracked only', 800, 1, 4, 0)
+            ]
+        )
+        mock_stdout.assert_has_calls([
+            mock.call([
+                'git', 'log', '--walk-reflogs', '--first-parent', '-m', '--numstat',
+                '--format=%x00%P%x1f%ct%x1f%gs', 'refs/stash'
+            ]),
+            mock.call(['git', 'diff-tree', '--stdin', '-r', '--root', '--numstat'], 'u1\n')
         ])
-        mock_strftime.assert_called_once_with('%Y-%m-%d %H:%M:%S %z')
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    @mock.patch('time.strftime')
-    @mock.patch('bin.commands.utils.messages.warn', return_value=True)
-    def test_snapshot_stashBuffer_conflictFound(self, mock_warn, mock_strftime, mock_checkoutput):
+    @mock.patch('bin.commands.utils.execute.stdout', return_value='')
+    def test_snapshot_readSnapshotInfos_noStashes(self, mock_stdout):
+
+        # expect
+        self.assertEqual(snapshot._read_snapshot_infos(), [])
+        mock_stdout.assert_called_once()
+
+    @mock.patch('time.localtime', side_effect=time.gmtime)
+    def test_snapshot_snapshotInfo_format(self, mock_localtime):
+
+        # given
+        info = snapshot._SnapshotInfo('On master: message', 0)
+        info.add_numstat('1\t2\tfile')
+
+        # expect
+        self.assertEqual(info.format(3), 'stash@{3}: On master: message (1970-01-01 00:00, 1 file, +1 -2)')
+        info.add_numstat('-\t-\tbinary')
+        self.assertEqual(info.format(3), 'stash@{3}: On master: message (1970-01-01 00:00, 2 files, +1 -2)')
+
+    @mock.patch('bin.commands.snapshot._read_snapshot_infos')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_snapshot_list(self, mock_info, mock_readsnapshotinfos):
 
         # given
-        mock_checkoutput.side_effect = ['stash0\n', 'time0']
-        mock_strftime.side_effect = ['time0', 'time0', 'time1']
-        quiet = True
+        first = mock.Mock()
+        first.format.return_value = 'first'
+        second = mock.Mock()
+        second.format.return_value = 'second'
+        mock_readsnapshotinfos.return_value = [first, second]
 
         # when
-        snapshot._stash_buffer(quiet)
+        snapshot.list_()
 
         # then
-        mock_checkoutput.assert_has_calls([
-            mock.call('git stash list'),
-            mock.call(['git', 'show', '-s', '--format=%ci', 'stash@{0}'])
-        ])
-        mock_strftime.assert_called_with('%Y-%m-%d %H:%M:%S %z')
-        self.assertEqual(mock_strftime.call_count, 3)
-        mock_warn.assert_has_calls([
-            mock.call('snapshot created too close to last stash', quiet=quiet, ignore=False),
-            mock.call('snapshot created too close to last stash', quiet=quiet, ignore=True)
-        ])
+        first.format.assert_called_once_with(0)
+        second.format.assert_called_once_with(1)
+        mock_info.assert_called_once_with('first' + os.linesep + 'second')
+
+    @mock.patch('bin.commands.snapshot._read_snapshot_infos', return_value=[])
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_snapshot_list_noSnapshots(self, mock_info, mock_readsnapshotinfos):
+
+        # when
+        snapshot.list_()
+
+        # then
+        mock_info.assert_not_called()
+
+
+class TestSnapshotRestore(unittest.TestCase):
+    layer = GitSnapshot
+
+    def _stash(self, message):
+        return git.ReflogEntry('0' * 40, '1' * 40, 'Some One <one@example.com> 1000 +0000', message)
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.execute.call', return_value=0)
+    def test_snapshot_restore(self, mock_call, mock_stashreflog):
+
+        # given
+        mock_stashreflog.return_value = [self._stash('On master: other'), self._stash('On master: mine'), self._stash('On master: mine')]
+
+        # when
+        return_code = snapshot.restore('mine')
+
+        # then
+        self.assertEqual(return_code, 0)
+        mock_call.assert_called_once_with(['git', 'stash', 'apply', '--index', 'stash@{1}'])
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.execute.call', return_value=1)
+    def test_snapshot_restore_quiet(self, mock_call, mock_stashreflog):
+
+        # given
+        mock_stashreflog.return_value = [self._stash('On master: mine')]
+
+        # when
+        return_code = snapshot.restore('mine', quiet=True)
+
+        # then
+        self.assertEqual(return_code, 1)
+        mock_call.assert_called_once_with(['git', 'stash', 'apply', '--index', '--quiet', 'stash@{0}'])
+
+    @mock.patch('bin.commands.utils.git.stash_reflog', return_value=[])
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_snapshot_restore_notFound(self, mock_error, mock_call, mock_stashreflog):
+
+        # when
+        with self.assertRaises(SystemExit):
+            snapshot.restore('mine')
+
+        # then
+        mock_error.assert_called_once_with("no snapshot found with message 'mine'")
+        mock_call.assert_not_called()
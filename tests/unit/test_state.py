@@ -1,14 +1,17 @@
+import errno
 import mock
 import os
+import struct
 import sys
 import unittest
+from collections import OrderedDict
 
 import colorama
 
 from . import testutils
 from ..layers import GitState
 from bin.commands import settings, state
-from bin.commands.utils import git
+from bin.commands.utils import execute, git
 
 
 class TestStatePrintSection(unittest.TestCase):
@@ -177,30 +180,183 @@ class TestStatePrintSection(unittest.TestCase):
         self.assertEqual(section_output, expected_output)
 
 
+class TestStatePrintSections(unittest.TestCase):
+    layer = GitState
+
+    @mock.patch('bin.commands.state._terminal_lines')
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.utils.execute.open_input')
+    def test_printSections_nothingToPrint(self, mock_openinput, mock_info, mock_terminallines):
+
+        # when
+        state._print_sections(['', None, ''], page=True)
+
+        # then
+        mock_terminallines.assert_not_called()
+        mock_info.assert_not_called()
+        mock_openinput.assert_not_called()
+
+    @mock.patch('bin.commands.state._terminal_lines', return_value=10)
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.utils.execute.open_input')
+    def test_printSections_fitsOnScreen(self, mock_openinput, mock_info, mock_terminallines):
+
+        # when
+        state._print_sections(['# one\n', '# two\n'], page=True)
+
+        # then
+        mock_terminallines.assert_called_once_with()
+        mock_info.assert_called_once_with('# one\n# two')
+        mock_openinput.assert_not_called()
+
+    @mock.patch('bin.commands.state._terminal_lines', return_value=4)
+    @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('bin.commands.utils.execute.open_input')
+    def test_printSections_outgrowsScreen(self, mock_openinput, mock_info, mock_terminallines):
+
+        # given
+        sections_read = []
+
+        def sections():
+            for section in ['# one\n', '# two\na\n', '# three\n']:
+                sections_read.append(section)
+                yield section
+
+        # when
+        state._print_sections(sections(), page=True)
+
+        # then: the pager starts once the second section no longer fits and then receives everything else
+        mock_terminallines.assert_called_once_with()
+        mock_info.assert_not_called()
+        mock_openinput.assert_called_once_with(['less', '-r'])
+        mock_openinput.return_value.stdin.write.assert_has_calls([
+            mock.call(b'# one\n# two\na'),
+            mock.call(b'\n# three'),
+            mock.call(os.linesep.encode('UTF-8'))
+        ])
+        mock_openinput.return_value.wait.assert_called_once_with()
+        self.assertEqual(len(sections_read), 3)
+
+    @mock.patch('bin.commands.state._terminal_lines', return_value=1)
+    @mock.patch('bin.commands.utils.execute.open_input')
+    def test_printSections_pagerClosed(self, mock_openinput, mock_terminallines):
+
+        # given
+        mock_openinput.return_value.stdin.write.side_effect = [None] + [IOError(errno.EPIPE, 'Broken pipe')] * 2
+        sections_read = []
+
+        def sections():
+            for section in ['# one\na\nb\n', '# two\n', '# three\n']:
+                sections_read.append(section)
+                yield section
+
+        # when
+        state._print_sections(sections(), page=True)
+
+        # then: stop rendering once less has quit
+        self.assertEqual(len(sections_read), 2)
+        mock_openinput.return_value.wait.assert_called_once_with()
+
+    @mock.patch('bin.commands.state._terminal_lines', return_value=1)
+    @mock.patch('bin.commands.utils.execute.open_input')
+    def test_printSections_pagerFailed(self, mock_openinput, mock_terminallines):
+
+        # given
+        mock_openinput.return_value.stdin.write.side_effect = IOError(errno.EIO, 'I/O error')
+
+        # expect
+        with self.assertRaises(IOError):
+            state._print_sections(['# one\na\nb\n'], page=True)
+
+    @mock.patch('bin.commands.state._terminal_lines')
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('sys.stdout')
+    def test_printSections_noPage_streams(self, mock_stdout, mock_call, mock_terminallines):
+
+        # given
+        mock_stdout.isatty.return_value = True
+
+        # when
+        state._print_sections(['# one\n', '# two\n'], page=False, clear=True)
+
+        # then
+        mock_terminallines.assert_not_called()
+        mock_call.assert_called_once_with('clear')
+        mock_stdout.write.assert_has_calls([mock.call('# one'), mock.call('\n# two'), mock.call(os.linesep)])
+
+
+class TestStateOrderSections(unittest.TestCase):
+    layer = GitState
+
+    def test_orderSections(self):
+
+        # given
+        sections = OrderedDict([('status', 1), ('log', 2), ('changes', 3), ('stashes', 4)])
+
+        # when
+        ordered_sections = state._order_sections(sections, ['changes', 'unknown', 'status', 'changes'])
+
+        # then
+        self.assertEqual(list(ordered_sections.items()), [('changes', 3), ('status', 1), ('log', 2), ('stashes', 4)])
+
+
+class TestStateTerminalLines(unittest.TestCase):
+    layer = GitState
+
+    @mock.patch('fcntl.ioctl', return_value=struct.pack('HHHH', 42, 80, 0, 0))
+    def test_terminalLines(self, mock_ioctl):
+
+        # expect
+        self.assertEqual(state._terminal_lines(), 42)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(errno.ENOTTY, 'Not a tty'))
+    @mock.patch.dict(os.environ, {'LINES': '30'})
+    def test_terminalLines_notATerminal_usesEnvironment(self, mock_ioctl):
+
+        # expect
+        self.assertEqual(state._terminal_lines(), 30)
+        self.assertEqual(mock_ioctl.call_count, 2)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(errno.ENOTTY, 'Not a tty'))
+    def test_terminalLines_notATerminal_default(self, mock_ioctl):
+
+        # given
+        environment = dict(os.environ)
+        environment.pop('LINES', None)
+
+        # expect
+        with mock.patch.dict(os.environ, environment, clear=True):
+            self.assertEqual(state._terminal_lines(), 24)
+        with mock.patch.dict(os.environ, {'LINES': 'many'}):
+            self.assertEqual(state._terminal_lines(), 24)
+
+
 class TestStateState(unittest.TestCase):
     layer = GitState
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_status(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -243,7 +399,7 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -252,14 +408,14 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_alloff(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -292,7 +448,7 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_not_called()
+        mock_terminallines.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
 
@@ -318,24 +474,26 @@ class TestStateState(unittest.TestCase):
     @mock.patch('colorama.init')
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_showcolor_never(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_init,
@@ -365,7 +523,16 @@ class TestStateState(unittest.TestCase):
         state.state(**kwargs)
 
         # then
+        mock_statusrun.assert_called_once_with(
+            clear=False,
+            format_='compact',
+            ignore_extensions=[],
+            show_clean_message=True,
+            show_color='never',
+            show_empty=True
+        )
         mock_statusget.assert_called_once_with(
+            status_result=mock_statusrun.return_value,
             clear=False,
             format_='compact',
             ignore_extensions=[],
@@ -373,6 +540,7 @@ class TestStateState(unittest.TestCase):
             show_color='never',
             show_empty=True
         )
+        mock_statusaccent.assert_called_once_with(show_color='never', status_result=mock_statusrun.return_value)
         mock_isgitrepository.assert_called_once_with()
         mock_resolvecoloring.assert_called_once_with('always')
         mock_init.assert_called_once_with(strip=True)
@@ -392,7 +560,7 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
@@ -401,24 +569,26 @@ class TestStateState(unittest.TestCase):
     @mock.patch('colorama.init')
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_showcolor_always(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_init,
@@ -448,7 +618,16 @@ class TestStateState(unittest.TestCase):
         state.state(**kwargs)
 
         # then
+        mock_statusrun.assert_called_once_with(
+            clear=False,
+            format_='compact',
+            ignore_extensions=[],
+            show_clean_message=True,
+            show_color='always',
+            show_empty=True
+        )
         mock_statusget.assert_called_once_with(
+            status_result=mock_statusrun.return_value,
             clear=False,
             format_='compact',
             ignore_extensions=[],
@@ -456,6 +635,7 @@ class TestStateState(unittest.TestCase):
             show_color='always',
             show_empty=True
         )
+        mock_statusaccent.assert_called_once_with(show_color='always', status_result=mock_statusrun.return_value)
         mock_isgitrepository.assert_called_once_with()
         mock_resolvecoloring.assert_called_once_with('auto')
         mock_init.assert_called_once_with(strip=False)
@@ -474,31 +654,33 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=True)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_', return_return='')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_emptyRepository(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -540,31 +722,33 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_not_called()
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('section output')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=True)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_', return_return='')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_emptyRepository_noShowStatus(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -599,7 +783,7 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_not_called()
-        mock_checkoutput.assert_not_called()
+        mock_terminallines.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
 
@@ -608,7 +792,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -617,7 +801,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -637,7 +821,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, []]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -662,20 +846,23 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -684,7 +871,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -704,7 +891,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], False, []]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], False, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -729,20 +916,23 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command'])
+        mock_execute.assert_called_once_with(['changes', 'command'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -751,7 +941,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -771,7 +961,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, []]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -796,20 +986,23 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--option1', '-o', '1 2', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--option1', '-o', '1 2', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -818,7 +1011,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -838,7 +1031,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option1 -o "1 2"'], True, []]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option1 -o "1 2"'], True, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -863,20 +1056,23 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--option1', '-o', '1 2', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--option1', '-o', '1 2', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -885,7 +1081,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -905,7 +1101,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option2 true'], True, []]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, ['--option2 true'], True, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -930,20 +1126,23 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--option2', 'true', '--option1', '-o', '1 2', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--option2', 'true', '--option1', '-o', '1 2', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('subprocess.Popen')
@@ -952,7 +1151,7 @@ class TestStateState(unittest.TestCase):
             mock_popen,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -984,7 +1183,7 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_not_called()
+        mock_terminallines.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
         mock_popen.assert_not_called()
@@ -994,7 +1193,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('subprocess.Popen')
@@ -1003,7 +1202,7 @@ class TestStateState(unittest.TestCase):
             mock_popen,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -1036,7 +1235,7 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_not_called()
+        mock_terminallines.assert_not_called()
         mock_info.assert_not_called()
         mock_call.assert_not_called()
         mock_popen.assert_not_called()
@@ -1046,7 +1245,7 @@ class TestStateState(unittest.TestCase):
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -1055,7 +1254,7 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_isemptyrepository,
@@ -1076,7 +1275,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, changes_command, changes_name, [], True, []]
+        mock_getconfigvalue.side_effect = [True, changes_command, changes_name, [], True, None, None, False, []]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
         mock_printsection.return_value = 'final changes output\n'
@@ -1100,23 +1299,27 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('final changes output')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('bin.commands.utils.execute.execute')
@@ -1125,12 +1328,13 @@ class TestStateState(unittest.TestCase):
             mock_execute,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -1154,7 +1358,7 @@ class TestStateState(unittest.TestCase):
         changes_command = 'changes command'
         changes_name = 'changes'
         changes_output = 'the changes'
-        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, ['changes', 'status']]
+        mock_getconfigvalue.side_effect = [True, True, changes_command, changes_name, [], True, None, None, False, ['changes', 'status']]
         mock_list.return_value = 'git-state.extensions.changes'
         mock_execute.return_value = [changes_output, None, 0]
 
@@ -1188,36 +1392,41 @@ class TestStateState(unittest.TestCase):
             mock.call('git-state.extensions.changes.name', default='changes'),
             mock.call('git-state.extensions.changes.options', default=[], as_type=mock.ANY),
             mock.call('git-state.extensions.changes.color', default=True, as_type=mock.ANY),
+            mock.call('git-state.timeout', as_type=float),
+            mock.call('git-state.extensions.changes.timeout', default=None, as_type=float),
+            mock.call('git-state.extensions.changes.cache', default=False, as_type=mock.ANY),
             mock.call('git-state.order', default=[], as_type=mock.ANY)
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('changes section\nstatus section')
         mock_call.assert_not_called()
-        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'])
+        mock_execute.assert_called_once_with(['changes', 'command', '--color=never'], timeout=None)
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_withorder_withunknownsection(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -1260,33 +1469,35 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='1')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=1)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
-    @mock.patch('bin.commands.utils.execute.pipe')
+    @mock.patch('bin.commands.utils.execute.open_input')
     def test_state_pageOutput(
             self,
-            mock_pipe,
+            mock_openinput,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -1329,31 +1540,43 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_not_called()
-        mock_pipe.assert_called_once_with(['echo', 'status section\ntwo\nthree\nfour\nfive'], ['less', '-r'])
+        mock_openinput.assert_called_once_with(['less', '-r'])
+        mock_openinput.return_value.stdin.write.assert_has_calls([
+            mock.call(b'status section\ntwo\nthree\nfour\nfive'),
+            mock.call(os.linesep.encode('UTF-8'))
+        ])
+        mock_openinput.return_value.stdin.close.assert_called_once_with()
+        mock_openinput.return_value.wait.assert_called_once_with()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
+    @mock.patch('colorama.init')
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='1')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=1)
     @mock.patch('bin.commands.utils.messages.info')
+    @mock.patch('sys.stdout')
     def test_state_doNotPageOutputEvenIfTooLarge(
             self,
+            mock_stdout,
             mock_info,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
+            mock_init,
             mock_isgitrepository
     ):
 
@@ -1395,19 +1618,21 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
-        mock_info.assert_called_once_with('status section\ntwo\nthree\nfour\nfive')
+        mock_terminallines.assert_not_called()
+        mock_info.assert_not_called()
+        mock_stdout.write.assert_has_calls([mock.call('status section\ntwo\nthree\nfour\nfive'), mock.call(os.linesep)])
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('colorama.init')
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('sys.stdout.isatty', return_value=True)
@@ -1416,12 +1641,13 @@ class TestStateState(unittest.TestCase):
             mock_isatty,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_init,
@@ -1466,19 +1692,20 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_called_once_with('clear')
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     @mock.patch('sys.stdout.isatty', return_value=False)
@@ -1487,12 +1714,13 @@ class TestStateState(unittest.TestCase):
             mock_isatty,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -1536,31 +1764,33 @@ class TestStateState(unittest.TestCase):
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS
         )
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
     @mock.patch('bin.commands.utils.directories.is_git_repository', return_value=True)
     @mock.patch('bin.commands.utils.git.get_config_value', return_value=False)
     @mock.patch('bin.commands.utils.git.is_empty_repository', return_value=False)
+    @mock.patch('bin.commands.stateextensions.status.run')
     @mock.patch('bin.commands.stateextensions.status.get')
     @mock.patch('bin.commands.stateextensions.status.title')
     @mock.patch('bin.commands.stateextensions.status.accent')
     @mock.patch('bin.commands.state._print_section')
     @mock.patch('bin.commands.settings.list_')
-    @mock.patch('bin.commands.utils.execute.check_output', return_value='100')
+    @mock.patch('bin.commands.state._terminal_lines', return_value=100)
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
     def test_state_clear_noclear(
             self,
             mock_info,
             mock_call,
-            mock_checkoutput,
+            mock_terminallines,
             mock_list,
             mock_printsection,
             mock_statusaccent,
             mock_statustitle,
             mock_statusget,
+            mock_statusrun,
             mock_isemptyrepository,
             mock_getconfigvalue,
             mock_isgitrepository
@@ -1603,11 +1833,229 @@ class TestStateState(unittest.TestCase):
         ])
         self.assertEqual(mock_getconfigvalue.call_args_list[0][1]['as_type'].__name__, 'as_bool')
         mock_list.assert_called_once_with(format_=settings.FormatOption.SECTIONS)
-        mock_checkoutput.assert_called_once_with('tput lines'.split())
+        mock_terminallines.assert_called_once_with()
         mock_info.assert_called_once_with('status section')
         mock_call.assert_not_called()
 
 
+class TestStateRunExtensions(unittest.TestCase):
+    layer = GitState
+
+    @mock.patch('bin.commands.state._execute_extension')
+    def test_state_runExtensions_noExtensions(self, mock_execute_extension):
+
+        # expect
+        self.assertEqual(list(state._run_extensions([])), [])
+        mock_execute_extension.assert_not_called()
+
+    @mock.patch('bin.commands.utils.cache.load')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_keepsOrder(self, mock_execute_extension, mock_load):
+
+        # given
+        extension_commands = [
+            ('one', ['cmd', '1'], None, False),
+            ('two', ['cmd', '2'], 2.0, False),
+            ('three', ['cmd', '3'], None, False)
+        ]
+
+        # when
+        results = list(state._run_extensions(extension_commands))
+
+        # then
+        self.assertEqual(results, [('one', 'cmd 1 output'), ('two', 'cmd 2 output'), ('three', 'cmd 3 output')])
+        self.assertEqual(mock_execute_extension.call_count, 3)
+        mock_execute_extension.assert_any_call(['cmd', '2'], 2.0)
+        mock_load.assert_not_called()
+
+    @mock.patch('bin.commands.state.ThreadPool')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_singleJob(self, mock_execute_extension, mock_threadpool):
+
+        # given
+        extension_commands = [('one', ['cmd', '1'], None, False), ('two', ['cmd', '2'], 3.0, False)]
+
+        # when
+        results = list(state._run_extensions(extension_commands, jobs=1))
+
+        # then
+        self.assertEqual(results, [('one', 'cmd 1 output'), ('two', 'cmd 2 output')])
+        mock_execute_extension.assert_has_calls([mock.call(['cmd', '1'], None), mock.call(['cmd', '2'], 3.0)])
+        mock_threadpool.assert_not_called()
+
+    @mock.patch('bin.commands.state.ThreadPool')
+    def test_state_runExtensions_limitedJobs(self, mock_threadpool):
+
+        # given
+        extension_commands = [
+            ('one', ['cmd', '1'], None, False),
+            ('two', ['cmd', '2'], None, False),
+            ('three', ['cmd', '3'], None, False)
+        ]
+        mock_threadpool.return_value.imap.return_value = iter([('out 1', True), ('out 2', True), ('out 3', True)])
+
+        # when
+        results = list(state._run_extensions(extension_commands, jobs=2))
+
+        # then
+        self.assertEqual(results, [('one', 'out 1'), ('two', 'out 2'), ('three', 'out 3')])
+        mock_threadpool.assert_called_once_with(2)
+        mock_threadpool.return_value.imap.assert_called_once_with(state._execute_extension_command, extension_commands)
+        mock_threadpool.return_value.close.assert_called_once_with()
+        mock_threadpool.return_value.join.assert_called_once_with()
+
+    @mock.patch('bin.commands.state.ThreadPool')
+    def test_state_runExtensions_unlimitedJobs(self, mock_threadpool):
+
+        # given
+        extension_commands = [
+            ('one', ['cmd', '1'], None, False),
+            ('two', ['cmd', '2'], None, False),
+            ('three', ['cmd', '3'], None, False)
+        ]
+        mock_threadpool.return_value.imap.return_value = iter([('out 1', True), ('out 2', True), ('out 3', True)])
+
+        # when
+        list(state._run_extensions(extension_commands, jobs=0))
+
+        # then
+        mock_threadpool.assert_called_once_with(3)
+
+    @mock.patch('bin.commands.state._repository_fingerprint', return_value='fingerprint')
+    @mock.patch('bin.commands.utils.cache.load')
+    @mock.patch('bin.commands.utils.cache.save')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_cached(self, mock_execute_extension, mock_save, mock_load, mock_fingerprint):
+
+        # given
+        extension_commands = [('one', ['cmd', '1'], None, True), ('two', ['cmd', '2'], None, False)]
+        mock_load.return_value = {'one': {'fingerprint': 'fingerprint', 'command': ['cmd', '1'], 'text': 'cached 1'}}
+
+        # when
+        results = list(state._run_extensions(extension_commands, jobs=1))
+
+        # then
+        self.assertEqual(results, [('one', 'cached 1'), ('two', 'cmd 2 output')])
+        mock_load.assert_called_once_with('state')
+        mock_execute_extension.assert_called_once_with(['cmd', '2'], None)
+        mock_save.assert_not_called()
+
+    @mock.patch('bin.commands.state._repository_fingerprint', return_value='new fingerprint')
+    @mock.patch('bin.commands.utils.cache.load')
+    @mock.patch('bin.commands.utils.cache.save')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_cached_stale(self, mock_execute_extension, mock_save, mock_load, mock_fingerprint):
+
+        # given
+        extension_commands = [('one', ['cmd', '1'], None, True)]
+        mock_load.return_value = {'one': {'fingerprint': 'old fingerprint', 'command': ['cmd', '1'], 'text': 'cached 1'}}
+
+        # when
+        results = list(state._run_extensions(extension_commands, jobs=1))
+
+        # then
+        self.assertEqual(results, [('one', 'cmd 1 output')])
+        mock_execute_extension.assert_called_once_with(['cmd', '1'], None)
+        mock_save.assert_called_once_with('state', {
+            'one': {'fingerprint': 'new fingerprint', 'command': ['cmd', '1'], 'text': 'cmd 1 output'}
+        })
+
+    @mock.patch('bin.commands.state._repository_fingerprint', return_value='fingerprint')
+    @mock.patch('bin.commands.utils.cache.load', return_value={})
+    @mock.patch('bin.commands.utils.cache.save')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_cached_commandChanged(self, mock_execute_extension, mock_save, mock_load, mock_fingerprint):
+
+        # given
+        extension_commands = [('one', ['cmd', '1', '--stat'], None, True)]
+        mock_load.return_value = {'one': {'fingerprint': 'fingerprint', 'command': ['cmd', '1'], 'text': 'cached 1'}}
+
+        # when
+        results = list(state._run_extensions(extension_commands, jobs=1))
+
+        # then
+        self.assertEqual(results, [('one', 'cmd 1 --stat output')])
+        mock_execute_extension.assert_called_once_with(['cmd', '1', '--stat'], None)
+        mock_save.assert_called_once()
+
+    @mock.patch('bin.commands.state._repository_fingerprint', return_value='fingerprint')
+    @mock.patch('bin.commands.utils.cache.load', return_value={})
+    @mock.patch('bin.commands.utils.cache.save')
+    @mock.patch('bin.commands.state._execute_extension', return_value=('timed out after 1s', False))
+    def test_state_runExtensions_cached_doNotCacheFailures(self, mock_execute_extension, mock_save, mock_load, mock_fingerprint):
+
+        # when
+        results = list(state._run_extensions([('one', ['cmd', '1'], 1, True)], jobs=1))
+
+        # then
+        self.assertEqual(results, [('one', 'timed out after 1s')])
+        mock_save.assert_not_called()
+
+    @mock.patch('bin.commands.state._repository_fingerprint', return_value='fingerprint')
+    @mock.patch('bin.commands.utils.cache.load', return_value={})
+    @mock.patch('bin.commands.utils.cache.save')
+    @mock.patch('bin.commands.state._execute_extension', side_effect=lambda command, timeout: (' '.join(command) + ' output', True))
+    def test_state_runExtensions_yieldsAsExtensionsFinish(self, mock_execute_extension, mock_save, mock_load, mock_fingerprint):
+
+        # given
+        extension_commands = [('one', ['cmd', '1'], None, True), ('two', ['cmd', '2'], None, True)]
+
+        # when
+        results = state._run_extensions(extension_commands, jobs=1)
+
+        # then: nothing runs until the first result is requested
+        mock_execute_extension.assert_not_called()
+        self.assertEqual(next(results), ('one', 'cmd 1 output'))
+        mock_execute_extension.assert_called_once_with(['cmd', '1'], None)
+        mock_save.assert_not_called()
+
+        # then: the cache is saved once the last extension finishes
+        self.assertEqual(next(results), ('two', 'cmd 2 output'))
+        mock_save.assert_called_once_with('state', {
+            'one': {'fingerprint': 'fingerprint', 'command': ['cmd', '1'], 'text': 'cmd 1 output'},
+            'two': {'fingerprint': 'fingerprint', 'command': ['cmd', '2'], 'text': 'cmd 2 output'}
+        })
+
+
+class TestStateExecuteExtension(unittest.TestCase):
+    layer = GitState
+
+    @mock.patch('bin.commands.utils.execute.execute', return_value=['the output', 'the error', 0])
+    def test_state_executeExtension(self, mock_execute):
+
+        # expect
+        self.assertEqual(state._execute_extension(['cmd'], 5), ('the output', True))
+        mock_execute.assert_called_once_with(['cmd'], timeout=5)
+
+    @mock.patch('bin.commands.utils.execute.execute', return_value=['the output', 'the error', 1])
+    def test_state_executeExtension_failed(self, mock_execute):
+
+        # expect
+        self.assertEqual(state._execute_extension(['cmd']), ('the error', False))
+        mock_execute.assert_called_once_with(['cmd'], timeout=None)
+
+    @mock.patch('bin.commands.utils.execute.execute')
+    def test_state_executeExtension_timedOut(self, mock_execute):
+
+        # given
+        mock_execute.side_effect = execute.TimeoutExpired(['cmd'], 1.5, 'partial\noutput')
+
+        # expect
+        self.assertEqual(
+            state._execute_extension(['cmd'], 1.5),
+            ('partial\noutput' + os.linesep + 'timed out after 1.5s' + os.linesep, False)
+        )
+
+    @mock.patch('bin.commands.utils.execute.execute')
+    def test_state_executeExtension_timedOut_noOutput(self, mock_execute):
+
+        # given
+        mock_execute.side_effect = execute.TimeoutExpired(['cmd'], 2.0, '')
+
+        # expect
+        self.assertEqual(state._execute_extension(['cmd'], 2.0), ('timed out after 2s' + os.linesep, False))
+
+
 class TestStateExtensionExists(unittest.TestCase):
     layer = GitState
 
@@ -1752,6 +2200,38 @@ class TestStateEditExtension(unittest.TestCase):
         mock_call.assert_called_once_with(['git', 'config', 'git-state.extensions.log.color', 'True'])
         mock_info.assert_called_once_with('Extension log updated')
 
+    @mock.patch('bin.commands.state._extension_exists')
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_state_editExtension_onlyTimeout(self, mock_info, mock_call, mock_extension_exists):
+
+        # given
+        mock_extension_exists.return_value = True
+
+        # when
+        state.edit_extension('log', color=None, timeout=1.5)
+
+        # then
+        mock_extension_exists.assert_called_once_with('log')
+        mock_call.assert_called_once_with(['git', 'config', 'git-state.extensions.log.timeout', '1.5'])
+        mock_info.assert_called_once_with('Extension log updated')
+
+    @mock.patch('bin.commands.state._extension_exists')
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.messages.info')
+    def test_state_editExtension_onlyCache(self, mock_info, mock_call, mock_extension_exists):
+
+        # given
+        mock_extension_exists.return_value = True
+
+        # when
+        state.edit_extension('log', color=None, cache=True)
+
+        # then
+        mock_extension_exists.assert_called_once_with('log')
+        mock_call.assert_called_once_with(['git', 'config', 'git-state.extensions.log.cache', 'True'])
+        mock_info.assert_called_once_with('Extension log updated')
+
     @mock.patch('bin.commands.state._extension_exists')
     @mock.patch('bin.commands.utils.execute.call')
     @mock.patch('bin.commands.utils.messages.info')
@@ -1928,7 +2408,7 @@ class TestStateRunExtension(unittest.TestCase):
         mock_run_extension.assert_called_once_with('log', {}, 'never')
         mock_get_config_value.assert_called_once_with('git-state.format', default='compact')
         mock_print_section.assert_called_once_with(log_name, text=log_text, format_='pretty', show_empty=True, color='never')
-        mock_print_sections.assert_called_once_with({log_name: section_text}, page=True)
+        mock_print_sections.assert_called_once_with([section_text], page=True)
 
     @mock.patch('bin.commands.state._extension_exists')
     @mock.patch('bin.commands.utils.git.resolve_coloring')
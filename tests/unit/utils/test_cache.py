@@ -0,0 +1,121 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+from ...layers import UtilsCache
+from bin.commands.utils import cache
+
+
+class TestCache(unittest.TestCase):
+    layer = UtilsCache
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        subprocess.call(['git', 'init', '--quiet'])
+
+    def tearDown(self):
+        os.chdir(self.proj_dir)
+        shutil.rmtree(self.dirpath)
+
+    def test_load_nothingCached(self):
+
+        # expect
+        self.assertEqual(cache.load('state'), {})
+
+    def test_saveAndLoad(self):
+
+        # when
+        cache.save('state', {'log': {'text': 'the log'}})
+
+        # then
+        self.assertEqual(cache.load('state'), {'log': {'text': 'the log'}})
+        self.assertEqual(os.listdir(os.path.join('.git', 'git-commands')), ['state.json'])
+
+    def test_load_corrupt(self):
+
+        # given
+        os.makedirs(os.path.join('.git', 'git-commands'))
+        with open(os.path.join('.git', 'git-commands', 'state.json'), 'w') as cache_file:
+            cache_file.write('{not json')
+
+        # expect
+        self.assertEqual(cache.load('state'), {})
+
+    def test_save_notAGitRepository(self):
+
+        # given
+        shutil.rmtree('.git')
+
+        # when
+        cache.save('state', {'log': {'text': 'the log'}})
+
+        # then
+        self.assertFalse(os.path.exists('.git'))
+
+    def test_fingerprint_notAGitRepository(self):
+
+        # given
+        shutil.rmtree('.git')
+
+        # expect
+        self.assertIsNone(cache.fingerprint('HEAD'))
+
+    def test_fingerprint_unchanged(self):
+
+        # given
+        with open(os.path.join('.git', 'HEAD'), 'w') as head:
+            head.write('ref: refs/heads/master\n')
+
+        # expect
+        self.assertEqual(cache.fingerprint('HEAD', 'refs'), cache.fingerprint('HEAD', 'refs'))
+
+    def test_fingerprint_fileChanged(self):
+
+        # given
+        head_path = os.path.join('.git', 'HEAD')
+        with open(head_path, 'w') as head:
+            head.write('ref: refs/heads/master\n')
+        before = cache.fingerprint('HEAD')
+
+        # when
+        with open(head_path, 'w') as head:
+            head.write('ref: refs/heads/develop\n')
+        os.utime(head_path, (time.time() + 10, time.time() + 10))
+
+        # then
+        self.assertNotEqual(cache.fingerprint('HEAD'), before)
+
+    def test_fingerprint_fileCreated(self):
+
+        # given
+        before = cache.fingerprint('HEAD', 'refs')
+
+        # when
+        with open(os.path.join('.git', 'refs', 'heads', 'master'), 'w') as ref:
+            ref.write('0' * 40 + '\n')
+
+        # then
+        self.assertNotEqual(cache.fingerprint('HEAD', 'refs'), before)
+
+    def test_linkedWorktree(self):
+
+        # given: a linked worktree, whose .git is a file
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'Initial commit'])
+        subprocess.call(['git', 'worktree', 'add', '--quiet', 'linked'])
+        os.chdir('linked')
+        before = cache.fingerprint('HEAD', 'refs')
+
+        # when
+        cache.save('state', {'log': {'text': 'the log'}})
+        with open(os.path.join(self.dirpath, '.git', 'refs', 'heads', 'other'), 'w') as ref:
+            ref.write(subprocess.check_output(['git', 'rev-parse', 'HEAD']).decode('utf-8'))
+
+        # then: the cache is kept in the worktree's own git directory and refs are fingerprinted in the common one
+        self.assertEqual(cache.load('state'), {'log': {'text': 'the log'}})
+        self.assertEqual(os.listdir(os.path.join(self.dirpath, '.git', 'worktrees', 'linked', 'git-commands')), ['state.json'])
+        self.assertNotEqual(cache.fingerprint('HEAD', 'refs'), before)
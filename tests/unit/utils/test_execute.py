@@ -1,6 +1,10 @@
 import os
 import mock
+import shutil
 import subprocess
+import sys
+import tempfile
+import time
 import unittest
 from builtins import bytes
 
@@ -75,6 +79,11 @@ class TestExecute(unittest.TestCase):
 
         stdout == 'testing' + os.linesep
 
+    def test_stdout_withInput(self):
+
+        # expect
+        self.assertEqual(execute.stdout(['sh', '-c', 'cat; echo err >&2'], input_='the input'), 'the input')
+
     @mock.patch('subprocess.Popen')
     def test_call_input(self, mock_popen):
 
@@ -91,7 +100,7 @@ class TestExecute(unittest.TestCase):
         return_code = execute.call_input(command, the_input)
 
         # then
-        mock_popen.assert_called_once_with(command, stdin=subprocess.PIPE)
+        mock_popen.assert_called_once_with(command, stdin=subprocess.PIPE, env=None)
         mock_process.communicate.assert_called_once_with(input=the_input.encode('utf-8'))
 
         self.assertEqual(return_code, 0)
@@ -111,7 +120,7 @@ class TestExecute(unittest.TestCase):
         return_code = execute.call_input(command, the_input)
 
         # then
-        mock_popen.assert_called_once_with(command.split(), stdin=subprocess.PIPE)
+        mock_popen.assert_called_once_with(command.split(), stdin=subprocess.PIPE, env=None)
         mock_process.communicate.assert_called_once_with(input=the_input.encode('utf-8'))
 
         self.assertEqual(return_code, 0)
@@ -158,6 +167,138 @@ class TestExecute(unittest.TestCase):
         self.assertEqual(actual_stderr, 'the stderr')
         self.assertEqual(actual_return_code, 0)
 
+    @mock.patch('threading.Timer')
+    @mock.patch('subprocess.Popen')
+    def test_execute_withTimeout(self, mock_popen, mock_timer):
+
+        # given
+        command = 'the command'.split()
+        mock_proc = mock.Mock()
+        mock_proc.communicate.return_value = [b'the stdout', b'the stderr']
+        mock_proc.returncode = 0
+        mock_popen.return_value = mock_proc
+
+        # when
+        actual_stdout, actual_stderr, actual_return_code = execute.execute(command, timeout=2)
+
+        # then
+        mock_popen.assert_called_once_with(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **execute._NEW_SESSION)
+        if sys.version_info >= (3, 2):
+            self.assertEqual(mock_popen.call_args[1], {'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE, 'start_new_session': True})
+        mock_timer.assert_called_once_with(2, execute._kill_process_group, [mock_proc, []])
+        mock_timer.return_value.start.assert_called_once_with()
+        mock_timer.return_value.cancel.assert_called_once_with()
+
+        self.assertEqual(actual_stdout, 'the stdout')
+        self.assertEqual(actual_stderr, 'the stderr')
+        self.assertEqual(actual_return_code, 0)
+
+    def test_execute_withTimeout_timesOut(self):
+
+        # when
+        try:
+            execute.execute(['sh', '-c', 'echo partial; sleep 5'], timeout=0.2)
+            self.fail('expected a timeout but found none')  # pragma: no cover
+        except execute.TimeoutExpired as e:
+
+            # then
+            self.assertEqual(e.output, 'partial\n')
+            self.assertEqual(e.timeout, 0.2)
+
+    def test_execute_withTimeout_terminatesFirst(self):
+
+        # given: a command that removes its lock file when terminated
+        dirpath = tempfile.mkdtemp()
+        lock = os.path.join(dirpath, 'lock')
+        command = ['sh', '-c', 'trap "rm -f {0}; exit 1" TERM; touch {0}; sleep 5 & wait'.format(lock)]
+
+        # when
+        try:
+            with self.assertRaises(execute.TimeoutExpired):
+                execute.execute(command, timeout=0.5)
+
+            # then
+            self.assertFalse(os.path.exists(lock))
+        finally:
+            shutil.rmtree(dirpath)
+
+    @mock.patch('bin.commands.utils.execute._KILL_GRACE_PERIOD', 0.2)
+    def test_execute_withTimeout_killsAfterGracePeriod(self):
+
+        # given: a command that ignores being terminated
+        start = time.time()
+
+        # when
+        with self.assertRaises(execute.TimeoutExpired):
+            execute.execute(['sh', '-c', 'trap "" TERM; sleep 5 & wait'], timeout=0.2)
+
+        # then
+        self.assertLess(time.time() - start, 4)
+
+    def test_execute_withTimeout_finishesInTime(self):
+
+        # expect
+        self.assertEqual(execute.execute(['sh', '-c', 'echo done'], timeout=5), ('done\n', '', 0))
+
+    @mock.patch('subprocess.Popen')
+    def test_openInput(self, mock_popen):
+
+        # when
+        proc = execute.open_input('less -r')
+
+        # then
+        self.assertEqual(proc, mock_popen.return_value)
+        mock_popen.assert_called_once_with(['less', '-r'], stdin=subprocess.PIPE)
+
+    def test_coprocess(self):
+
+        # given
+        proc = execute.coprocess(['sh', '-c', 'echo err >&2; cat'])
+
+        # when
+        proc.stdin.write(b'one\n')
+        proc.stdin.flush()
+        first = proc.stdout.readline()
+        proc.stdin.close()
+        rest = proc.stdout.read()
+        proc.stdout.close()
+
+        # then
+        self.assertEqual(first, b'one\n')
+        self.assertEqual(rest, b'')
+        self.assertEqual(proc.wait(), 0)
+
+    def test_records(self):
+
+        # when
+        records = list(execute.records(['printf', 'one\\000two\\nlines\\000three'], chunk_size=4))
+
+        # then
+        self.assertEqual(records, ['one', 'two\nlines', 'three'])
+
+    def test_records_trailingSeparator(self):
+
+        # expect
+        self.assertEqual(list(execute.records(['printf', 'one\\000two\\000'])), ['one', 'two'])
+
+    def test_records_closedEarly(self):
+
+        # given
+        records = execute.records(['sh', '-c', 'printf "one\\000"; sleep 5'])
+
+        # when
+        first = next(records)
+        records.close()
+
+        # then
+        self.assertEqual(first, 'one')
+
+    def test_records_failure(self):
+
+        # expect
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(execute.records(['sh', '-c', 'printf "one\\000"; exit 1']))
+
     @mock.patch('subprocess.check_output')
     def test_checkout(self, mock_checkoutput):
 
@@ -169,7 +310,7 @@ class TestExecute(unittest.TestCase):
         output = execute.check_output(command)
 
         # then
-        mock_checkoutput.assert_called_once_with(command)
+        mock_checkoutput.assert_called_once_with(command, env=None)
         self.assertEqual('the output', output)
 
     @mock.patch('subprocess.check_output')
@@ -183,7 +324,7 @@ class TestExecute(unittest.TestCase):
         output = execute.check_output(command)
 
         # then
-        mock_checkoutput.assert_called_once_with(command.split())
+        mock_checkoutput.assert_called_once_with(command.split(), env=None)
         self.assertEqual('the output', output)
 
     @mock.patch('subprocess.call')
@@ -197,9 +338,23 @@ class TestExecute(unittest.TestCase):
         return_code = execute.call(command)
 
         # then
-        mock_call.assert_called_once_with(command)
+        mock_call.assert_called_once_with(command, env=None)
         self.assertEqual(0, return_code)
 
+    @mock.patch('subprocess.call')
+    def test_call_withEnv(self, mock_call):
+
+        # given
+        command = ['the', 'command']
+        env = {'GIT_COMMITTER_DATE': '@1 +0000'}
+        mock_call.return_value = 0
+
+        # when
+        execute.call(command, env=env)
+
+        # then
+        mock_call.assert_called_once_with(command, env=env)
+
     @mock.patch('subprocess.call')
     def test_call_asStr(self, mock_call):
 
@@ -211,42 +366,83 @@ class TestExecute(unittest.TestCase):
         return_code = execute.call(command)
 
         # then
-        mock_call.assert_called_once_with(command.split())
+        mock_call.assert_called_once_with(command.split(), env=None)
         self.assertEqual(0, return_code)
 
-    @mock.patch('subprocess.call')
     @mock.patch('subprocess.Popen')
-    def test_pipe(self, mock_popen, mock_call):
+    def test_pipe(self, mock_popen):
 
         # given
         command1 = 'the command one'.split()
         command2 = 'the command two'.split()
 
         command1_proc = mock.Mock()
-        mock_popen.return_value = command1_proc
+        command1_proc.wait.return_value = 0
+        command2_proc = mock.Mock()
+        command2_proc.wait.return_value = 0
+        mock_popen.side_effect = [command1_proc, command2_proc]
 
         # when
-        execute.pipe(command1, command2)
+        return_code = execute.pipe(command1, command2)
 
         # then
-        mock_popen.assert_called_once_with(command1, stdout=subprocess.PIPE)
-        mock_call.assert_called_once_with(command2, stdin=command1_proc.stdout)
+        self.assertEqual(return_code, 0)
+        mock_popen.assert_has_calls([
+            mock.call(command1, stdout=subprocess.PIPE, env=None),
+            mock.call(command2, stdin=command1_proc.stdout, env=None)
+        ])
+        command1_proc.stdout.close.assert_called_once_with()
 
-    @mock.patch('subprocess.call')
     @mock.patch('subprocess.Popen')
-    def test_pipe_asStr(self, mock_popen, mock_call):
+    def test_pipe_secondCommandFails(self, mock_popen):
+
+        # given
+        command1_proc = mock.Mock()
+        command1_proc.wait.return_value = 0
+        command2_proc = mock.Mock()
+        command2_proc.wait.return_value = 2
+        mock_popen.side_effect = [command1_proc, command2_proc]
+
+        # when
+        return_code = execute.pipe(['one'], ['two'])
+
+        # then: the first command is still reaped
+        self.assertEqual(return_code, 2)
+        command1_proc.wait.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen')
+    def test_pipe_asStr(self, mock_popen):
 
         # given
         command1 = 'the command one'
         command2 = 'the command two'
 
         command1_proc = mock.Mock()
-        command1_proc.stdout = 'stdout'
-        mock_popen.return_value = command1_proc
+        command1_proc.wait.return_value = 0
+        command2_proc = mock.Mock()
+        command2_proc.wait.return_value = 0
+        mock_popen.side_effect = [command1_proc, command2_proc]
 
         # when
-        execute.pipe(command1, command2)
+        execute.pipe(command1, command2, env={'the': 'env'})
+
+        # then
+        mock_popen.assert_has_calls([
+            mock.call(command1.split(), stdout=subprocess.PIPE, env={'the': 'env'}),
+            mock.call(command2.split(), stdin=command1_proc.stdout, env={'the': 'env'})
+        ])
+
+    def test_pipe_streams(self):
+
+        # expect
+        self.assertEqual(execute.pipe(['printf', 'one'], ['grep', '-q', 'one']), 0)
+        self.assertEqual(execute.pipe(['printf', 'one'], ['grep', '-q', 'two']), 1)
+        self.assertEqual(execute.pipe(['sh', '-c', 'exit 3'], ['cat']), 3)
+
+    def test_pipe_secondCommandExitsEarly(self):
+
+        # when: the first command would block forever if it could still write to the pipe
+        return_code = execute.pipe(['yes'], ['true'])
 
         # then
-        mock_popen.assert_called_once_with(command1.split(), stdout=subprocess.PIPE)
-        mock_call.assert_called_once_with(command2.split(), stdin=command1_proc.stdout)
+        self.assertNotEqual(return_code, 0)
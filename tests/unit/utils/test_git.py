@@ -1,7 +1,10 @@
 import collections
 import mock
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
 import unittest
 
 from .. import testutils
@@ -18,6 +21,8 @@ class TestGit(unittest.TestCase):
         self._symbolic_ref = git.symbolic_ref
         self._validate_config = git.validate_config
         self._get_config_value = git.get_config_value
+        git.clear_config_cache()
+        git.clear_ref_cache()
 
     def tearDown(self):
         git.is_ref = self._is_ref
@@ -25,64 +30,53 @@ class TestGit(unittest.TestCase):
         git.validate_config = self._validate_config
         git.get_config_value = self._get_config_value
 
-    @mock.patch('bin.commands.utils.execute.swallow')
-    def test_isValidReference(self, mock_swallow):
+    @mock.patch('bin.commands.utils.execute.check_output', return_value='refs/heads/master\nrefs/tags/v1.0\n')
+    def test_isValidReference(self, mock_checkoutput):
 
-        # given
-        reference = 'ref'
-        mock_swallow.return_value = 0
+        # expect
+        self.assertTrue(git.is_valid_reference('master'))
+        self.assertTrue(git.is_valid_reference('tags/v1.0'))
+        self.assertFalse(git.is_valid_reference('aster'))
+        mock_checkoutput.assert_called_once_with(['git', 'for-each-ref', '--format=%(refname)'])
 
-        # when
-        is_valid = git.is_valid_reference(reference)
-
-        # then
-        self.assertTrue(is_valid)
-        mock_swallow.assert_called_once_with(['git', 'show-ref', '--quiet', reference])
-
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isCommit(self, mock_stdout):
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('o123456', 'commit')])
+    def test_isCommit(self, mock_objectinfos):
 
         # given
         object_ = 'o123'
-        type_ = 'commit\n'
-        mock_stdout.return_value = type_
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertTrue(is_commit)
-        mock_stdout.assert_called_once_with(['git', 'cat-file', '-t', object_])
+        mock_objectinfos.assert_called_once_with([object_])
 
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isCommit_notAnObject(self, mock_stdout):
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[None])
+    def test_isCommit_notAnObject(self, mock_objectinfos):
 
         # given
         object_ = 'o123'
-        type_ = '\n'
-        mock_stdout.return_value = type_
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertFalse(is_commit)
-        mock_stdout.assert_called_once_with(['git', 'cat-file', '-t', object_])
+        mock_objectinfos.assert_called_once_with([object_])
 
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isCommit_notACommit(self, mock_stdout):
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[('o123456', 'blob')])
+    def test_isCommit_notACommit(self, mock_objectinfos):
 
         # given
         object_ = 'o123'
-        type_ = 'blog\n'
-        mock_stdout.return_value = type_
 
         # when
         is_commit = git.is_commit(object_)
 
         # then
         self.assertFalse(is_commit)
-        mock_stdout.assert_called_once_with(['git', 'cat-file', '-t', object_])
+        mock_objectinfos.assert_called_once_with([object_])
 
     @mock.patch('bin.commands.utils.git.symbolic_ref')
     def test_isDetached(self, mock_symbolicref):
@@ -126,8 +120,8 @@ class TestGit(unittest.TestCase):
         self.assertFalse(actual_symbolic_ref)
         mock_stdout.assert_called_once_with(['git', 'symbolic-ref', '--quiet', object_])
 
-    @mock.patch('bin.commands.utils.execute.swallow', return_value=0)
-    def test_isRef(self, mock_swallow):
+    @mock.patch('bin.commands.utils.git.matching_refs', return_value=['refs/heads/o123'])
+    def test_isRef(self, mock_matchingrefs):
 
         # given
         object_ = 'o123'
@@ -137,15 +131,20 @@ class TestGit(unittest.TestCase):
 
         # then
         self.assertTrue(is_ref)
-        mock_swallow.assert_called_once_with(['git', 'show-ref', object_])
+        mock_matchingrefs.assert_called_once_with(object_)
+
+    @mock.patch('bin.commands.utils.git.matching_refs', return_value=[])
+    def test_isRef_notARef(self, mock_matchingrefs):
+
+        # expect
+        self.assertFalse(git.is_ref('o123'))
 
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isRefAmbiguous(self, mock_stdout, mock_isref):
+    @mock.patch('bin.commands.utils.git.matching_refs', return_value=['a', 'b'])
+    def test_isRefAmbiguous(self, mock_matchingrefs, mock_isref):
 
         # given
         ref = 'ref'
-        mock_stdout.return_value = 'a\nb'
 
         # when
         is_ambiguous = git.is_ref_ambiguous(ref)
@@ -153,15 +152,14 @@ class TestGit(unittest.TestCase):
         # then
         self.assertTrue(is_ambiguous)
         mock_isref.assert_called_once_with(ref)
-        mock_stdout.assert_called_once_with(['git', 'show-ref', ref])
+        mock_matchingrefs.assert_called_once_with(ref, None)
 
     @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isRefAmbiguous_notAmbiguous(self, mock_stdout, mock_isref):
+    @mock.patch('bin.commands.utils.git.matching_refs', return_value=['a'])
+    def test_isRefAmbiguous_notAmbiguous(self, mock_matchingrefs, mock_isref):
 
         # given
         ref = 'ref'
-        mock_stdout.return_value = 'a\n'
 
         # when
         is_ambiguous = git.is_ref_ambiguous(ref)
@@ -169,7 +167,7 @@ class TestGit(unittest.TestCase):
         # then
         self.assertFalse(is_ambiguous)
         mock_isref.assert_called_once_with(ref)
-        mock_stdout.assert_called_once_with(['git', 'show-ref', ref])
+        mock_matchingrefs.assert_called_once_with(ref, None)
 
     @mock.patch('bin.commands.utils.git.is_ref', return_value=False)
     def test_isRefAmbiguous_notARef(self, mock_isref):
@@ -185,56 +183,44 @@ class TestGit(unittest.TestCase):
         self.assertEqual(context.exception.message, "{0!r} is not a ref".format(ref))
         mock_isref.assert_called_once_with(ref)
 
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isRefAmbiguous_limited_one_asStr(self, mock_stdout, mock_isref):
-
-        # given
-        ref = 'ref'
-        limit = git.RefType.HEADS
-        mock_stdout.return_value = 'a\nb'
-
-        # when
-        is_ambiguous = git.is_ref_ambiguous(ref, limit)
-
-        # then
-        self.assertTrue(is_ambiguous)
-        mock_isref.assert_called_once_with(ref)
-        mock_stdout.assert_called_once_with(['git', 'show-ref', '--heads', ref])
-
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isRefAmbiguous_limited_one_asList(self, mock_stdout, mock_isref):
+    @mock.patch('bin.commands.utils.execute.check_output')
+    def test_isRefAmbiguous_limited(self, mock_checkoutput):
 
         # given
-        ref = 'ref'
-        limit = [git.RefType.HEADS]
-        mock_stdout.return_value = 'a\nb'
-
-        # when
-        is_ambiguous = git.is_ref_ambiguous(ref, limit)
+        mock_checkoutput.return_value = '\n'.join([
+            'refs/heads/feature/ref', 'refs/heads/ref', 'refs/remotes/origin/ref', 'refs/tags/ref', 'refs/tags/other'
+        ]) + '\n'
 
-        # then
-        self.assertTrue(is_ambiguous)
-        mock_isref.assert_called_once_with(ref)
-        mock_stdout.assert_called_once_with(['git', 'show-ref', '--heads', ref])
+        # expect
+        self.assertTrue(git.is_ref_ambiguous('ref'))
+        self.assertTrue(git.is_ref_ambiguous('ref', git.RefType.HEADS))
+        self.assertFalse(git.is_ref_ambiguous('ref', [git.RefType.TAGS]))
+        self.assertTrue(git.is_ref_ambiguous('ref', [git.RefType.HEADS, git.RefType.TAGS]))
+        self.assertFalse(git.is_ref_ambiguous('feature/ref', [git.RefType.HEADS, git.RefType.TAGS]))
+        self.assertFalse(git.is_ref_ambiguous('origin/ref'))
+        mock_checkoutput.assert_called_once_with(['git', 'for-each-ref', '--format=%(refname)'])
 
-    @mock.patch('bin.commands.utils.git.is_ref', return_value=True)
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_isRefAmbiguous_limited_many(self, mock_stdout, mock_isref):
+    def test_refIndex(self):
 
         # given
-        ref = 'ref'
-        limit = [git.RefType.HEADS, git.RefType.TAGS]
-        mock_stdout.return_value = 'a\nb'
-
-        # when
-        is_ambiguous = git.is_ref_ambiguous(ref, limit)
-
-        # then
-        self.assertTrue(is_ambiguous)
-        mock_isref.assert_called_once_with(ref)
-        mock_stdout.assert_called_once_with(['git', 'show-ref', '--heads', '--tags', ref])
+        index = git._RefIndex(['refs/heads/a/b', 'refs/heads/b', 'refs/tags/b', 'refs/remotes/origin/HEAD', 'refs/stash'])
+
+        # expect
+        self.assertEqual(index.matching('b'), ['refs/heads/a/b', 'refs/heads/b', 'refs/tags/b'])
+        self.assertEqual(index.matching('a/b'), ['refs/heads/a/b'])
+        self.assertEqual(index.matching('refs/heads/b'), ['refs/heads/b'])
+        self.assertEqual(index.matching('b', git.RefType.TAGS), ['refs/tags/b'])
+        self.assertEqual(index.matching('heads/b', git.RefType.TAGS), [])
+        self.assertEqual(index.matching('/b'), [])
+        self.assertEqual(index.matching('c/b'), [])
+        self.assertEqual(index.matching('stash'), ['refs/stash'])
+        self.assertEqual(index.expand('b'), 'refs/tags/b')
+        self.assertEqual(index.expand('a/b'), 'refs/heads/a/b')
+        self.assertEqual(index.expand('c'), None)
+        self.assertEqual(index.matching(''), [])
+        self.assertEqual(index.expand('heads/a/b'), 'refs/heads/a/b')
+        self.assertEqual(index.expand('origin'), 'refs/remotes/origin/HEAD')
+        self.assertEqual(index.expand('stash'), 'refs/stash')
 
     @mock.patch('bin.commands.utils.execute.check_output')
     def test_symbolicFullName(self, mock_checkoutput):
@@ -293,25 +279,98 @@ class TestGit(unittest.TestCase):
         self.assertFalse(current_branch)
         mock_listdir.assert_called_once_with('.git/refs/heads')
 
-    @mock.patch('bin.commands.utils.execute.check_output')
-    def test_deletedFiles(self, mock_checkoutput):
+    @mock.patch('bin.commands.utils.execute.records')
+    def test_status(self, mock_records):
 
         # given
-        status_output = """A  file1.txt
- A file2.txt
-?? file3.txt
-D  deleted_indexed.txt
-MM modified.txt
- D deleted_unindexed.txt
-"""
-        mock_checkoutput.return_value = status_output
+        mock_records.return_value = iter([
+            '1 M. N... 100644 100644 100644 abc abc modified.txt',
+            '1 .D N... 100644 100644 000000 abc abc deleted file.txt',
+            '2 R. N... 100644 100644 100644 abc abc R100 new name.txt',
+            'old name.txt',
+            '1 .M SC.. 160000 160000 160000 abc abc sub',
+            'u UU N... 100644 100644 100644 100644 abc abc abc conflict.txt',
+            '? untracked\nfile.txt',
+            '! ignored.txt'
+        ])
+
+        # when
+        entries = list(git.status())
+
+        # then
+        self.assertEqual(entries, [
+            git.StatusEntry('modified.txt', 'M', '.'),
+            git.StatusEntry('deleted file.txt', '.', 'D'),
+            git.StatusEntry('new name.txt', 'R', '.', original_path='old name.txt'),
+            git.StatusEntry('sub', '.', 'M', submodule='SC..'),
+            git.StatusEntry('conflict.txt', 'U', 'U'),
+            git.StatusEntry('untracked\nfile.txt', '?', '?'),
+            git.StatusEntry('ignored.txt', '!', '!')
+        ])
+        self.assertTrue(entries[3].is_submodule)
+        self.assertFalse(entries[0].is_submodule)
+        mock_records.assert_called_once_with(['git', 'status', '--porcelain=v2', '-z', '--untracked-files=all'])
+
+    @mock.patch('bin.commands.utils.execute.records', return_value=iter([]))
+    def test_status_withOptions(self, mock_records):
+
+        # when
+        entries = list(git.status(untracked_files='no', ignored=True, pathspecs=['a', 'b']))
+
+        # then
+        self.assertEqual(entries, [])
+        mock_records.assert_called_once_with(
+            ['git', 'status', '--porcelain=v2', '-z', '--untracked-files=no', '--ignored', '--', 'a', 'b']
+        )
+
+    def test_statusEntry_states(self):
+
+        # expect
+        self.assertTrue(git.StatusEntry('f', 'A', '.').is_staged)
+        self.assertFalse(git.StatusEntry('f', '.', 'M').is_staged)
+        self.assertFalse(git.StatusEntry('f', '?', '?').is_staged)
+        self.assertTrue(git.StatusEntry('f', '?', '?').is_untracked)
+        self.assertTrue(git.StatusEntry('f', '!', '!').is_ignored)
+        self.assertTrue(git.StatusEntry('f', 'D', '.').is_deleted)
+        self.assertTrue(git.StatusEntry('f', '.', 'D').is_deleted)
+        self.assertFalse(git.StatusEntry('f', 'M', 'D').is_deleted)
+        self.assertFalse(hasattr(git.StatusEntry('f', '.', 'M'), '__dict__'))
+
+    def test_matchesPathspecs(self):
+
+        # expect
+        self.assertTrue(git.matches_pathspecs('a/b.txt', []))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', ['a/b.txt']))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', ['a']))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', ['./a/']))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', ['.']))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', ['*.txt']))
+        self.assertTrue(git.matches_pathspecs('a/b.txt', [':/a']))
+        self.assertFalse(git.matches_pathspecs('ab.txt', ['a']))
+        self.assertFalse(git.matches_pathspecs('a/b.txt', ['*.md']))
+        self.assertFalse(git.matches_pathspecs('a/b.txt', ['a', ':!a/b.txt']))
+        self.assertFalse(git.matches_pathspecs('a/b.txt', [':(exclude)*.txt']))
+        self.assertTrue(git.matches_pathspecs('c.md', [':^a']))
+        self.assertFalse(git.matches_pathspecs('a/c.md', [':^a']))
+
+    @mock.patch('bin.commands.utils.git.status')
+    def test_deletedFiles(self, mock_status):
+
+        # given
+        mock_status.return_value = iter([
+            git.StatusEntry('file1.txt', 'A', '.'),
+            git.StatusEntry('file2.txt', '.', 'A'),
+            git.StatusEntry('deleted_indexed.txt', 'D', '.'),
+            git.StatusEntry('modified.txt', 'M', 'M'),
+            git.StatusEntry('deleted_unindexed.txt', '.', 'D')
+        ])
 
         # when
         deleted_files = git.deleted_files()
 
         # then
         self.assertEqual(deleted_files, ['deleted_indexed.txt', 'deleted_unindexed.txt'])
-        mock_checkoutput.assert_called_once_with('git status --short --porcelain')
+        mock_status.assert_called_once_with(untracked_files='no')
 
     @mock.patch('bin.commands.utils.execute.swallow')
     def test_isEmptyRepository(self, mock_swallow):
@@ -326,34 +385,33 @@ MM modified.txt
         self.assertTrue(is_empty)
         mock_swallow.assert_called_once_with(['git', 'log', '--oneline', '-1'])
 
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_resolveSha1(self, mock_stdout):
+    @mock.patch('bin.commands.utils.git.object_infos')
+    def test_resolveSha1(self, mock_objectinfos):
 
         # given
         revision = 'abc123'
         expected = revision * 2
-        mock_stdout.return_value = expected + os.linesep
+        mock_objectinfos.return_value = [(expected, 'commit')]
 
         # when
         actual = git.resolve_sha1(revision)
 
         # then
         self.assertEqual(actual, expected)
-        mock_stdout.assert_called_once_with(['git', 'rev-parse', '--verify', '--quiet', revision])
+        mock_objectinfos.assert_called_once_with([revision])
 
-    @mock.patch('bin.commands.utils.execute.stdout')
-    def test_resolveSha1_invalid(self, mock_stdout):
+    @mock.patch('bin.commands.utils.git.object_infos', return_value=[None])
+    def test_resolveSha1_invalid(self, mock_objectinfos):
 
         # given
         revision = 'abc123'
-        mock_stdout.return_value = os.linesep
 
         # when
         actual = git.resolve_sha1(revision)
 
         # then
         self.assertFalse(actual)
-        mock_stdout.assert_called_once_with(['git', 'rev-parse', '--verify', '--quiet', revision])
+        mock_objectinfos.assert_called_once_with([revision])
 
     def test_resolveColoring_never(self):
         self.assertEqual(git.resolve_coloring('never'), 'never')
@@ -446,9 +504,9 @@ MM modified.txt
     def test_getConfigValue(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key)
@@ -457,17 +515,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_withDefault_noValueSoUseDefault(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = ''
         default = 'the default'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, default=default)
@@ -476,16 +534,16 @@ MM modified.txt
         self.assertEqual(actual_value, default)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_withDefault_hasValueSoIgnoreDefault(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, default='the default')
@@ -494,16 +552,16 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_withConfig(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, config='global')
@@ -512,17 +570,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', '--global', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null', '--global'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_withFile(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
         file_path = '/path/to/config'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, config='file', file_=file_path)
@@ -531,16 +589,16 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', '--file', file_path, key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null', '--file', file_path])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_asType_hasCall(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, as_type=str)
@@ -549,17 +607,17 @@ MM modified.txt
         self.assertEqual(actual_value, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
     def test_getConfigValue_asType_hasBases(self, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
         as_type = collections.namedtuple('AsType', ['v'])
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         actual_value = git.get_config_value(key, as_type=as_type)
@@ -569,7 +627,7 @@ MM modified.txt
         self.assertEqual(actual_value.v, value)
 
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
 
     @mock.patch('bin.commands.utils.git.validate_config')
     @mock.patch('bin.commands.utils.execute.stdout')
@@ -577,10 +635,10 @@ MM modified.txt
     def test_getConfigValue_asType_throwsException(self, mock_error, mock_stdout, mock_validateconfig):
 
         # given
-        key = 'the key'
+        key = 'the.key'
         value = 'the value'
         as_type = TestGit
-        mock_stdout.return_value = value + os.linesep
+        mock_stdout.return_value = key + os.linesep + value + '\x00'
 
         # when
         try:
@@ -591,11 +649,100 @@ MM modified.txt
 
         # then
         mock_validateconfig.assert_called_once()
-        mock_stdout.assert_called_with(('git', 'config', key))
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
         mock_error.assert_called_once_with(
             'Cannot parse value {0!r} for key {1!r} using format {2!r}'.format(value, key, as_type.__name__)
         )
 
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_getConfigValue_loadsConfigOnce(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.return_value = 'color.ui\nalways\x00git-state.format\npretty\x00'
+
+        # when
+        color = git.get_config_value('color.ui')
+        format_ = git.get_config_value('git-state.format')
+        missing = git.get_config_value('git-state.order', default='the default')
+
+        # then
+        self.assertEqual(color, 'always')
+        self.assertEqual(format_, 'pretty')
+        self.assertEqual(missing, 'the default')
+        mock_stdout.assert_called_once_with(['git', 'config', '--list', '--null'])
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_getConfigValue_loadsEachConfigOnce(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.side_effect = ['a.key\nall\x00', 'a.key\nlocal\x00']
+
+        # when
+        all_value = git.get_config_value('a.key')
+        local_value = git.get_config_value('a.key', config='local')
+
+        # then
+        self.assertEqual(all_value, 'all')
+        self.assertEqual(local_value, 'local')
+        self.assertEqual(git.get_config_value('a.key'), 'all')
+        self.assertEqual(git.get_config_value('a.key', config='local'), 'local')
+        mock_stdout.assert_has_calls([
+            mock.call(['git', 'config', '--list', '--null']),
+            mock.call(['git', 'config', '--list', '--null', '--local'])
+        ])
+        self.assertEqual(mock_stdout.call_count, 2)
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_getConfigValue_keyCase(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.return_value = 'git-state.extensions.MyLog.command\ngit log\x00'
+
+        # expect
+        self.assertEqual(git.get_config_value('Git-State.extensions.MyLog.Command'), 'git log')
+        self.assertIsNone(git.get_config_value('git-state.extensions.mylog.command'))
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_getConfigValue_multipleValues_lastWins(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.return_value = 'a.key\nfirst\x00a.key\nsecond\x00'
+
+        # expect
+        self.assertEqual(git.get_config_value('a.key'), 'second')
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_getConfigValue_noValue(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.return_value = 'a.flag\x00b.key\nmulti\nline\x00'
+
+        # expect
+        self.assertEqual(git.get_config_value('a.flag', default='the default'), 'the default')
+        self.assertEqual(git.get_config_value('b.key'), 'multi\nline')
+
+    @mock.patch('bin.commands.utils.git.validate_config')
+    @mock.patch('bin.commands.utils.execute.stdout')
+    def test_clearConfigCache(self, mock_stdout, mock_validateconfig):
+
+        # given
+        mock_stdout.side_effect = ['a.key\nold\x00', 'a.key\nnew\x00']
+
+        # when
+        old_value = git.get_config_value('a.key')
+        git.clear_config_cache()
+        new_value = git.get_config_value('a.key')
+
+        # then
+        self.assertEqual(old_value, 'old')
+        self.assertEqual(new_value, 'new')
+        self.assertEqual(mock_stdout.call_count, 2)
+
     @mock.patch('bin.commands.utils.git.validate_config')
     def test_getConfigValue_asType_notCallable(self, mock_validateconfig):
 
@@ -626,3 +773,487 @@ MM modified.txt
 
     def test_resolve_config_option_none(self):
         self.assertEqual(None, git.resolve_config_option(None))
+
+
+class TestGitObjectInfos(unittest.TestCase):
+    layer = UtilsGit
+
+    def _git(self, *args):
+        return subprocess.check_output(('git',) + args).decode('utf-8').strip()
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        self._git('init', '--quiet')
+        self._git('config', 'user.name', 'Some One')
+        self._git('config', 'user.email', 'one@example.com')
+        open('file', 'w').close()
+        self._git('add', 'file')
+        self._git('commit', '--quiet', '--message', 'Initial commit')
+
+    def tearDown(self):
+        os.chdir(self.proj_dir)
+        shutil.rmtree(self.dirpath)
+
+    def test_objectInfos(self):
+
+        # when
+        infos = git.object_infos(['HEAD', 'HEAD^{tree}', 'HEAD:file', 'HEAD^', '', 'two\nlines', 'HEAD'])
+
+        # then
+        self.assertEqual(infos, [
+            (self._git('rev-parse', 'HEAD'), 'commit'),
+            (self._git('rev-parse', 'HEAD^{tree}'), 'tree'),
+            (self._git('rev-parse', 'HEAD:file'), 'blob'),
+            None,
+            None,
+            None,
+            (self._git('rev-parse', 'HEAD'), 'commit')
+        ])
+
+    def test_objectInfos_reusesProcess(self):
+
+        # when
+        with mock.patch('bin.commands.utils.execute.coprocess', wraps=git.execute.coprocess) as mock_coprocess:
+            git.object_infos(['HEAD'])
+            git.object_infos(['HEAD^{tree}'])
+
+            # then
+            self.assertEqual(mock_coprocess.call_count, 1)
+
+    def test_objectInfos_survivesGitDying(self):
+
+        # when: git cat-file dies on reflog indexes out of range
+        infos = git.object_infos(['HEAD', 'HEAD@{10}', 'HEAD^{tree}'])
+
+        # then
+        self.assertEqual(infos, [
+            (self._git('rev-parse', 'HEAD'), 'commit'),
+            None,
+            (self._git('rev-parse', 'HEAD^{tree}'), 'tree')
+        ])
+
+    def test_objectInfos_inBatches(self):
+
+        # when
+        infos = git.object_infos(['HEAD~{}'.format(i) + ' ' * 100 for i in range(300)] + ['HEAD'])
+
+        # then
+        self.assertEqual(infos, [None] * 300 + [(self._git('rev-parse', 'HEAD'), 'commit')])
+
+    def test_objectInfos_followsWorkingDirectory(self):
+
+        # given
+        git.object_infos(['HEAD'])
+        other_dirpath = tempfile.mkdtemp()
+        try:
+            os.chdir(other_dirpath)
+            self._git('init', '--quiet')
+
+            # expect
+            self.assertEqual(git.object_infos(['HEAD']), [None])
+        finally:
+            os.chdir(self.dirpath)
+            shutil.rmtree(other_dirpath)
+
+
+class TestGitRepositoryContext(unittest.TestCase):
+    layer = UtilsGit
+
+    def _git(self, *args):
+        return subprocess.check_output(('git',) + args).decode('utf-8').strip()
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        self._git('init', '--quiet')
+        self._git('config', 'user.name', 'Some One')
+        self._git('config', 'user.email', 'one@example.com')
+        self._git('symbolic-ref', 'HEAD', 'refs/heads/master')
+
+    def tearDown(self):
+        os.chdir(self.proj_dir)
+        shutil.rmtree(self.dirpath)
+
+    def _commit(self):
+        self._git('commit', '--quiet', '--allow-empty', '--message', 'Initial commit')
+
+    def test_repositoryContext_empty(self):
+
+        # when
+        repository = git.RepositoryContext()
+
+        # then
+        self.assertTrue(repository.is_empty)
+        self.assertFalse(repository.is_detached)
+        self.assertIsNone(repository.current_branch)
+        self.assertEqual(repository.refs, [])
+
+    def test_repositoryContext_onBranch(self):
+
+        # given
+        self._commit()
+
+        # when
+        repository = git.RepositoryContext()
+
+        # then
+        self.assertFalse(repository.is_empty)
+        self.assertFalse(repository.is_detached)
+        self.assertEqual(repository.current_branch, 'master')
+
+    def test_repositoryContext_detached(self):
+
+        # given
+        self._commit()
+        self._git('checkout', '--quiet', '--detach')
+
+        # when
+        repository = git.RepositoryContext()
+
+        # then
+        self.assertTrue(repository.is_detached)
+        self.assertEqual(repository.current_branch, 'HEAD')
+
+    def test_repositoryContext_refs(self):
+
+        # given
+        self._commit()
+        self._git('branch', 'feature/one')
+        self._git('tag', 'one')
+        self._git('tag', 'master')
+        self._git('update-ref', 'refs/remotes/origin/two', 'HEAD')
+        repository = git.RepositoryContext()
+        limit = (git.RefType.HEADS, git.RefType.TAGS)
+
+        # expect
+        self.assertTrue(repository.is_ref('one'))
+        self.assertTrue(repository.is_ref('refs/heads/master'))
+        self.assertFalse(repository.is_ref('ne'))
+        self.assertFalse(repository.is_ref('HEAD'))
+        self.assertEqual(repository.matching_refs('one'), ['refs/heads/feature/one', 'refs/tags/one'])
+        self.assertEqual(repository.matching_refs('one', limit=git.RefType.TAGS), ['refs/tags/one'])
+        self.assertTrue(repository.is_ref_ambiguous('master', limit=limit))
+        self.assertFalse(repository.is_ref_ambiguous('two', limit=limit))
+        self.assertEqual(repository.symbolic_full_name('master'), 'refs/tags/master')
+        self.assertEqual(repository.symbolic_full_name('feature/one'), 'refs/heads/feature/one')
+        self.assertEqual(repository.symbolic_full_name('origin/two'), 'refs/remotes/origin/two')
+        self.assertIsNone(repository.symbolic_full_name('two'))
+        with self.assertRaises(git.GitException):
+            repository.is_ref_ambiguous('three')
+
+    def test_repositoryContext_symbolicFullName_head(self):
+
+        # given: a remote HEAD, which makes HEAD match as a ref
+        self._commit()
+        self._git('update-ref', 'refs/remotes/origin/HEAD', 'HEAD')
+
+        # expect
+        self.assertEqual(git.RepositoryContext().symbolic_full_name('HEAD'), self._git('rev-parse', '--symbolic-full-name', 'HEAD'))
+        self._git('checkout', '--quiet', '--detach')
+        self.assertEqual(git.RepositoryContext().symbolic_full_name('HEAD'), 'HEAD')
+
+    def test_repositoryContext_matchesShowRef(self):
+
+        # given
+        self._commit()
+        self._git('branch', 'feature/one')
+        self._git('tag', 'one')
+        repository = git.RepositoryContext()
+
+        # expect
+        for ref in ('one', 'feature/one', 'master', 'heads/master', 'refs/tags/one', 'eature/one', 'missing'):
+            show_ref = subprocess.Popen(['git', 'show-ref', ref], stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
+            self.assertEqual(repository.matching_refs(ref), [line.split(' ')[1] for line in show_ref.splitlines()], ref)
+
+
+class TestGitStashReflog(unittest.TestCase):
+    layer = UtilsGit
+
+    def _sha1(self, n):
+        return str(n) * 40
+
+    def _line(self, old, new, message):
+        return '{} {} Some One <one@example.com> 145566{}000 +0000\t{}'.format(old, new, new[0], message)
+
+    def _write_reflog(self, *lines):
+        with open(os.path.join('.git', 'logs', 'refs', 'stash'), 'w') as reflog:
+            reflog.write(''.join(line + '\n' for line in lines))
+
+    def _read_reflog(self):
+        with open(os.path.join('.git', 'logs', 'refs', 'stash')) as reflog:
+            return reflog.read()
+
+    def _read_ref(self):
+        with open(os.path.join('.git', 'refs', 'stash')) as ref:
+            return ref.read()
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        subprocess.call(['git', 'init', '--quiet'])
+        os.makedirs(os.path.join('.git', 'logs', 'refs'))
+        with open(os.path.join('.git', 'refs', 'stash'), 'w') as ref:
+            ref.write(self._sha1(4) + '\n')
+
+        # stash@{3} through stash@{0}
+        self.lines = [
+            self._line('0' * 40, self._sha1(3), 'WIP on master: 3'),
+            self._line(self._sha1(3), self._sha1(2), 'On master: 2'),
+            self._line(self._sha1(2), self._sha1(1), 'WIP on master: 1'),
+            self._line(self._sha1(1), self._sha1(4), 'On master: with\ttab')
+        ]
+        self._write_reflog(*self.lines)
+
+    def tearDown(self):
+        os.chdir(self.proj_dir)
+        shutil.rmtree(self.dirpath)
+
+    def test_stashReflog(self):
+
+        # when
+        reflog = git.stash_reflog()
+
+        # then
+        self.assertEqual([entry.new_sha1 for entry in reflog], [self._sha1(4), self._sha1(1), self._sha1(2), self._sha1(3)])
+        self.assertEqual(reflog[0].message, 'On master: with\ttab')
+        self.assertEqual(reflog[0].identity, 'Some One <one@example.com> 1455664000 +0000')
+        self.assertEqual(reflog[3].old_sha1, '0' * 40)
+        self.assertEqual(reflog[0].timestamp, 1455664000)
+        self.assertEqual(reflog[0].timezone, '+0000')
+        self.assertEqual([entry.format() for entry in reversed(reflog)], self.lines)
+
+    def test_stashReflog_noStashes(self):
+
+        # given
+        os.remove(os.path.join('.git', 'logs', 'refs', 'stash'))
+
+        # expect
+        self.assertEqual(git.stash_reflog(), [])
+
+    def test_reflogEntry_withoutMessage(self):
+
+        # when
+        entry = git.ReflogEntry.parse('{} {} Some One <one@example.com> 1 +0000'.format('0' * 40, self._sha1(1)))
+
+        # then
+        self.assertIsNone(entry.message)
+        self.assertEqual(entry.format(), '{} {} Some One <one@example.com> 1 +0000'.format('0' * 40, self._sha1(1)))
+
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_dropStashes_middle(self, mock_call):
+
+        # given
+        ref_inode = os.stat(os.path.join('.git', 'refs', 'stash')).st_ino
+
+        # when
+        dropped = git.drop_stashes([1, 2])
+
+        # then: the ref is rewritten even though it still points at the same stash
+        self.assertEqual([entry.new_sha1 for entry in dropped], [self._sha1(1), self._sha1(2)])
+        mock_call.assert_not_called()
+        self.assertEqual(self._read_ref(), self._sha1(4) + '\n')
+        self.assertNotEqual(os.stat(os.path.join('.git', 'refs', 'stash')).st_ino, ref_inode)
+        self.assertFalse(os.path.exists(os.path.join('.git', 'refs', 'stash.lock')))
+        self.assertEqual(self._read_reflog(), ''.join(line + '\n' for line in [
+            self.lines[0],
+            self._line(self._sha1(3), self._sha1(4), 'On master: with\ttab')
+        ]))
+        self.assertFalse(os.path.exists(os.path.join('.git', 'logs', 'refs', 'stash.lock')))
+
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_dropStashes_topAndBottom(self, mock_call):
+
+        # when
+        dropped = git.drop_stashes(range(0, 1))
+        dropped += git.drop_stashes([2])
+
+        # then
+        self.assertEqual([entry.new_sha1 for entry in dropped], [self._sha1(4), self._sha1(3)])
+        mock_call.assert_not_called()
+        self.assertEqual(self._read_ref(), self._sha1(1) + '\n')
+        self.assertEqual(self._read_reflog(), ''.join(line + '\n' for line in [
+            self._line('0' * 40, self._sha1(2), 'On master: 2'),
+            self.lines[2]
+        ]))
+
+    @mock.patch('bin.commands.utils.git.clear_ref_cache')
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_dropStashes_all(self, mock_call, mock_clearrefcache):
+
+        # when
+        dropped = git.drop_stashes(range(0, 10))
+
+        # then
+        self.assertEqual(len(dropped), 4)
+        mock_call.assert_called_once_with(['git', 'update-ref', '-d', 'refs/stash', self._sha1(4)])
+        mock_clearrefcache.assert_called_once_with()
+
+    @mock.patch('bin.commands.utils.git.stash_reflog')
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_dropStashes_alreadyRead(self, mock_call, mock_stashreflog):
+
+        # given
+        reflog = [git.ReflogEntry.parse(line) for line in reversed(self.lines)]
+
+        # when
+        dropped = git.drop_stashes([1], reflog)
+
+        # then
+        mock_stashreflog.assert_not_called()
+        self.assertEqual([entry.new_sha1 for entry in dropped], [self._sha1(1)])
+        self.assertEqual(self._read_reflog(), ''.join(line + '\n' for line in [
+            self.lines[0],
+            self.lines[1],
+            self._line(self._sha1(2), self._sha1(4), 'On master: with\ttab')
+        ]))
+
+    @mock.patch('bin.commands.utils.execute.call')
+    def test_dropStashes_none(self, mock_call):
+
+        # expect
+        self.assertEqual(git.drop_stashes([10]), [])
+        mock_call.assert_not_called()
+        self.assertEqual(self._read_reflog(), ''.join(line + '\n' for line in self.lines))
+
+    @mock.patch('bin.commands.utils.execute.call')
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_dropStashes_locked(self, mock_error, mock_call):
+
+        # given
+        open(os.path.join('.git', 'logs', 'refs', 'stash.lock'), 'w').close()
+
+        # when
+        with self.assertRaises(SystemExit):
+            git.drop_stashes([1])
+
+        # then
+        mock_error.assert_called_once_with(
+            "unable to lock '{}': file exists".format(os.path.join(os.getcwd(), '.git', 'logs', 'refs', 'stash.lock'))
+        )
+        self.assertEqual(self._read_reflog(), ''.join(line + '\n' for line in self.lines))
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_writeLocked_missingDirectory(self, mock_error):
+
+        # when
+        with self.assertRaises(SystemExit):
+            git._write_locked(os.path.join('missing', 'file'), 'content')
+
+        # then
+        mock_error.assert_called_once_with(
+            "unable to lock '{}': No such file or directory".format(os.path.join('missing', 'file.lock'))
+        )
+
+    def test_gitPath_linkedWorktree(self):
+
+        # given: a linked worktree, whose .git is a file, and a stash made from it
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'Initial commit'])
+        os.remove(os.path.join('.git', 'refs', 'stash'))
+        os.remove(os.path.join('.git', 'logs', 'refs', 'stash'))
+        subprocess.call(['git', 'worktree', 'add', '--quiet', 'linked'])
+        os.chdir('linked')
+        with open('file', 'w') as a_file:
+            a_file.write('stashed\n')
+        subprocess.call(['git', 'stash', '--quiet', '--include-untracked'])
+        with open('file', 'w') as a_file:
+            a_file.write('stashed again\n')
+        subprocess.call(['git', 'stash', '--quiet', '--include-untracked'])
+
+        # when
+        reflog = git.stash_reflog()
+        dropped = git.drop_stashes([0], reflog=reflog)
+
+        # then
+        self.assertEqual(git.git_path('config'), os.path.join(self.dirpath, '.git', 'config'))
+        self.assertEqual(len(reflog), 2)
+        self.assertEqual(len(dropped), 1)
+        self.assertEqual(
+            subprocess.check_output(['git', 'rev-parse', 'refs/stash']).decode('utf-8').strip(), reflog[1].new_sha1
+        )
+        self.assertEqual(len(git.stash_reflog()), 1)
+
+
+class TestGitSetLocalConfigValues(unittest.TestCase):
+    layer = UtilsGit
+
+    def _config_list(self):
+        return subprocess.Popen(['git', 'config', '--local', '--list'], stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
+
+    def setUp(self):
+        self.proj_dir = os.getcwd()
+        self.dirpath = tempfile.mkdtemp()
+        os.chdir(self.dirpath)
+        subprocess.call(['git', 'init', '--quiet'])
+
+    def tearDown(self):
+        os.chdir(self.proj_dir)
+        shutil.rmtree(self.dirpath)
+
+    def test_setLocalConfigValues(self):
+
+        # given
+        subprocess.call(['git', 'config', 'git-changes.associations.one.with', 'old'])
+        subprocess.call(['git', 'config', 'git-changes.associations.two.with', 'gone'])
+        subprocess.call(['git', 'config', 'git-changes.associations.three.with', 'kept'])
+        shutil.copy(os.path.join('.git', 'config'), 'config.orig')
+
+        # the same changes made one key at a time by git itself
+        subprocess.call(['git', 'config', 'git-changes.associations.one.with', 'new'])
+        subprocess.call(['git', 'config', '--unset', 'git-changes.associations.two.with'])
+        subprocess.call(['git', 'config', 'git-changes.associations.odd "branch.with', 'a\\b'])
+        expected = self._config_list()
+        shutil.move('config.orig', os.path.join('.git', 'config'))
+
+        # when
+        git.set_local_config_values({
+            'git-changes.associations.one.with': 'new',
+            'git-changes.associations.two.with': None,
+            'git-changes.associations.odd "branch.with': 'a\\b',
+            'git-changes.associations.missing.with': None
+        })
+
+        # then
+        self.assertEqual(sorted(self._config_list().splitlines()), sorted(expected.splitlines()))
+
+    def test_setLocalConfigValues_removesEmptiedSections(self):
+
+        # given
+        subprocess.call(['git', 'config', 'git-changes.associations.one.with', 'value'])
+
+        # when
+        git.set_local_config_values({'git-changes.associations.one.with': None})
+
+        # then
+        with open(os.path.join('.git', 'config')) as config_file:
+            self.assertNotIn('git-changes', config_file.read())
+        self.assertEqual(git.get_config_value('git-changes.associations.one.with', config='local'), None)
+
+    def test_setLocalConfigValues_linkedWorktree(self):
+
+        # given: a linked worktree, whose .git is a file
+        subprocess.call(['git', 'commit', '--quiet', '--allow-empty', '-m', 'Initial commit'])
+        subprocess.call(['git', 'worktree', 'add', '--quiet', 'linked'])
+        os.chdir('linked')
+
+        # when
+        git.set_local_config_values({'git-changes.associations.one.with': 'value'})
+
+        # then
+        os.chdir(self.dirpath)
+        self.assertEqual(git.get_config_value('git-changes.associations.one.with', config='local'), 'value')
+
+    def test_setLocalConfigValues_noValues(self):
+
+        # given
+        config_stat = os.stat(os.path.join('.git', 'config'))
+        open(os.path.join('.git', 'config.lock'), 'w').close()
+
+        # when: the lock would make any rewrite fail
+        git.set_local_config_values({})
+
+        # then
+        self.assertEqual(os.stat(os.path.join('.git', 'config')).st_ino, config_stat.st_ino)
@@ -0,0 +1,69 @@
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from .. import testutils
+from ...layers import UtilsParseFile
+from bin.commands.utils import parse_file
+
+
+class TestParseFile(unittest.TestCase):
+    layer = UtilsParseFile
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirpath, 'words')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_readShellWords(self):
+
+        # given
+        with open(self.path, 'w') as words_file:
+            words_file.write('# a comment\n\none "two three"\n\'four\'  # trailing comment\n')
+
+        # expect
+        self.assertEqual(parse_file.read_shell_words(self.path, 'file', 'line'), [(3, ['one', 'two three']), (4, ['four'])])
+
+    @mock.patch('sys.stdin')
+    def test_readShellWords_stdin(self, mock_stdin):
+
+        # given
+        mock_stdin.__iter__ = mock.Mock(return_value=iter(['one two\n']))
+
+        # expect
+        self.assertEqual(parse_file.read_shell_words('-', 'file', 'line'), [(1, ['one', 'two'])])
+        mock_stdin.close.assert_not_called()
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_readShellWords_cannotRead(self, mock_error):
+
+        # when
+        try:
+            parse_file.read_shell_words(self.path, 'the file', 'the')
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with("cannot read the file '{}'".format(self.path))
+
+    @mock.patch('bin.commands.utils.messages.error', side_effect=testutils.and_exit)
+    def test_readShellWords_invalidLine(self, mock_error):
+
+        # given
+        with open(self.path, 'w') as words_file:
+            words_file.write('valid\n"unclosed\n')
+
+        # when
+        try:
+            parse_file.read_shell_words(self.path, 'the file', 'the')
+            self.fail('expected to exit but did not')  # pragma: no cover
+        except SystemExit:
+            pass
+
+        # then
+        mock_error.assert_called_once_with('invalid the line 2: No closing quotation')